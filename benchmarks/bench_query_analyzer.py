@@ -0,0 +1,49 @@
+"""
+Throughput benchmark for the query analyzer
+
+Run from the project root: python -m benchmarks.bench_query_analyzer [count]
+"""
+
+import random
+import sys
+import time
+
+from src.query_analyzer import analyze_query
+
+CITIES = ["Boston", "New York", "Dallas, Texas", "Miami, FL", "London, UK", "Tokyo", "St. Louis",
+          "San Francisco, CA", "Paris", "Seattle", "Denver", "Phoenix", "Minneapolis"]
+TEMPLATES = ["weather in {city}", "{city} weather", "How's the weather in {city}?",
+             "Will it rain next week in {city}?", "forecast for the next {days} days in {city}",
+             "Weather forecast for {city} tomorrow", "Current temperature in {city}",
+             "{city} forecast", "What's it like outside in {city} today?"]
+
+def synthetic_corpus(count: int, distinct: int, seed: int = 0):
+    """count queries drawn from a pool of distinct generated queries"""
+    rng = random.Random(seed)
+    pool = [rng.choice(TEMPLATES).format(city=rng.choice(CITIES), days=rng.randint(1, 5)) + f" #{i}"
+            for i in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+def measure(queries):
+    """Queries per second for analyzing every query in the list"""
+    start = time.perf_counter()
+    for query in queries:
+        analyze_query(query)
+    return len(queries) / (time.perf_counter() - start)
+
+def main(count: int = 100_000):
+    unique = synthetic_corpus(count, count)
+    replay = synthetic_corpus(count, 2_000)
+
+    analyze_query.cache_clear()
+    cold = measure(unique)
+    analyze_query.cache_clear()
+    warm = measure(replay)
+
+    print(f"queries={count}")
+    print(f"unique_queries_per_sec={cold:.0f}")
+    print(f"replayed_queries_per_sec={warm:.0f}")
+    print(f"cache={analyze_query.cache_info()}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
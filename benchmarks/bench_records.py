@@ -0,0 +1,46 @@
+"""
+Memory benchmark: per-observation dicts vs slotted WeatherRecord objects
+
+Run from the project root: python -m benchmarks.bench_records [count]
+"""
+
+import sys
+import tracemalloc
+
+from src.records import WeatherRecord
+
+DESCRIPTIONS = ["clear sky", "few clouds", "scattered clouds", "light rain", "overcast clouds"]
+LOCATIONS = ["Boston", "New York", "Seattle", "Denver", "Miami"]
+
+def observation(i: int) -> dict:
+    # Build strings at runtime, as JSON decoding does, so interning has something to do
+    return {
+        'location': ''.join(LOCATIONS[i % len(LOCATIONS)]),
+        'temperature': 15.0 + (i % 200) / 10,
+        'humidity': 40 + i % 50,
+        'pressure': 1000 + i % 30,
+        'description': ' '.join(DESCRIPTIONS[i % len(DESCRIPTIONS)].split(' ')),
+        'wind_speed': (i % 100) / 10,
+        'wind_direction': i % 360,
+        'timestamp': f"2024-01-{1 + i % 28:02d} {i % 24:02d}:00:00"
+    }
+
+def measure(count: int, build) -> int:
+    """Bytes still allocated after building count objects"""
+    tracemalloc.start()
+    objects = [build(observation(i)) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+def main(count: int = 1_000_000):
+    dict_bytes = measure(count, dict)
+    record_bytes = measure(count, WeatherRecord.from_dict)
+    print(f"records={count}")
+    print(f"dict_bytes_per_record={dict_bytes / count:.1f}")
+    print(f"weather_record_bytes_per_record={record_bytes / count:.1f}")
+    print(f"saving={1 - record_bytes / dict_bytes:.1%}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
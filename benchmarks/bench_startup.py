@@ -0,0 +1,63 @@
+"""
+Cold-start benchmark: import time of src.weather_bot
+
+Each run imports the module in a fresh interpreter under python -X importtime
+and reports the cumulative import time, the slowest imported modules and
+whether the Gemini SDK was loaded.
+
+Run from the project root: python -m benchmarks.bench_startup [runs]
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from benchmarks.harness import BenchResult
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = "import sys, src.weather_bot; print('google.generativeai' in sys.modules)"
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self microseconds, cumulative microseconds) for every line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def import_once(module: str = 'src.weather_bot') -> Dict:
+    """Import the bot in a fresh interpreter and return its import profile"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, check=True)
+    rows = parse_importtime(completed.stderr)
+    total = next(cumulative for name, _, cumulative in rows if name == module)
+    return {
+        'seconds': total / 1e6,
+        'gemini_sdk_loaded': completed.stdout.strip() == 'True',
+        'slowest': sorted(rows, key=lambda row: row[2], reverse=True)
+    }
+
+def bench_startup(runs: int = 5) -> BenchResult:
+    """Import time of src.weather_bot over several cold interpreters"""
+    profiles = [import_once() for _ in range(runs)]
+    latencies = [profile['seconds'] for profile in profiles]
+    top_level = [row for row in profiles[-1]['slowest'] if row[0] != 'src.weather_bot'][:10]
+    return BenchResult('startup.import_weather_bot', latencies, sum(latencies), extra={
+        'gemini_sdk_loaded': any(profile['gemini_sdk_loaded'] for profile in profiles),
+        'slowest_imports_ms': {name: round(cumulative / 1000, 2) for name, _, cumulative in top_level}
+    })
+
+def main(runs: int = 5):
+    result = bench_startup(runs).to_dict()
+    print(f"runs={result['count']}")
+    print(f"import_p50_ms={result['p50_ms']:.1f}")
+    print(f"import_max_ms={result['max_ms']:.1f}")
+    print(f"gemini_sdk_loaded={result['gemini_sdk_loaded']}")
+    for name, milliseconds in result['slowest_imports_ms'].items():
+        print(f"  {name:<40} {milliseconds:>8.1f} ms")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
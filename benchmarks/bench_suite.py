@@ -0,0 +1,165 @@
+"""
+Hermetic benchmark suite: startup, query parsers, cache functions, process_user_query and the worker pool
+
+All OpenWeatherMap and Gemini traffic goes to the local fakes in
+benchmarks.fakes, so the suite runs offline and without API keys.
+
+Run from the project root:
+    python -m benchmarks.bench_suite --output results.json
+    python -m benchmarks.bench_suite --compare results.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import sys
+import time
+from typing import List
+
+from benchmarks.bench_query_analyzer import synthetic_corpus
+from benchmarks.bench_startup import bench_startup
+from benchmarks.fakes import UpstreamProfile, fake_services
+from benchmarks.harness import BenchResult, compare, measure, print_table, report, write_json
+from src import weather_bot
+from src.query_analyzer import analyze_query
+from src.worker_pool import WorkerPool
+
+QUERY_TEMPLATES = ["What's the weather in {city}?", "Will it rain tomorrow in {city}?",
+                   "Weather forecast for {city} for the next 3 days", "Current temperature in {city}"]
+
+SYLLABLES = ['ka', 'lo', 'mer', 'ti', 'van', 'dor', 'su', 'ne', 'ri', 'bo', 'qua', 'zel', 'pa', 'fen', 'go', 'hul']
+
+def _failed(response: str) -> bool:
+    return response.startswith("Sorry")
+
+def bench_parsers(count: int) -> List[BenchResult]:
+    queries = synthetic_corpus(count, count)
+    results = []
+    for fn in (weather_bot.extract_location_from_query, weather_bot.determine_query_type,
+               weather_bot.parse_time_intent):
+        analyze_query.cache_clear()
+        results.append(measure(f"parser.{fn.__name__}", fn, queries))
+    return results
+
+def bench_cache(count: int) -> List[BenchResult]:
+    keys = [f"bench-city-{i}" for i in range(count)]
+    data = {'temperature': 20.5, 'humidity': 60, 'description': 'clear sky'}
+    with fake_services():
+        writes = measure("cache.cache_weather_data", lambda key: weather_bot.cache_weather_data(key, data), keys)
+        hits = measure("cache.get_cached_data.hit", weather_bot.get_cached_data, keys)
+        misses = measure("cache.get_cached_data.miss", weather_bot.get_cached_data,
+                         [f"missing-{i}" for i in range(count)])
+    return [writes, hits, misses]
+
+def _city(index: int) -> str:
+    """A distinct made-up city name per index; letters only, since the query analyzer stops at digits"""
+    syllables = ['ven']
+    while True:
+        index, digit = divmod(index, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+        if not index:
+            break
+    return ''.join(syllables).title()
+
+def _queries(count: int, distinct_cities: int, seed: int) -> List[str]:
+    """count queries over distinct_cities locations, each city asked once before any repeats"""
+    rng = random.Random(seed)
+    cities = [_city(i) for i in range(distinct_cities)]
+    rng.shuffle(cities)
+    return [rng.choice(QUERY_TEMPLATES).format(city=cities[i % len(cities)]) for i in range(count)]
+
+def bench_pipeline(name: str, count: int, concurrency: int, openweather: UpstreamProfile,
+                   gemini: UpstreamProfile, distinct_cities: int, seed: int) -> List[BenchResult]:
+    queries = _queries(count, distinct_cities, seed)
+    with fake_services(openweather, gemini) as (session, model):
+        result = measure(f"pipeline.{name}", weather_bot.process_user_query, queries,
+                         concurrency=concurrency, is_error=_failed)
+        result.extra = {'upstream_calls': dict(session.calls), 'upstream_status': dict(session.status_counts),
+                        'gemini_calls': model.calls}
+    return [result]
+
+def bench_batch(count: int, openweather: UpstreamProfile, gemini: UpstreamProfile, seed: int) -> List[BenchResult]:
+    queries = _queries(count, max(1, count // 4), seed)
+    with fake_services(openweather, gemini):
+        start = time.perf_counter()
+        responses = asyncio.run(weather_bot.process_user_queries_async(queries))
+        wall = time.perf_counter() - start
+    # One batch: report throughput over the whole run rather than per-query latency
+    result = BenchResult("pipeline.process_user_queries_async", [wall / len(queries)] * len(queries), wall,
+                         sum(1 for response in responses if _failed(response)))
+    return [result]
+
+def bench_worker_pool(count: int, worker_counts: List[int], openweather: UpstreamProfile,
+                      gemini: UpstreamProfile, seed: int) -> List[BenchResult]:
+    """Throughput of WorkerPool.map at each worker count, on distinct cold locations"""
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return []
+    queries = _queries(count, count, seed)
+    results = []
+    for workers in worker_counts:
+        # Forked workers inherit the fakes
+        with fake_services(openweather, gemini):
+            with WorkerPool(workers, start_method='fork') as pool:
+                pool.map(queries[:workers * 4])
+                start = time.perf_counter()
+                responses = pool.map(queries)
+                wall = time.perf_counter() - start
+        results.append(BenchResult(f"pool.workers_{workers}", [wall / len(queries)] * len(queries), wall,
+                                   sum(1 for response in responses if _failed(response)),
+                                   extra={'per_worker': pool.submitted}))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=200, help="queries per pipeline benchmark")
+    parser.add_argument('--parser-count', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--owm-latency', type=float, default=0.02, help="seconds per OpenWeatherMap call")
+    parser.add_argument('--gemini-latency', type=float, default=0.08, help="seconds per Gemini call")
+    parser.add_argument('--jitter', type=float, default=0.5, help="jitter as a fraction of latency")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="error rate for the faulty scenario")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.05, help="429 rate for the faulty scenario")
+    parser.add_argument('--startup-runs', type=int, default=5, help="cold interpreters for the import benchmark")
+    parser.add_argument('--pool-workers', default='1,2,4',
+                        help="comma-separated WorkerPool sizes to benchmark ('' to skip)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON results to this file")
+    parser.add_argument('--compare', help="baseline JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    def profile(latency: float, faulty: bool = False) -> UpstreamProfile:
+        return UpstreamProfile(latency, latency * args.jitter, args.error_rate if faulty else 0.0,
+                               args.rate_limit_rate if faulty else 0.0, seed=args.seed)
+
+    distinct = max(1, args.count // 4)
+    results = [bench_startup(args.startup_runs)] if args.startup_runs > 0 else []
+    results += bench_parsers(args.parser_count) + bench_cache(args.parser_count)
+    results += bench_pipeline("cold", args.count, args.concurrency, profile(args.owm_latency),
+                              profile(args.gemini_latency), args.count, args.seed)
+    results += bench_pipeline("warm", args.count, args.concurrency, profile(args.owm_latency),
+                              profile(args.gemini_latency), distinct, args.seed)
+    results += bench_pipeline("faulty", args.count, args.concurrency, profile(args.owm_latency, True),
+                              profile(args.gemini_latency, True), distinct, args.seed)
+    results += bench_batch(args.count, profile(args.owm_latency), profile(args.gemini_latency), args.seed)
+    if args.pool_workers:
+        # Near-zero upstream latency, so the pool is measured on CPU-bound work
+        results += bench_worker_pool(args.count * 5, [int(n) for n in args.pool_workers.split(',')],
+                                     UpstreamProfile(0.0), UpstreamProfile(0.0), args.seed)
+
+    print_table(results)
+    data = report(results, {key: value for key, value in vars(args).items() if key not in ('output', 'compare')})
+    if args.output:
+        write_json(data, args.output)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\nchange vs baseline (%; + = slower p-latency / higher throughput)")
+        for row in compare(baseline, data):
+            print(f"{row['name']:<38} p50 {row['p50_ms']}  p95 {row['p95_ms']}  p99 {row['p99_ms']}  "
+                  f"ops/s {row['throughput_per_sec']}")
+    return data
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
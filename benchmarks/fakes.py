@@ -0,0 +1,214 @@
+"""
+Local stand-ins for the OpenWeatherMap and Gemini APIs
+
+FakeSession replaces the requests.Session inside HttpTransport, so pooling,
+retries, Retry-After handling and quota scheduling still run against it.
+FakeGeminiModel replaces the google.generativeai model. Both take an
+UpstreamProfile with latency, jitter, error and 429 rates, and use a seeded
+RNG so runs are repeatable.
+"""
+
+import contextlib
+import json
+import random
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, Optional
+from unittest import mock
+
+from src import weather_bot
+from src.cache import MemoryCache, TieredCache
+from src.config import Config
+from src.refresh import BackgroundRefresher, HotSet
+from src.transport import HttpTransport
+
+DESCRIPTIONS = ["clear sky", "few clouds", "scattered clouds", "light rain", "overcast clouds"]
+
+class UpstreamProfile:
+    """Behaviour of a fake upstream"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: int = 0, seed: int = 0):
+        """
+        Args:
+            latency: Base seconds per call
+            jitter: Extra seconds, uniformly distributed in [0, jitter]
+            error_rate: Fraction of calls failing with a 500 (or an exception for Gemini)
+            rate_limit_rate: Fraction of calls answered with 429
+            retry_after: Retry-After seconds sent with 429 responses
+            seed: Seed for the latency and failure draws
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(delay seconds, outcome) for one call; outcome is 'ok', 'error' or 'rate_limited'"""
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return delay, 'rate_limited'
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, 'error'
+        return delay, 'ok'
+
+    def to_dict(self) -> Dict:
+        return {'latency': self.latency, 'jitter': self.jitter, 'error_rate': self.error_rate,
+                'rate_limit_rate': self.rate_limit_rate, 'retry_after': self.retry_after}
+
+class FakeResponse:
+    """The parts of requests.Response the bot uses"""
+
+    def __init__(self, status_code: int, payload=None, headers: Optional[Dict] = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+        self.text = json.dumps(payload) if payload is not None else ""
+
+    def json(self):
+        return self._payload
+
+def _place(name: str):
+    """Deterministic coordinates for a city name"""
+    digest = zlib.crc32(name.lower().encode())
+    return round((digest % 14000) / 100 - 70, 4), round((digest // 14000 % 36000) / 100 - 180, 4)
+
+def _observation(name: str, lat: float, lon: float, offset: int = 0) -> Dict:
+    seed = int(abs(lat * 100) + abs(lon * 100)) + offset
+    return {
+        'dt': 1704067200 + offset * 10800,
+        'main': {'temp': round(-5 + seed % 350 / 10, 1), 'humidity': 30 + seed % 60, 'pressure': 990 + seed % 40},
+        'weather': [{'description': DESCRIPTIONS[seed % len(DESCRIPTIONS)]}],
+        'wind': {'speed': seed % 150 / 10, 'deg': seed % 360},
+        'pop': seed % 100 / 100,
+        'name': name
+    }
+
+class FakeSession:
+    """Answers geocoding, /weather and /forecast calls like OpenWeatherMap"""
+
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.calls = {'direct': 0, 'weather': 0, 'forecast': 0}
+        self.status_counts: Dict[int, int] = {}
+        self._names: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, params: Optional[Dict] = None, timeout: Optional[float] = None) -> FakeResponse:
+        params = params or {}
+        endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+        delay, outcome = self.profile.draw()
+        if delay:
+            time.sleep(delay)
+
+        if outcome == 'rate_limited':
+            response = FakeResponse(429, {'cod': 429, 'message': 'rate limited'},
+                                    {'Retry-After': str(self.profile.retry_after)})
+        elif outcome == 'error':
+            response = FakeResponse(500, {'cod': 500, 'message': 'internal error'})
+        elif endpoint == 'direct':
+            response = FakeResponse(200, self._geocode(params['q']))
+        elif endpoint == 'weather':
+            response = FakeResponse(200, self._weather(params['lat'], params['lon']))
+        elif endpoint == 'forecast':
+            response = FakeResponse(200, self._forecast(params['lat'], params['lon'], params.get('cnt', 40)))
+        else:
+            response = FakeResponse(404, {'cod': 404, 'message': 'not found'})
+
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            self.status_counts[response.status_code] = self.status_counts.get(response.status_code, 0) + 1
+        return response
+
+    def _geocode(self, query: str):
+        name = query.split(',')[0].strip().title()
+        lat, lon = _place(name)
+        with self._lock:
+            self._names[(lat, lon)] = name
+        return [{'name': name, 'lat': lat, 'lon': lon, 'country': 'US'}]
+
+    def _weather(self, lat: float, lon: float):
+        return _observation(self._names.get((lat, lon), 'Bench City'), lat, lon)
+
+    def _forecast(self, lat: float, lon: float, count: int):
+        name = self._names.get((lat, lon), 'Bench City')
+        return {'city': {'name': name}, 'list': [_observation(name, lat, lon, i) for i in range(count)]}
+
+    def close(self):
+        pass
+
+class _Generated:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeGeminiModel:
+    """Answers generate_content calls like a Gemini GenerativeModel"""
+
+    def __init__(self, profile: UpstreamProfile, chunks: int = 4):
+        self.profile = profile
+        self.chunks = chunks
+        self.calls = 0
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        delay, outcome = self.profile.draw()
+        self.calls += 1
+        if outcome == 'rate_limited':
+            time.sleep(delay)
+            raise RuntimeError("429 Resource has been exhausted")
+        if outcome == 'error':
+            time.sleep(delay)
+            raise RuntimeError("500 Internal error")
+
+        text = f"Here is your weather update. {prompt[-80:]}"
+        if not stream:
+            time.sleep(delay)
+            return _Generated(text)
+        return self._stream(text, delay)
+
+    def _stream(self, text: str, delay: float) -> Iterator[_Generated]:
+        size = max(1, len(text) // self.chunks)
+        for start in range(0, len(text), size):
+            time.sleep(delay / self.chunks)
+            yield _Generated(text[start:start + size])
+
+@contextlib.contextmanager
+def fake_services(openweather: Optional[UpstreamProfile] = None, gemini: Optional[UpstreamProfile] = None,
+                  scheduler=None):
+    """
+    Route the bot's OpenWeatherMap and Gemini traffic to local fakes
+
+    The weather cache and response cache are replaced with empty in-memory
+    ones for the duration, so every run starts cold. The refresher and hot
+    set are replaced too, and the refresher is stopped on exit, so no
+    background refresh outlives the fakes and reaches the real APIs.
+
+    Yields:
+        (FakeSession, FakeGeminiModel)
+    """
+    session = FakeSession(openweather or UpstreamProfile())
+    model = FakeGeminiModel(gemini or UpstreamProfile())
+    transport = HttpTransport(scheduler=scheduler)
+    transport.session = session
+    refresher = BackgroundRefresher(Config.REFRESH_MAX_WORKERS)
+
+    with mock.patch.object(Config, 'OPENWEATHER_API_KEY', 'bench'), \
+            mock.patch.object(Config, 'GEMINI_API_KEY', 'bench'), \
+            mock.patch.object(Config, 'GAZETTEER_PATH', None), \
+            mock.patch.object(weather_bot, 'get_transport', return_value=transport), \
+            mock.patch.object(weather_bot, '_gemini_clients', {'bench': model}), \
+            mock.patch.object(weather_bot, '_cache', TieredCache(MemoryCache(Config.CACHE_MAX_ENTRIES))), \
+            mock.patch.object(weather_bot, '_gazetteer', None), \
+            mock.patch.object(weather_bot, '_gazetteer_loaded', True), \
+            mock.patch.object(weather_bot, '_response_cache', MemoryCache(Config.RESPONSE_CACHE_MAX_ENTRIES)), \
+            mock.patch.object(weather_bot, '_refresher', refresher), \
+            mock.patch.object(weather_bot, '_hot_set', HotSet(Config.PREFETCH_TOP_N)):
+        try:
+            yield session, model
+        finally:
+            refresher.close(wait=True)
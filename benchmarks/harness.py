@@ -0,0 +1,128 @@
+"""
+Latency/throughput measurement and JSON result files
+"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(q / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+class BenchResult:
+    """Latency distribution and throughput of one benchmark"""
+
+    def __init__(self, name: str, latencies: List[float], wall_seconds: float, errors: int = 0,
+                 extra: Optional[Dict] = None):
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.wall_seconds = wall_seconds
+        self.errors = errors
+        self.extra = extra or {}
+
+    def to_dict(self) -> Dict:
+        count = len(self.latencies)
+        return dict({
+            'name': self.name,
+            'count': count,
+            'errors': self.errors,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'throughput_per_sec': round(count / self.wall_seconds, 2) if self.wall_seconds else None,
+            'mean_ms': round(sum(self.latencies) / count * 1000, 4) if count else 0.0,
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 4),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 4),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 4),
+            'max_ms': round(self.latencies[-1] * 1000, 4) if count else 0.0
+        }, **self.extra)
+
+def measure(name: str, fn: Callable, inputs: Sequence, concurrency: int = 1, warmup: int = 0,
+            is_error: Optional[Callable] = None) -> BenchResult:
+    """
+    Time fn(item) for every item in inputs
+
+    Args:
+        name: Benchmark name
+        fn: Operation under test
+        inputs: One argument per call
+        concurrency: Threads issuing calls at once
+        warmup: Leading inputs run untimed first
+        is_error: Classifies a result as an error (exceptions always count)
+    """
+    for item in inputs[:warmup]:
+        fn(item)
+    inputs = inputs[warmup:]
+
+    def timed(item) -> tuple:
+        start = time.perf_counter()
+        try:
+            result = fn(item)
+            failed = bool(is_error and is_error(result))
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        outcomes = [timed(item) for item in inputs]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(timed, inputs))
+    wall = time.perf_counter() - start
+    return BenchResult(name, [latency for latency, _ in outcomes], wall,
+                       sum(1 for _, failed in outcomes if failed))
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def report(results: List[BenchResult], config: Optional[Dict] = None) -> Dict:
+    """Machine-readable run report"""
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'config': config or {},
+        'results': [result.to_dict() for result in results]
+    }
+
+def compare(baseline: Dict, current: Dict) -> List[Dict]:
+    """Per-benchmark change in p50/p95/p99 and throughput (positive = slower / more)"""
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    rows = []
+    for result in current.get('results', []):
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        row = {'name': result['name']}
+        for field in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_sec'):
+            old, new = before.get(field), result.get(field)
+            row[field] = round((new - old) / old * 100, 1) if old and new is not None else None
+        rows.append(row)
+    return rows
+
+def print_table(results: List[BenchResult]):
+    print(f"{'benchmark':<38} {'count':>7} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for result in results:
+        row = result.to_dict()
+        print(f"{row['name']:<38} {row['count']:>7} {row['throughput_per_sec'] or 0:>10.1f} "
+              f"{row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['errors']:>7}")
+
+def write_json(data: Dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
@@ -0,0 +1,296 @@
+"""
+Indexed alert rules evaluated against incoming forecasts
+
+Rules ("temp < 0 in Minneapolis within 24h", "wind > 15 m/s in cell dp3w")
+are indexed by scope (location name, geohash cell or anywhere), metric and
+direction, each bucket holding its thresholds in sorted order. For a new
+forecast, the engine takes the forecast's minimum and maximum of each metric and
+bisects every matching bucket, so only rules whose threshold is crossed
+somewhere in the forecast are checked against their time horizon.
+
+A rule fires once per location and then stays quiet until a forecast for that
+location no longer meets it or dedup_seconds have passed.
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+try:
+    from .geo import GEOHASH_ALPHABET, geohash_encode
+except ImportError:
+    from geo import GEOHASH_ALPHABET, geohash_encode
+
+logger = logging.getLogger('weather_bot.alerts')
+
+METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed', 'wind_direction', 'pop')
+
+METRIC_ALIASES = {
+    'temp': 'temperature',
+    'wind': 'wind_speed',
+    'wind speed': 'wind_speed',
+    'rain': 'pop',
+    'precipitation': 'pop'
+}
+
+OPERATORS = {
+    '<': lambda value, threshold: value < threshold,
+    '<=': lambda value, threshold: value <= threshold,
+    '>': lambda value, threshold: value > threshold,
+    '>=': lambda value, threshold: value >= threshold
+}
+
+ANYWHERE = ('any', '')
+
+_RULE_PATTERN = re.compile(
+    r"^\s*(?P<metric>[a-z][a-z_ ]*?)\s*(?P<op><=|>=|<|>)\s*(?P<value>-?\d+(?:\.\d+)?)"
+    r"(?:\s*(?P<unit>m/s|km/h|%|°c|c|hpa)(?![a-z]))?"
+    r"(?:\s+(?:(?P<anywhere>anywhere)(?:\s+in\s+(?:grid\s+)?cell\s+(?P<any_cell>[0-9a-z]+))?"
+    r"|in\s+(?:grid\s+)?cell\s+(?P<cell>[0-9a-z]+)"
+    r"|in\s+(?P<location>.+?)))?"
+    r"(?:\s+within\s+(?P<hours>\d+(?:\.\d+)?)\s*h(?:ours?)?)?\s*$",
+    re.IGNORECASE)
+
+class AlertRule(NamedTuple):
+    """One subscriber condition; exactly one of location and cell, or neither for anywhere"""
+    rule_id: str
+    metric: str
+    op: str
+    threshold: float
+    location: Optional[str] = None
+    cell: Optional[str] = None
+    within_hours: Optional[float] = None
+    subscriber: Optional[str] = None
+
+    @classmethod
+    def parse(cls, rule_id: str, text: str, subscriber: Optional[str] = None) -> 'AlertRule':
+        """
+        Parse "<metric> <op> <value>[unit] [in <location> | in cell <geohash> | anywhere] [within <N>h]"
+
+        Metrics may use the aliases temp, wind and rain; a percentage for
+        rain/pop is converted to the 0-1 probability the forecast uses.
+        """
+        match = _RULE_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"Cannot parse alert rule: {text!r}")
+        metric = match['metric'].strip().lower()
+        metric = METRIC_ALIASES.get(metric, metric)
+        threshold = float(match['value'])
+        if metric == 'pop' and match['unit'] == '%':
+            threshold /= 100
+        hours = match['hours']
+        return cls(rule_id, metric, match['op'], threshold, match['location'],
+                   (match['cell'] or match['any_cell'] or '').lower() or None,
+                   float(hours) if hours else None, subscriber)
+
+    def scope(self) -> Tuple[str, str]:
+        if self.location:
+            return 'location', _normalize(self.location)
+        if self.cell:
+            return 'cell', self.cell
+        return ANYWHERE
+
+class Alert(NamedTuple):
+    """A rule met by a forecast: the first slot meeting it and its value"""
+    rule: AlertRule
+    location: str
+    value: float
+    at: str
+    fired_at: float
+
+def _normalize(name: str) -> str:
+    return ' '.join(name.split()).casefold()
+
+def _slot_epoch(slot: Dict) -> float:
+    """Slot 'datetime' strings are the UTC times of the forecast endpoint"""
+    return datetime.strptime(slot['datetime'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+class _Thresholds:
+    """Rule ids of one index bucket, sorted by threshold"""
+
+    __slots__ = ('thresholds', 'rule_ids')
+
+    def __init__(self):
+        self.thresholds: List[float] = []
+        self.rule_ids: List[str] = []
+
+    def add(self, threshold: float, rule_id: str):
+        i = bisect.bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.rule_ids.insert(i, rule_id)
+
+    def remove(self, threshold: float, rule_id: str):
+        i = bisect.bisect_left(self.thresholds, threshold)
+        while self.rule_ids[i] != rule_id:
+            i += 1
+        del self.thresholds[i]
+        del self.rule_ids[i]
+
+    def at_most(self, value: float) -> List[str]:
+        return self.rule_ids[:bisect.bisect_right(self.thresholds, value)]
+
+    def at_least(self, value: float) -> List[str]:
+        return self.rule_ids[bisect.bisect_left(self.thresholds, value):]
+
+class AlertEngine:
+    """Rule index, forecast evaluation and alert deduplication"""
+
+    def __init__(self, dedup_seconds: float = 6 * 60 * 60):
+        self.dedup_seconds = dedup_seconds
+        self.handlers: List[Callable[[Alert], None]] = []
+        self.stats = {'evaluations': 0, 'candidates': 0, 'fired': 0, 'suppressed': 0, 'handler_errors': 0}
+        self._rules: Dict[str, AlertRule] = {}
+        # (scope, metric, rising) -> thresholds; rising rules use > / >=
+        self._index: Dict[Tuple[Tuple[str, str], str, bool], _Thresholds] = {}
+        self._metrics: Dict[str, int] = {}
+        self._cell_precisions: Dict[int, int] = {}
+        # location -> {rule_id: fired_at} for alerts still suppressed
+        self._active: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def add_rule(self, rule: AlertRule):
+        """Index a rule, replacing any rule with the same id"""
+        if rule.metric not in METRICS:
+            raise ValueError(f"Unknown metric: {rule.metric}")
+        if rule.op not in OPERATORS:
+            raise ValueError(f"Unknown operator: {rule.op}")
+        if rule.cell and any(char not in GEOHASH_ALPHABET for char in rule.cell):
+            raise ValueError(f"Invalid geohash cell: {rule.cell}")
+        with self._lock:
+            if rule.rule_id in self._rules:
+                self._unindex(self._rules[rule.rule_id])
+            self._rules[rule.rule_id] = rule
+            key = (rule.scope(), rule.metric, rule.op in ('>', '>='))
+            bucket = self._index.get(key)
+            if bucket is None:
+                bucket = self._index[key] = _Thresholds()
+            bucket.add(rule.threshold, rule.rule_id)
+            self._metrics[rule.metric] = self._metrics.get(rule.metric, 0) + 1
+            if rule.cell:
+                self._cell_precisions[len(rule.cell)] = self._cell_precisions.get(len(rule.cell), 0) + 1
+
+    def remove_rule(self, rule_id: str) -> bool:
+        with self._lock:
+            rule = self._rules.pop(rule_id, None)
+            if rule is None:
+                return False
+            self._unindex(rule)
+            return True
+
+    def add_handler(self, handler: Callable[[Alert], None]):
+        """Call handler(alert) for every alert that fires"""
+        self.handlers.append(handler)
+
+    def evaluate(self, forecast_data: Dict, lat: Optional[float] = None, lon: Optional[float] = None,
+                 now: Optional[float] = None) -> List[Alert]:
+        """
+        Check a fetch_weather_forecast result against the indexed rules
+
+        Args:
+            forecast_data: Dict with 'location' and 'forecast' slots
+            lat, lon: Forecast coordinates, needed for cell rules
+            now: Current Unix time, the start of every rule's horizon
+
+        Returns:
+            Alerts that fired and were not suppressed as duplicates
+        """
+        now = time.time() if now is None else now
+        slots = forecast_data.get('forecast') or []
+        name = forecast_data.get('location') or ''
+        target = f"{lat:.4f},{lon:.4f}" if lat is not None and lon is not None else _normalize(name)
+        times = [_slot_epoch(slot) for slot in slots]
+
+        fired: List[Alert] = []
+        met: Set[str] = set()
+        with self._lock:
+            self.stats['evaluations'] += 1
+            scopes = [ANYWHERE]
+            if name:
+                scopes.append(('location', _normalize(name)))
+            if lat is not None and lon is not None and self._cell_precisions:
+                geohash = geohash_encode(lat, lon, max(self._cell_precisions))
+                scopes.extend(('cell', geohash[:precision]) for precision in self._cell_precisions)
+
+            for metric in self._metrics:
+                values = [slot.get(metric) for slot in slots]
+                present = [value for value in values if value is not None]
+                if not present:
+                    continue
+                low, high = min(present), max(present)
+                for scope in scopes:
+                    rising = self._index.get((scope, metric, True))
+                    falling = self._index.get((scope, metric, False))
+                    candidates = (rising.at_most(high) if rising else []) + (falling.at_least(low) if falling else [])
+                    self.stats['candidates'] += len(candidates)
+                    for rule_id in candidates:
+                        rule = self._rules[rule_id]
+                        hit = self._first_hit(rule, values, times, now)
+                        if hit is None:
+                            continue
+                        met.add(rule_id)
+                        alert = Alert(rule, name or target, values[hit], slots[hit]['datetime'], now)
+                        if self._should_fire(target, rule_id, now):
+                            fired.append(alert)
+
+            # Rules this location no longer meets are re-armed
+            active = self._active.get(target)
+            if active:
+                for rule_id in [rule_id for rule_id in active if rule_id not in met]:
+                    del active[rule_id]
+                if not active:
+                    del self._active[target]
+            self.stats['fired'] += len(fired)
+
+        for alert in fired:
+            for handler in list(self.handlers):
+                try:
+                    handler(alert)
+                except Exception:
+                    logger.exception("Alert handler %r failed for rule %s", handler, alert.rule.rule_id)
+                    with self._lock:
+                        self.stats['handler_errors'] += 1
+        return fired
+
+    def _first_hit(self, rule: AlertRule, values: List, times: List[float], now: float) -> Optional[int]:
+        """Index of the first slot within the rule's horizon that meets it"""
+        check = OPERATORS[rule.op]
+        horizon = now + rule.within_hours * 3600 if rule.within_hours is not None else None
+        for i, value in enumerate(values):
+            if horizon is not None and times[i] > horizon:
+                return None
+            if value is not None and check(value, rule.threshold):
+                return i
+        return None
+
+    def _should_fire(self, target: str, rule_id: str, now: float) -> bool:
+        active = self._active.setdefault(target, {})
+        fired_at = active.get(rule_id)
+        if fired_at is not None and now - fired_at < self.dedup_seconds:
+            self.stats['suppressed'] += 1
+            return False
+        active[rule_id] = now
+        return True
+
+    def _unindex(self, rule: AlertRule):
+        key = (rule.scope(), rule.metric, rule.op in ('>', '>='))
+        bucket = self._index[key]
+        bucket.remove(rule.threshold, rule.rule_id)
+        if not bucket.thresholds:
+            del self._index[key]
+        self._metrics[rule.metric] -= 1
+        if not self._metrics[rule.metric]:
+            del self._metrics[rule.metric]
+        if rule.cell:
+            precision = len(rule.cell)
+            self._cell_precisions[precision] -= 1
+            if not self._cell_precisions[precision]:
+                del self._cell_precisions[precision]
+        for active in self._active.values():
+            active.pop(rule.rule_id, None)
@@ -0,0 +1,247 @@
+"""
+Two-tier TTL cache for weather data
+
+An in-process LRU tier with a hard entry/byte cap sits in front of an optional
+SQLite tier that survives restarts. Both tiers honour per-entry TTLs and keep
+hit/miss/eviction counters. An entry may be given a stale window past its TTL
+during which it is still served but reported as stale, so callers can refresh
+it in the background (stale-while-revalidate).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+def _to_json(value: Any) -> Any:
+    """json.dumps fallback: records serialize as dicts, anything else as a string"""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    return str(value)
+
+class CacheStats:
+    """Hit/miss/eviction counters for one cache tier"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+class MemoryCache:
+    """Thread-safe LRU cache with per-entry TTL and an entry/byte cap"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """Return (value, expires_at, stale_at), or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            value, expires_at, stale_at, size = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value, expires_at, stale_at
+
+    def set(self, key: str, value: Any, ttl_seconds: float, stale_seconds: float = 0):
+        """
+        Store a value, evicting least recently used entries
+
+        The entry is fresh for ttl_seconds and then served as stale for a
+        further stale_seconds before it expires.
+        """
+        size = len(json.dumps(value, default=_to_json)) if self.max_bytes else 0
+        stale_at = time.time() + ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, stale_at + stale_seconds, stale_at, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def remaining_ttl(self, key: str) -> Optional[float]:
+        """Seconds until an entry expires, or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[1] - time.time()
+
+    def stale_in(self, key: str) -> Optional[float]:
+        """Seconds until an entry goes stale (negative once stale), or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[2] - time.time()
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        size = self._entries.pop(key)[-1]
+        self._bytes -= size
+
+class SQLiteCache:
+    """Persistent cache tier backed by a SQLite file"""
+
+    TIER = 'disk'
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, stale_at REAL)")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}
+            if 'stale_at' not in columns:
+                self._conn.execute("ALTER TABLE cache ADD COLUMN stale_at REAL")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[tuple]:
+        """Return (value, expires_at), or None if missing or expired"""
+        entry = self.get_entry(key)
+        return None if entry is None else entry[:2]
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """Return (value, expires_at, stale_at), or None if missing or expired"""
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at, stale_at FROM cache WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            value, expires_at, stale_at = row
+            if expires_at <= time.time():
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self.stats.hits += 1
+            return json.loads(value), expires_at, expires_at if stale_at is None else stale_at
+
+    def set(self, key: str, value: Any, ttl_seconds: float, stale_seconds: float = 0):
+        """Store a JSON-serializable value, fresh for ttl_seconds and stale for stale_seconds more"""
+        payload = json.dumps(value, default=_to_json)
+        stale_at = time.time() + ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_at) VALUES (?, ?, ?, ?)",
+                (key, payload, stale_at + stale_seconds, stale_at))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                cursor = self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+                self.stats.expirations += cursor.rowcount
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class TieredCache:
+    """Memory LRU tier in front of an optional persistent (SQLiteCache) or shared (SharedCache) tier"""
+
+    def __init__(self, memory: MemoryCache, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """Return (value, expires_at, stale_at), promoting disk hits to memory"""
+        entry = self.memory.get_entry(key)
+        if entry is not None or self.disk is None:
+            return entry
+
+        entry = self.disk.get_entry(key)
+        if entry is None:
+            return None
+
+        value, expires_at, stale_at = entry
+        self.memory.set(key, value, stale_at - time.time(), expires_at - stale_at)
+        return entry
+
+    def set(self, key: str, value: Any, ttl_seconds: float, stale_seconds: float = 0):
+        self.memory.set(key, value, ttl_seconds, stale_seconds)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl_seconds, stale_seconds)
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Counters per tier"""
+        stats = {'memory': self.memory.stats.as_dict()}
+        stats['memory']['entries'] = len(self.memory)
+        if self.disk is not None:
+            stats[self.disk.TIER] = self.disk.stats.as_dict()
+        return stats
\ No newline at end of file
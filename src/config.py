@@ -1,14 +1,35 @@
 import os
-from dotenv import load_dotenv
+import threading
 
-# Load environment variables from .env file
-load_dotenv()
+_dotenv_loaded = False
+_dotenv_lock = threading.Lock()
+
+def _load_dotenv_once():
+    """Load environment variables from the .env file, the first time a setting needs them"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        with _dotenv_lock:
+            if not _dotenv_loaded:
+                from dotenv import load_dotenv
+                load_dotenv()
+                _dotenv_loaded = True
+
+class _Env:
+    """Config attribute read from the environment on access, so importing config stays cheap"""
+
+    def __init__(self, name: str, default=None):
+        self.name = name
+        self.default = default
+
+    def __get__(self, instance, owner):
+        _load_dotenv_once()
+        return os.environ.get(self.name, self.default)
 
 class Config:
     """Configuration management for Weather Bot"""
     
-    OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
-    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    OPENWEATHER_API_KEY = _Env('OPENWEATHER_API_KEY')
+    GEMINI_API_KEY = _Env('GEMINI_API_KEY')
     
     # API URLs
     OPENWEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5"
@@ -17,7 +38,112 @@ class Config:
     # Default settings
     DEFAULT_UNITS = "metric"
     CACHE_DURATION_MINUTES = 10
+    GEOCODE_CACHE_DURATION_MINUTES = 24 * 60
     MAX_FORECAST_DAYS = 5
+    
+    # Cache settings (set WEATHER_BOT_CACHE_DB to persist the cache across restarts)
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_MAX_BYTES = None
+    CACHE_DB_PATH = _Env('WEATHER_BOT_CACHE_DB')
+    
+    # Stale-while-revalidate: weather entries are still served for CACHE_STALE_MINUTES
+    # past their TTL while a background refresh fetches a fresh copy
+    CACHE_STALE_MINUTES = 10
+    REFRESH_MAX_WORKERS = 2
+    
+    # Hot-location prefetch (opt-in, see weather_bot.start_prefetch): the PREFETCH_TOP_N
+    # most requested entries are refreshed before they go stale. Popularity is tracked
+    # with a count-min sketch; locations not requested for HOT_SET_IDLE_SECONDS drop out.
+    PREFETCH_TOP_N = 0
+    PREFETCH_INTERVAL_SECONDS = 30
+    HOT_SET_SKETCH_WIDTH = 2048
+    HOT_SET_SKETCH_DEPTH = 4
+    HOT_SET_DECAY_EVERY = 10000
+    HOT_SET_IDLE_SECONDS = 15 * 60
+    
+    # Snap coordinates to a grid before caching/fetching: None, "geohash" or "degrees"
+    GRID_MODE = None
+    GRID_GEOHASH_PRECISION = 5
+    GRID_STEP_DEGREES = 0.05
+    
+    # Offline gazetteer (index file or .csv/.json dump) consulted before the geocoding API
+    GAZETTEER_PATH = _Env('WEATHER_BOT_GAZETTEER')
+    GAZETTEER_WRITE_BACK = False
+    
+    # HTTP transport settings
+    HTTP_POOL_SIZE = 10
+    HTTP_TIMEOUT_SECONDS = 10
+    HTTP_MAX_RETRIES = 3
+    HTTP_BACKOFF_SECONDS = 0.5
+    
+    # Request quotas per API key, in requests per minute (None = unlimited).
+    # Free tiers are roughly 60/min for OpenWeatherMap and 15/min for Gemini.
+    OPENWEATHER_REQUESTS_PER_MINUTE = None
+    GEMINI_REQUESTS_PER_MINUTE = None
+    ENDPOINT_REQUESTS_PER_MINUTE = {}   # e.g. {"openweather:forecast": 30}
+    QUOTA_MAX_QUEUE = 100
+    QUOTA_INTERACTIVE_TIMEOUT_SECONDS = 5
+    QUOTA_BACKGROUND_TIMEOUT_SECONDS = 60
+    
+    # Gemini settings
+    GEMINI_MODEL = "gemini-1.5-flash"
+    
+    # Gemini response cache: answers are reused while the bucketed weather is unchanged
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_MAX_ENTRIES = 4096
+    RESPONSE_CACHE_MINUTES = 30
+    RESPONSE_TEMPERATURE_BUCKET = 1.0
+    
+    # Per-query latency budget in seconds (None disables it). When Gemini has not
+    # answered by the deadline the template fallback response is returned instead.
+    QUERY_LATENCY_BUDGET_SECONDS = None
+    # Gemini calls allowed to wait for a free GEMINI_MAX_CONCURRENCY slot; beyond
+    # that a budgeted query gets the fallback response at once
+    GEMINI_MAX_QUEUE = 16
+    
+    # Per-stage timings, cache/upstream counters and the Prometheus dump (see metrics.py)
+    METRICS_ENABLED = True
+    
+    # Interaction log: JSONL written by a background thread (unset = weather_bot.interactions logger)
+    INTERACTION_LOG_PATH = _Env('WEATHER_BOT_INTERACTION_LOG')
+    INTERACTION_LOG_MAX_QUEUE = 10000
+    INTERACTION_LOG_BATCH_SIZE = 500
+    INTERACTION_LOG_FLUSH_SECONDS = 1.0
+    INTERACTION_LOG_MAX_BYTES = 100 * 1024 * 1024
+    INTERACTION_LOG_ROTATE_SECONDS = 24 * 60 * 60
+    INTERACTION_LOG_COMPRESSION = "gzip"   # "gzip", "zstd" (needs zstandard) or None
+    INTERACTION_LOG_FULL_POLICY = "drop"   # "drop" or "block" when the queue is full
+    
+    # Observation history: columnar store of every fetched observation and forecast
+    # slot (see history.py, needs numpy; unset = not recorded)
+    HISTORY_PATH = _Env('WEATHER_BOT_HISTORY')
+    HISTORY_SEGMENT_ROWS = 100_000
+    HISTORY_RECORD_FORECASTS = True
+    
+    # Forecast alerts (see alerts.py): rules added to weather_bot.get_alert_engine()
+    # are checked against every forecast fetched from upstream
+    ALERT_DEDUP_SECONDS = 6 * 60 * 60
+    
+    # HTTP service (python -m src.server)
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8080
+    SERVER_WORKERS = 1
+    SERVER_REQUEST_TIMEOUT_SECONDS = 30
+    SERVER_KEEPALIVE_SECONDS = 15
+    SERVER_SHUTDOWN_GRACE_SECONDS = 10
+    SERVER_MAX_BODY_BYTES = 1024 * 1024
+    SERVER_MAX_BATCH = 100
+    
+    # Worker processes (see worker_pool.py) and the cache tier they share (shared_cache.py)
+    WORKER_POOL_SIZE = None   # None = os.cpu_count()
+    WORKER_START_METHOD = "spawn"   # workers start clean rather than forking a threaded parent
+    SHARED_CACHE_SLOTS = 4096
+    SHARED_CACHE_SLOT_BYTES = 16 * 1024   # largest shared entry; a 5-day forecast is ~7 KB
+    
+    # Batch query concurrency limits
+    MAX_CONCURRENT_QUERIES = 64
+    OPENWEATHER_MAX_CONCURRENCY = 16
+    GEMINI_MAX_CONCURRENCY = 4
 
 def load_configuration():
     """Load and validate configuration"""
@@ -0,0 +1,134 @@
+"""
+Columnar forecast representation backed by NumPy arrays
+
+Requires the optional numpy dependency. Converts to and from the dict shape
+returned by fetch_weather_forecast and expected by create_fallback_response.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from .utils import WIND_DIRECTIONS
+except ImportError:
+    from utils import WIND_DIRECTIONS
+
+NUMERIC_FIELDS = ('temperature', 'humidity', 'pressure', 'wind_speed', 'wind_direction', 'pop')
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for columnar forecasts: pip install numpy")
+
+def convert_units_array(celsius) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Vectorized convert_units: Celsius array to (celsius, fahrenheit, kelvin) arrays"""
+    _require_numpy()
+    celsius = np.asarray(celsius, dtype=np.float64)
+    return celsius, np.round(celsius * 9 / 5 + 32, 2), np.round(celsius + 273.15, 2)
+
+def wind_sectors_array(degrees) -> "np.ndarray":
+    """Vectorized calculate_wind_direction: bearings to compass labels ('' where missing)"""
+    _require_numpy()
+    degrees = np.asarray(degrees, dtype=np.float64)
+    missing = np.isnan(degrees)
+    index = ((np.mod(np.where(missing, 0, degrees), 360) + 22.5) // 45).astype(np.int64) % 8
+    labels = np.array(WIND_DIRECTIONS, dtype=object)[index]
+    labels[missing] = ''
+    return labels
+
+class ForecastColumns:
+    """One forecast as parallel arrays of 3-hour slots"""
+
+    def __init__(self, location: Optional[str], timestamps, descriptions, **columns):
+        _require_numpy()
+        self.location = location
+        self.timestamps = np.asarray(timestamps, dtype='datetime64[s]')
+        self.descriptions = np.asarray(descriptions, dtype=object)
+        for field in NUMERIC_FIELDS:
+            values = columns.get(field)
+            if values is None:
+                values = np.full(len(self.timestamps), np.nan)
+            setattr(self, field, np.asarray(values, dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_forecast(cls, forecast_data: Dict) -> 'ForecastColumns':
+        """Build columns from the dict returned by fetch_weather_forecast"""
+        slots = forecast_data.get('forecast', [])
+        columns = {
+            field: [np.nan if slot.get(field) is None else slot[field] for slot in slots]
+            for field in NUMERIC_FIELDS
+        }
+        return cls(forecast_data.get('location'),
+                   [slot['datetime'] for slot in slots],
+                   [slot.get('description') for slot in slots],
+                   **columns)
+
+    def to_forecast(self) -> Dict:
+        """Convert back to the fetch_weather_forecast / create_fallback_response dict shape"""
+        datetimes = np.datetime_as_string(self.timestamps, unit='s')
+        numeric = {field: getattr(self, field).tolist() for field in NUMERIC_FIELDS}
+        slots = []
+        for i in range(len(self)):
+            slot = {'datetime': str(datetimes[i]).replace('T', ' ')}
+            for field in NUMERIC_FIELDS:
+                value = numeric[field][i]
+                slot[field] = None if value != value else value
+            slot['description'] = self.descriptions[i]
+            slots.append(slot)
+        return {'location': self.location, 'forecast': slots}
+
+    def temperatures(self) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """Temperatures as (celsius, fahrenheit, kelvin) arrays"""
+        return convert_units_array(self.temperature)
+
+    def wind_sectors(self) -> "np.ndarray":
+        """Compass label for every slot"""
+        return wind_sectors_array(self.wind_direction)
+
+    def daily_summary(self) -> List[Dict]:
+        """
+        Per-day aggregates
+
+        Returns:
+            One dict per calendar day with temp_min, temp_max, temp_mean,
+            humidity_mean, wind_speed_max and pop_max (NaN slots ignored)
+        """
+        if not len(self):
+            return []
+
+        order = np.argsort(self.timestamps, kind='stable')
+        days = self.timestamps[order].astype('datetime64[D]')
+        unique_days, starts = np.unique(days, return_index=True)
+        counts = np.diff(np.append(starts, len(days)))
+
+        def reduce(values, how):
+            values = values[order]
+            valid = ~np.isnan(values)
+            valid_counts = np.add.reduceat(valid.astype(np.int64), starts)
+            if how == 'mean':
+                result = np.add.reduceat(np.where(valid, values, 0.0), starts) / np.maximum(valid_counts, 1)
+            elif how == 'min':
+                result = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+            else:
+                result = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+            return np.where(valid_counts > 0, result, np.nan)
+
+        aggregates = {
+            'temp_min': reduce(self.temperature, 'min'),
+            'temp_max': reduce(self.temperature, 'max'),
+            'temp_mean': reduce(self.temperature, 'mean'),
+            'humidity_mean': reduce(self.humidity, 'mean'),
+            'wind_speed_max': reduce(self.wind_speed, 'max'),
+            'pop_max': reduce(self.pop, 'max')
+        }
+        return [
+            dict({'date': str(day), 'slots': int(count)},
+                 **{name: float(values[i]) for name, values in aggregates.items()})
+            for i, (day, count) in enumerate(zip(unique_days, counts))
+        ]
\ No newline at end of file
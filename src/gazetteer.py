@@ -0,0 +1,254 @@
+"""
+Offline gazetteer for resolving city names without the geocoding API
+
+Entries are loaded from a CSV or JSON dump (or an index file written by
+Gazetteer.save) and looked up by "City", "City, State" or "City, Country".
+Partial and misspelled names fall back to a prefix unique to one name and
+covering most of it, then to trigram candidates confirmed by edit distance; an
+ambiguous or distant match is left to the geocoding API rather than guessed.
+"""
+
+import bisect
+import csv
+import gzip
+import json
+import sys
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .utils import clean_location_string
+except ImportError:
+    from utils import clean_location_string
+
+INDEX_VERSION = 1
+FIELDS = ('name', 'lat', 'lon', 'country', 'state', 'population')
+
+# Common ways of writing a country that differ from its ISO code
+COUNTRY_ALIASES = {
+    'uk': 'gb',
+    'united kingdom': 'gb',
+    'england': 'gb',
+    'usa': 'us',
+    'united states': 'us'
+}
+
+def normalize(text: str) -> str:
+    """Normalize a place name for index lookups"""
+    return clean_location_string(text or '').strip(' ,').lower()
+
+def trigrams(text: str) -> set:
+    """Character trigrams of a padded, normalized string"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_similarity(a: str, b: str) -> float:
+    """1 - Levenshtein distance / length of the longer string"""
+    if not a or not b:
+        return 0.0
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return 1 - previous[-1] / max(len(a), len(b))
+
+class Gazetteer:
+    """In-memory place index with exact, prefix and trigram lookups"""
+
+    def __init__(self, min_similarity: float = 0.75, min_prefix_length: int = 4, min_margin: float = 0.1,
+                 min_trigram_overlap: float = 0.25, min_prefix_coverage: float = 0.6):
+        """
+        Args:
+            min_similarity: Smallest edit_similarity accepted for a misspelled name
+            min_prefix_length: Shortest query resolved by prefix
+            min_prefix_coverage: Fraction of a name a prefix query must cover
+            min_margin: How far the best fuzzy candidate must lead the next one
+            min_trigram_overlap: Trigram Jaccard score for a name to be a fuzzy candidate at all
+        """
+        self.min_similarity = min_similarity
+        self.min_prefix_length = min_prefix_length
+        self.min_prefix_coverage = min_prefix_coverage
+        self.min_margin = min_margin
+        self.min_trigram_overlap = min_trigram_overlap
+        self.dirty = False
+        self._entries: List[Tuple] = []
+        self._by_name: Dict[str, List[int]] = defaultdict(list)
+        self._sorted_names: List[str] = []
+        self._names_sorted = True
+        self._lock = threading.Lock()
+        self._trigrams: Dict[str, List[str]] = defaultdict(list)
+        self._gram_counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, name: str, lat: float, lon: float, country: Optional[str] = None,
+            state: Optional[str] = None, population: int = 0):
+        """Add a place to the index"""
+        key = normalize(name)
+        if not key:
+            return
+
+        with self._lock:
+            self._add(key, name, lat, lon, country, state, population)
+
+    def _add(self, key, name, lat, lon, country, state, population):
+        for entry_id in self._by_name.get(key, ()):
+            entry = self._entries[entry_id]
+            if entry[3] == (country or '').lower() and entry[4] == normalize(state):
+                return
+
+        entry_id = len(self._entries)
+        self._entries.append((name, float(lat), float(lon), (country or '').lower(),
+                              normalize(state), int(population or 0)))
+        if key not in self._by_name:
+            self._sorted_names.append(key)
+            self._names_sorted = False
+            grams = trigrams(key)
+            self._gram_counts[key] = len(grams)
+            for gram in grams:
+                self._trigrams[gram].append(key)
+        self._by_name[key].append(entry_id)
+        self.dirty = True
+
+    def lookup(self, location: str) -> Optional[Tuple[float, float, str]]:
+        """
+        Resolve a location string
+
+        Args:
+            location: "City", "City, State" or "City, Country"
+
+        Returns:
+            Tuple of (latitude, longitude, name), or None on an index miss
+        """
+        city, _, qualifier = normalize(location).partition(',')
+        city, qualifier = city.strip(), qualifier.strip()
+        if not city:
+            return None
+
+        qualifier = COUNTRY_ALIASES.get(qualifier, qualifier)
+        entry_id = self._best(self._by_name.get(city, ()), qualifier)
+        if entry_id is None:
+            entry_id = self._prefix_match(city, qualifier)
+        if entry_id is None:
+            entry_id = self._fuzzy_match(city, qualifier)
+        if entry_id is None:
+            return None
+
+        name, lat, lon = self._entries[entry_id][:3]
+        return lat, lon, name
+
+    def _best(self, entry_ids, qualifier: str) -> Optional[int]:
+        """Most populous entry matching the state/country qualifier"""
+        candidates = [i for i in entry_ids
+                      if not qualifier or qualifier in (self._entries[i][3], self._entries[i][4])]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda i: self._entries[i][5])
+
+    def _prefix_match(self, city: str, qualifier: str) -> Optional[int]:
+        if len(city) < self.min_prefix_length:
+            return None
+        if not self._names_sorted:
+            with self._lock:
+                self._sorted_names.sort()
+                self._names_sorted = True
+
+        # "San Fran" -> "San Francisco", but not "Nice" -> "Niceville": a short
+        # prefix of a longer name is more likely an unindexed city, and one
+        # shared by several names is ambiguous
+        position = bisect.bisect_left(self._sorted_names, city)
+        names = self._sorted_names[position:position + 2]
+        if not names or not names[0].startswith(city):
+            return None
+        if len(names) > 1 and names[1].startswith(city):
+            return None
+        if len(city) / len(names[0]) < self.min_prefix_coverage:
+            return None
+        return self._best(self._by_name[names[0]], qualifier)
+
+    def _fuzzy_match(self, city: str, qualifier: str) -> Optional[int]:
+        """Closest name by edit distance among trigram candidates, if it clearly beats the rest"""
+        query_grams = trigrams(city)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for key in self._trigrams.get(gram, ()):
+                shared[key] += 1
+
+        scored = []
+        for key, count in shared.items():
+            if count / (len(query_grams) + self._gram_counts[key] - count) < self.min_trigram_overlap:
+                continue
+            # The edit similarity can be no higher than the length ratio
+            if min(len(key), len(city)) / max(len(key), len(city)) < self.min_similarity:
+                continue
+            score = edit_similarity(city, key)
+            if score >= self.min_similarity:
+                scored.append((score, key))
+        if not scored:
+            return None
+
+        scored.sort(reverse=True)
+        best_score, best_key = scored[0]
+        if len(scored) > 1 and best_score - scored[1][0] < self.min_margin:
+            # No clear winner: let the geocoding API decide
+            return None
+        return self._best(self._by_name[best_key], qualifier)
+
+    @classmethod
+    def from_records(cls, records, **kwargs) -> 'Gazetteer':
+        """Build an index from dicts with name, lat, lon and optional country/state/population"""
+        gazetteer = cls(**kwargs)
+        for record in records:
+            gazetteer.add(record['name'], record['lat'], record['lon'], record.get('country'),
+                          record.get('state'), record.get('population') or 0)
+        gazetteer.dirty = False
+        return gazetteer
+
+    @classmethod
+    def from_csv(cls, path: str, **kwargs) -> 'Gazetteer':
+        """Load a CSV dump with a header row naming the FIELDS columns"""
+        with open(path, newline='', encoding='utf-8') as handle:
+            return cls.from_records(csv.DictReader(handle), **kwargs)
+
+    @classmethod
+    def from_json(cls, path: str, **kwargs) -> 'Gazetteer':
+        """Load a JSON list of records (the geocoding API response format works as-is)"""
+        with open(path, encoding='utf-8') as handle:
+            return cls.from_records(json.load(handle), **kwargs)
+
+    def save(self, path: str):
+        """Write a compact gzip'd columnar index file"""
+        columns = {field: [entry[i] for entry in self._entries] for i, field in enumerate(FIELDS)}
+        with gzip.open(path, 'wt', encoding='utf-8') as handle:
+            json.dump({'version': INDEX_VERSION, 'columns': columns}, handle, separators=(',', ':'))
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'Gazetteer':
+        """Load an index file written by save, or a .csv/.json dump"""
+        if path.endswith('.csv'):
+            return cls.from_csv(path, **kwargs)
+        if path.endswith('.json'):
+            return cls.from_json(path, **kwargs)
+
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            payload = json.load(handle)
+        if payload.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported gazetteer index version: {payload.get('version')}")
+
+        columns = payload['columns']
+        return cls.from_records((dict(zip(FIELDS, row)) for row in zip(*(columns[f] for f in FIELDS))),
+                                **kwargs)
+
+if __name__ == "__main__":
+    # Build an index file from a dump: python -m src.gazetteer cities.csv cities.idx
+    if len(sys.argv) != 3:
+        print("Usage: python -m src.gazetteer <dump.csv|dump.json> <index file>")
+        sys.exit(1)
+    index = Gazetteer.load(sys.argv[1])
+    index.save(sys.argv[2])
+    print(f"Wrote {len(index)} places to {sys.argv[2]}")
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Coordinate quantization so nearby points share cache entries and fetches
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(lat: float, lon: float, precision: int = 5) -> str:
+    """Encode coordinates as a geohash of the given length"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        value_range, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits <<= 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+def geohash_decode(geohash: str) -> Tuple[float, float]:
+    """Decode a geohash to the coordinates of its cell centre"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = mid
+            else:
+                value_range[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+def snap_to_grid(lat: float, lon: float, step: float) -> Tuple[float, float]:
+    """Snap coordinates to the centre of a step x step degree cell"""
+    def snap(value: float, limit: float) -> float:
+        centre = (math.floor(value / step) + 0.5) * step
+        return round(max(-limit, min(limit, centre)), 6)
+    return snap(lat, 90.0), snap(lon, 180.0)
+
+class GridQuantizer:
+    """
+    Snaps coordinates to a geohash or degree grid and counts deduplication
+
+    A request is counted as deduplicated when its cell was already requested
+    from different raw coordinates, i.e. it only shares a cache entry and an
+    upstream fetch because of the snapping.
+    """
+
+    def __init__(self, mode: Optional[str] = None, precision: int = 5, step: float = 0.05,
+                 max_tracked_cells: int = 10000):
+        if mode not in (None, 'geohash', 'degrees'):
+            raise ValueError(f"Unknown grid mode: {mode}")
+        self.mode = mode
+        self.precision = precision
+        self.step = step
+        self.max_tracked_cells = max_tracked_cells
+        self.requests = 0
+        self.deduplicated = 0
+        self._cells: "OrderedDict[Tuple[float, float], Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snap(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Return the grid cell centre for a coordinate pair (unchanged when disabled)"""
+        if self.mode is None:
+            return lat, lon
+
+        if self.mode == 'geohash':
+            cell = geohash_decode(geohash_encode(lat, lon, self.precision))
+        else:
+            cell = snap_to_grid(lat, lon, self.step)
+
+        with self._lock:
+            self.requests += 1
+            first_seen = self._cells.get(cell)
+            if first_seen is None:
+                self._cells[cell] = (lat, lon)
+                if len(self._cells) > self.max_tracked_cells:
+                    self._cells.popitem(last=False)
+            else:
+                self._cells.move_to_end(cell)
+                if first_seen != (lat, lon):
+                    self.deduplicated += 1
+        return cell
+
+    def stats(self) -> Dict[str, int]:
+        return {'requests': self.requests, 'deduplicated': self.deduplicated}
\ No newline at end of file
@@ -0,0 +1,506 @@
+"""
+Append-only, memory-mapped columnar store of fetched observations
+
+Requires the optional numpy dependency. Rows are keyed by location, kind
+(observation or forecast slot) and Unix timestamp, and hold the numeric
+weather fields as float32. Layout under the store directory:
+
+    locations.json            location keys and display names; row ids index this list
+    active/<column>.bin       append log for new rows, in arrival order
+    segments/<seq>.<gen>/     sealed segments sorted by (location, kind, timestamp)
+        <column>.bin          one raw array per column
+        index.npy             row offsets of every (location, kind) slot
+        meta.json             row count and timestamp bounds
+
+Once the append log reaches segment_rows it is sorted into a new segment.
+Queries memory-map the segments, use the slot index and a binary search to
+find the requested time range, and read only those rows. compact() merges
+every segment into one, one location at a time, keeping the newest value of
+duplicate (location, kind, timestamp) rows and dropping expired ones.
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from .forecast_columns import NUMERIC_FIELDS
+except ImportError:
+    from forecast_columns import NUMERIC_FIELDS
+
+OBSERVATION = 0
+FORECAST = 1
+KINDS = 2
+
+INTERVALS = {'hour': 3600, 'day': 86400}
+
+Timestamps = Union[Sequence[int], Sequence[str], "np.ndarray"]
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for the history store: pip install numpy")
+
+def _columns() -> Dict[str, "np.dtype"]:
+    columns = {'timestamp': np.dtype('<i8'), 'location': np.dtype('<i4'), 'kind': np.dtype('i1')}
+    columns.update((field, np.dtype('<f4')) for field in NUMERIC_FIELDS)
+    return columns
+
+def _epoch_seconds(timestamps: Timestamps) -> "np.ndarray":
+    """Unix seconds from epoch numbers, datetime64 values or 'YYYY-MM-DD HH:MM:SS' UTC strings"""
+    values = np.asarray(timestamps)
+    if values.dtype.kind in 'iuf':
+        return values.astype(np.int64)
+    return values.astype('datetime64[s]').astype(np.int64)
+
+def _keep_last(timestamps: "np.ndarray") -> "np.ndarray":
+    """Mask keeping the last row of each run of equal sorted timestamps"""
+    return np.append(timestamps[1:] != timestamps[:-1], True)
+
+class _Segment:
+    """A sealed, sorted segment, memory-mapped on first use"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.seq, self.gen = (int(part) for part in os.path.basename(path).split('.'))
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as handle:
+            meta = json.load(handle)
+        self.rows = meta['rows']
+        self.ts_min = meta['ts_min']
+        self.ts_max = meta['ts_max']
+        self.offsets = np.load(os.path.join(path, 'index.npy'))
+        self._maps: Dict[str, "np.ndarray"] = {}
+
+    def column(self, name: str) -> "np.ndarray":
+        mapped = self._maps.get(name)
+        if mapped is None:
+            dtype = _columns()[name]
+            if self.rows:
+                mapped = np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode='r',
+                                   shape=(self.rows,))
+            else:
+                mapped = np.empty(0, dtype=dtype)
+            self._maps[name] = mapped
+        return mapped
+
+    def bounds(self, slot: int) -> Tuple[int, int]:
+        """Row range of one (location, kind) slot"""
+        if slot + 1 >= len(self.offsets):
+            return 0, 0
+        return int(self.offsets[slot]), int(self.offsets[slot + 1])
+
+class HistoryStore:
+    """Columnar observation history in one directory"""
+
+    def __init__(self, path: str, segment_rows: int = 100_000):
+        """
+        Args:
+            path: Store directory (created if missing)
+            segment_rows: Rows buffered in the append log before it is sealed into a segment
+        """
+        _require_numpy()
+        self.path = path
+        self.segment_rows = segment_rows
+        self.stats = {'appended': 0, 'sealed': 0, 'compactions': 0}
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._active_dir = os.path.join(path, 'active')
+        self._segments_dir = os.path.join(path, 'segments')
+        os.makedirs(self._active_dir, exist_ok=True)
+        os.makedirs(self._segments_dir, exist_ok=True)
+
+        self._keys: List[str] = []
+        self._names: List[Optional[str]] = []
+        self._ids: Dict[str, int] = {}
+        self._load_locations()
+
+        for entry in os.listdir(self._segments_dir):
+            if entry.endswith('.tmp'):
+                shutil.rmtree(os.path.join(self._segments_dir, entry), ignore_errors=True)
+        self._segments = sorted((_Segment(os.path.join(self._segments_dir, entry))
+                                 for entry in os.listdir(self._segments_dir)),
+                                key=lambda segment: (segment.seq, segment.gen))
+        self._next_seq = max((segment.seq for segment in self._segments), default=0) + 1
+
+        self._handles = {}
+        self._active_rows = self._recover_active()
+        self._open_active('ab')
+
+    # Writing
+
+    def append(self, location: str, timestamps: Timestamps, kind: int = OBSERVATION,
+               name: Optional[str] = None, **columns) -> int:
+        """
+        Append rows for one location
+
+        Args:
+            location: Location key, e.g. "lat,lon" of the snapped coordinates
+            timestamps: One timestamp per row (Unix seconds, datetime64 or UTC strings)
+            kind: OBSERVATION or FORECAST
+            name: Display name recorded for the location
+            **columns: NUMERIC_FIELDS values per row (None or missing = NaN)
+
+        Returns:
+            Number of rows appended
+        """
+        timestamps = np.atleast_1d(_epoch_seconds(timestamps))
+        count = len(timestamps)
+        if not count:
+            return 0
+        arrays = {'timestamp': timestamps}
+        for field in NUMERIC_FIELDS:
+            values = columns.get(field)
+            if values is None:
+                arrays[field] = np.full(count, np.nan, dtype=np.float32)
+            else:
+                arrays[field] = np.array([np.nan if value is None else value for value in np.atleast_1d(values)],
+                                         dtype=np.float32)
+                if len(arrays[field]) != count:
+                    raise ValueError(f"{field} has {len(arrays[field])} values for {count} timestamps")
+
+        with self._lock:
+            location_id = self._location_id(location, name)
+            arrays['location'] = np.full(count, location_id)
+            arrays['kind'] = np.full(count, kind)
+            for column, dtype in _columns().items():
+                self._handles[column].write(np.asarray(arrays[column], dtype=dtype).tobytes())
+            self._active_rows += count
+            self.stats['appended'] += count
+            if self._active_rows >= self.segment_rows:
+                self._seal()
+        return count
+
+    def record_current(self, location: str, weather_data: Dict, timestamp: Optional[int] = None) -> int:
+        """Append one fetch_current_weather result (timestamp defaults to now)"""
+        return self.append(location, [timestamp if timestamp is not None else int(time.time())], OBSERVATION,
+                           weather_data.get('location'),
+                           **{field: [weather_data.get(field)] for field in NUMERIC_FIELDS})
+
+    def record_forecast(self, location: str, forecast_data: Dict, timestamps: Optional[Timestamps] = None) -> int:
+        """Append the slots of one fetch_weather_forecast result (timestamps default to the UTC slot times)"""
+        slots = forecast_data.get('forecast', [])
+        if timestamps is None:
+            timestamps = [slot['datetime'] for slot in slots]
+        return self.append(location, timestamps, FORECAST, forecast_data.get('location'),
+                           **{field: [slot.get(field) for slot in slots] for field in NUMERIC_FIELDS})
+
+    def flush(self):
+        """Push buffered appends to the operating system"""
+        with self._lock:
+            for handle in self._handles.values():
+                handle.flush()
+
+    def close(self):
+        with self._lock:
+            for handle in self._handles.values():
+                handle.close()
+            self._handles = {}
+
+    # Reading
+
+    def locations(self) -> Dict[str, Optional[str]]:
+        """Known location keys and their display names"""
+        with self._lock:
+            return dict(zip(self._keys, self._names))
+
+    def query(self, location: str, start: Optional[Union[int, str]] = None, end: Optional[Union[int, str]] = None,
+              kind: int = OBSERVATION, fields: Iterable[str] = NUMERIC_FIELDS) -> Dict[str, "np.ndarray"]:
+        """
+        Rows of one location within [start, end), oldest first
+
+        Duplicate timestamps resolve to the most recently appended row.
+
+        Returns:
+            {'timestamp': datetime64[s] array, field: float32 array, ...}
+        """
+        fields = tuple(fields)
+        lower = int(_epoch_seconds(start)) if start is not None else np.iinfo(np.int64).min
+        upper = int(_epoch_seconds(end)) if end is not None else np.iinfo(np.int64).max
+        columns = ('timestamp',) + fields
+        parts = []
+
+        with self._lock:
+            location_id = self._ids.get(location)
+            if location_id is None:
+                return self._empty(fields)
+            segments = list(self._segments)
+            # The append log may be truncated by a seal, so it is read under the lock
+            if self._active_rows:
+                self.flush()
+                active = {column: self._active_column(column) for column in ('location', 'kind') + columns}
+                mask = ((active['location'] == location_id) & (active['kind'] == kind)
+                        & (active['timestamp'] >= lower) & (active['timestamp'] < upper))
+                active_part = {column: np.array(active[column][mask]) for column in columns}
+                del active
+            else:
+                active_part = None
+
+        slot = location_id * KINDS + kind
+        for segment in segments:
+            if segment.ts_max < lower or segment.ts_min >= upper:
+                continue
+            first, last = segment.bounds(slot)
+            if first == last:
+                continue
+            timestamps = segment.column('timestamp')[first:last]
+            low = first + int(np.searchsorted(timestamps, lower, 'left'))
+            high = first + int(np.searchsorted(timestamps, upper, 'left'))
+            if low < high:
+                parts.append({column: np.array(segment.column(column)[low:high]) for column in columns})
+        if active_part is not None and len(active_part['timestamp']):
+            parts.append(active_part)
+
+        if not parts:
+            return self._empty(fields)
+        merged = {column: np.concatenate([part[column] for part in parts]) for column in columns}
+        order = np.argsort(merged['timestamp'], kind='stable')
+        timestamps = merged['timestamp'][order]
+        keep = order[_keep_last(timestamps)]
+        result = {'timestamp': merged['timestamp'][keep].astype('datetime64[s]')}
+        result.update((field, merged[field][keep]) for field in fields)
+        return result
+
+    def downsample(self, location: str, interval: Union[str, int] = 'hour', start=None, end=None,
+                   kind: int = OBSERVATION, fields: Iterable[str] = ('temperature',)) -> Dict[str, "np.ndarray"]:
+        """
+        Per-bucket min, max and mean of one location's rows
+
+        Args:
+            interval: 'hour', 'day' or a bucket width in seconds (buckets align to the Unix epoch)
+
+        Returns:
+            {'timestamp': bucket starts, 'count': rows per bucket,
+             '<field>_min', '<field>_max', '<field>_mean': NaN where a bucket has no value}
+        """
+        width = INTERVALS[interval] if isinstance(interval, str) else int(interval)
+        fields = tuple(fields)
+        rows = self.query(location, start, end, kind, fields)
+        seconds = rows['timestamp'].astype(np.int64)
+        buckets = seconds - seconds % width
+        unique_buckets, starts = np.unique(buckets, return_index=True)
+
+        result = {
+            'timestamp': unique_buckets.astype('datetime64[s]'),
+            'count': np.diff(np.append(starts, len(buckets)))
+        }
+        if not len(buckets):
+            result.update((f"{field}_{how}", np.empty(0)) for field in fields for how in ('min', 'max', 'mean'))
+            return result
+        for field in fields:
+            values = rows[field].astype(np.float64)
+            valid = ~np.isnan(values)
+            valid_counts = np.add.reduceat(valid.astype(np.int64), starts)
+            empty = valid_counts == 0
+            result[f"{field}_min"] = np.where(empty, np.nan,
+                                              np.minimum.reduceat(np.where(valid, values, np.inf), starts))
+            result[f"{field}_max"] = np.where(empty, np.nan,
+                                              np.maximum.reduceat(np.where(valid, values, -np.inf), starts))
+            result[f"{field}_mean"] = np.where(empty, np.nan, np.add.reduceat(np.where(valid, values, 0.0), starts)
+                                               / np.maximum(valid_counts, 1))
+        return result
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, locations=len(self._keys), segments=len(self._segments),
+                        active_rows=self._active_rows,
+                        segment_rows=sum(segment.rows for segment in self._segments))
+
+    # Maintenance
+
+    def seal(self):
+        """Sort the append log into a new segment"""
+        with self._lock:
+            self._seal()
+
+    def compact(self, drop_before: Optional[Union[int, str]] = None) -> Dict[str, int]:
+        """
+        Merge every segment into one
+
+        Seals the append log first. Works one location at a time, so memory use
+        is bounded by the largest location rather than the store. Appends are
+        not blocked while the merge runs.
+
+        Args:
+            drop_before: Discard rows with earlier timestamps (retention)
+
+        Returns:
+            {'segments': merged segment count, 'rows_in': ..., 'rows_out': ...}
+        """
+        with self._compact_lock:
+            return self._compact(int(_epoch_seconds(drop_before)) if drop_before is not None else None)
+
+    def _compact(self, cutoff: Optional[int]) -> Dict[str, int]:
+        with self._lock:
+            self._seal()
+            segments = list(self._segments)
+            slots = len(self._keys) * KINDS
+        if not segments or (len(segments) == 1 and cutoff is None):
+            return {'segments': len(segments), 'rows_in': sum(segment.rows for segment in segments),
+                    'rows_out': sum(segment.rows for segment in segments)}
+
+        last = segments[-1]
+        target = os.path.join(self._segments_dir, f"{last.seq:08d}.{last.gen + 1}")
+        staging = target + '.tmp'
+        os.makedirs(staging)
+        offsets = np.zeros(slots + 1, dtype=np.int64)
+        ts_min, ts_max = None, None
+        total = 0
+        handles = {column: open(os.path.join(staging, f"{column}.bin"), 'wb') for column in _columns()}
+        try:
+            for slot in range(slots):
+                parts = []
+                for segment in segments:
+                    first, end = segment.bounds(slot)
+                    if first < end:
+                        parts.append((segment, first, end))
+                if parts:
+                    timestamps = np.concatenate([segment.column('timestamp')[first:end]
+                                                 for segment, first, end in parts])
+                    # Segments are in write order, so a stable sort keeps the newest duplicate last
+                    order = np.argsort(timestamps, kind='stable')
+                    keep = _keep_last(timestamps[order])
+                    if cutoff is not None:
+                        keep &= timestamps[order] >= cutoff
+                    order = order[keep]
+                    if len(order):
+                        for column in _columns():
+                            values = np.concatenate([segment.column(column)[first:end]
+                                                     for segment, first, end in parts])
+                            handles[column].write(values[order].tobytes())
+                        kept = timestamps[order]
+                        ts_min = int(kept[0]) if ts_min is None else min(ts_min, int(kept[0]))
+                        ts_max = int(kept[-1]) if ts_max is None else max(ts_max, int(kept[-1]))
+                        total += len(order)
+                offsets[slot + 1] = total
+        finally:
+            for handle in handles.values():
+                handle.close()
+        self._finish_segment(staging, offsets, total, ts_min, ts_max)
+        os.replace(staging, target)
+
+        with self._lock:
+            merged = {segment.path for segment in segments}
+            self._segments = [_Segment(target)] + [segment for segment in self._segments
+                                                   if segment.path not in merged]
+            self.stats['compactions'] += 1
+        for segment in segments:
+            shutil.rmtree(segment.path, ignore_errors=True)
+        rows_in = sum(segment.rows for segment in segments)
+        return {'segments': len(segments), 'rows_in': rows_in, 'rows_out': total}
+
+    # Internals
+
+    def _load_locations(self):
+        path = os.path.join(self.path, 'locations.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as handle:
+                payload = json.load(handle)
+            self._keys = payload['keys']
+            self._names = payload['names']
+            self._ids = {key: i for i, key in enumerate(self._keys)}
+
+    def _location_id(self, location: str, name: Optional[str]) -> int:
+        location_id = self._ids.get(location)
+        if location_id is None:
+            location_id = self._ids[location] = len(self._keys)
+            self._keys.append(location)
+            self._names.append(name)
+            self._save_locations()
+        elif name and self._names[location_id] != name:
+            self._names[location_id] = name
+            self._save_locations()
+        return location_id
+
+    def _save_locations(self):
+        path = os.path.join(self.path, 'locations.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as handle:
+            json.dump({'keys': self._keys, 'names': self._names}, handle)
+        os.replace(path + '.tmp', path)
+
+    def _open_active(self, mode: str):
+        self._handles = {column: open(os.path.join(self._active_dir, f"{column}.bin"), mode)
+                         for column in _columns()}
+
+    def _recover_active(self) -> int:
+        """Row count of the append log, truncating columns left longer by an interrupted append"""
+        counts = []
+        for column, dtype in _columns().items():
+            path = os.path.join(self._active_dir, f"{column}.bin")
+            counts.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        rows = min(counts)
+        for column, dtype in _columns().items():
+            path = os.path.join(self._active_dir, f"{column}.bin")
+            if os.path.exists(path) and os.path.getsize(path) != rows * dtype.itemsize:
+                os.truncate(path, rows * dtype.itemsize)
+        return rows
+
+    def _active_column(self, column: str) -> "np.ndarray":
+        return np.memmap(os.path.join(self._active_dir, f"{column}.bin"), dtype=_columns()[column], mode='r',
+                         shape=(self._active_rows,))
+
+    def _seal(self):
+        if not self._active_rows:
+            return
+        self.flush()
+        columns = {column: np.array(self._active_column(column)) for column in _columns()}
+        slots = columns['location'].astype(np.int64) * KINDS + columns['kind']
+        # lexsort is stable, so arrival order breaks ties and the newest duplicate sorts last
+        order = np.lexsort((columns['timestamp'], slots))
+        sorted_slots = slots[order]
+        sorted_timestamps = columns['timestamp'][order]
+        keep = np.append((sorted_slots[1:] != sorted_slots[:-1]) | (sorted_timestamps[1:] != sorted_timestamps[:-1]),
+                         True)
+        order = order[keep]
+
+        seq = self._next_seq
+        target = os.path.join(self._segments_dir, f"{seq:08d}.0")
+        staging = target + '.tmp'
+        os.makedirs(staging)
+        for column, values in columns.items():
+            values[order].tofile(os.path.join(staging, f"{column}.bin"))
+        offsets = np.searchsorted(slots[order], np.arange(len(self._keys) * KINDS + 1), 'left')
+        timestamps = columns['timestamp'][order]
+        self._finish_segment(staging, offsets, len(order), int(timestamps.min()), int(timestamps.max()))
+        os.replace(staging, target)
+
+        self._segments.append(_Segment(target))
+        self._next_seq += 1
+        self.close()
+        self._open_active('wb')
+        self._active_rows = 0
+        self.stats['sealed'] += 1
+
+    @staticmethod
+    def _finish_segment(staging: str, offsets: "np.ndarray", rows: int, ts_min: Optional[int],
+                        ts_max: Optional[int]):
+        np.save(os.path.join(staging, 'index.npy'), np.asarray(offsets, dtype=np.int64))
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as handle:
+            json.dump({'rows': rows, 'ts_min': ts_min if ts_min is not None else 0,
+                       'ts_max': ts_max if ts_max is not None else -1}, handle)
+
+    @staticmethod
+    def _empty(fields: Tuple[str, ...]) -> Dict[str, "np.ndarray"]:
+        result = {'timestamp': np.empty(0, dtype='datetime64[s]')}
+        result.update((field, np.empty(0, dtype=np.float32)) for field in fields)
+        return result
+
+if __name__ == "__main__":
+    # Inspect or compact a store: python -m src.history <dir> [compact [retention days]]
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.history <store dir> [compact [retention days]]")
+        sys.exit(1)
+    store = HistoryStore(sys.argv[1])
+    if len(sys.argv) > 2 and sys.argv[2] == 'compact':
+        days = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        print(store.compact(int(time.time() - days * 86400) if days is not None else None))
+    print(store.summary())
+    store.close()
@@ -0,0 +1,236 @@
+"""
+Non-blocking JSONL interaction log
+
+Records are put on a bounded queue and written in batches by a background
+thread, so logging never does file I/O on the request path. The active file
+is rotated by size and age, and rotated segments are compressed with gzip or,
+when the optional zstandard package is installed, zstd. Compression runs on a
+thread of its own so a large segment does not hold up the queue.
+"""
+
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger('weather_bot.interaction_log')
+
+DROP = 'drop'
+BLOCK = 'block'
+
+_STOP = object()
+
+class InteractionLogWriter:
+    """Buffered background writer for one JSONL log file"""
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_bytes: Optional[int] = 100 * 1024 * 1024, rotate_seconds: Optional[float] = 86400,
+                 compression: Optional[str] = 'gzip', policy: str = DROP, block_timeout: Optional[float] = None):
+        """
+        Args:
+            path: Active log file; rotated segments are written next to it
+            max_queue: Records buffered before the full-queue policy applies
+            batch_size: Maximum records per write
+            flush_interval: Seconds before a partial batch is written
+            max_bytes: Rotate once the active file reaches this size (None = never)
+            rotate_seconds: Rotate once the active file is this old (None = never)
+            compression: 'gzip', 'zstd' or None for rotated segments
+            policy: DROP discards records when the queue is full, BLOCK waits for space
+            block_timeout: Longest wait under BLOCK before the record is dropped (None = forever)
+        """
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("zstandard is required for zstd compression: pip install zstandard")
+        if policy not in (DROP, BLOCK):
+            raise ValueError(f"Unsupported queue policy: {policy}")
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.stats = {'written': 0, 'dropped': 0, 'batches': 0, 'rotations': 0, 'errors': 0}
+
+        self._queue: "queue.Queue" = queue.Queue(max_queue)
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weather-bot-interaction-log-gz')
+        self._errors_lock = threading.Lock()
+        self._file = None
+        self._opened_at = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='weather-bot-interaction-log', daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict) -> bool:
+        """
+        Queue a record for writing
+
+        Returns:
+            False if the record was dropped because the queue was full or the writer is closed
+        """
+        if self._closed:
+            self.stats['dropped'] += 1
+            return False
+        try:
+            if self.policy == BLOCK:
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        return True
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout: Optional[float] = 10):
+        """Write out queued records, close the file, stop the writer thread and finish compressing"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._compressor.shutdown(wait=True)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                try:
+                    self._maybe_rotate()
+                except Exception:
+                    logger.exception("Rotating %s failed", self.path)
+                    self._count_error()
+                continue
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(record is _STOP for record in batch)
+            records = [record for record in batch if record is not _STOP]
+            try:
+                if records:
+                    self._write_batch(records)
+            except Exception:
+                logger.exception("Writing to %s failed", self.path)
+                self._count_error()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                self._close_file()
+                return
+
+    def _write_batch(self, records):
+        lines = []
+        for record in records:
+            lines.append(json.dumps(record, ensure_ascii=False, default=str))
+        handle = self._open()
+        handle.write('\n'.join(lines) + '\n')
+        handle.flush()
+        self.stats['written'] += len(records)
+        self.stats['batches'] += 1
+        self._maybe_rotate()
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._opened_at = time.time()
+        return self._file
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        too_big = self.max_bytes is not None and self._file.tell() >= self.max_bytes
+        too_old = self.rotate_seconds is not None and time.time() - self._opened_at >= self.rotate_seconds
+        if too_big or too_old:
+            self._rotate()
+
+    def _rotate(self) -> Optional[str]:
+        """Close the active file, move it to a timestamped segment and queue its compression"""
+        self._close_file()
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None
+
+        segment = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 0
+        while any(os.path.exists(segment + (f".{suffix}" if suffix else '') + ext) for ext in ('', '.gz', '.zst')):
+            suffix += 1
+        if suffix:
+            segment += f".{suffix}"
+        os.replace(self.path, segment)
+        self.stats['rotations'] += 1
+
+        if self.compression is not None:
+            self._compressor.submit(self._compress_segment, segment)
+        return segment
+
+    def _compress_segment(self, segment: str):
+        try:
+            _compress(segment, self.compression)
+        except Exception:
+            # The uncompressed segment is kept
+            logger.exception("Compressing %s failed", segment)
+            self._count_error()
+
+    def _count_error(self):
+        with self._errors_lock:
+            self.stats['errors'] += 1
+
+def _compress(path: str, compression: str) -> str:
+    """Compress a rotated segment in place and return the new path"""
+    target = path + ('.gz' if compression == 'gzip' else '.zst')
+    try:
+        with open(path, 'rb') as source:
+            if compression == 'gzip':
+                with gzip.open(target, 'wb') as dest:
+                    shutil.copyfileobj(source, dest)
+            else:
+                with open(target, 'wb') as dest:
+                    zstandard.ZstdCompressor().copy_stream(source, dest)
+    except BaseException:
+        if os.path.exists(target):
+            os.remove(target)
+        raise
+    os.remove(path)
+    return target
+
+def worker_log_path(path: str, index: int) -> str:
+    """
+    Log file for worker process index: interactions.jsonl -> interactions.worker-0.jsonl
+
+    Writers in separate processes cannot coordinate rotation, so each worker
+    process logs to a file of its own.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker-{index}{ext}"
@@ -0,0 +1,242 @@
+"""
+In-process metrics for the query pipeline
+
+Counters and fixed-bucket latency histograms keyed by name and labels, a
+stage() timer that also fills the per-query breakdown of the current
+context, span hooks for tracing integrations, and snapshot / Prometheus
+text exports. When disabled, stage() returns a shared no-op context manager
+and inc()/observe() return immediately.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .config import Config
+except ImportError:
+    from config import Config
+
+# Upper bounds in seconds; an implicit +Inf bucket follows
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_breakdown: contextvars.ContextVar = contextvars.ContextVar('stage_breakdown', default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile (0-1) by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def as_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99)
+        }
+
+class Span:
+    """A finished timed stage, as passed to span hooks"""
+
+    __slots__ = ('name', 'start', 'duration', 'labels', 'error')
+
+    def __init__(self, name: str, start: float, duration: float, labels: Dict[str, str],
+                 error: Optional[BaseException]):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.labels = labels
+        self.error = error
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    """Times one stage into the stage histogram, the breakdown and the span hooks"""
+
+    __slots__ = ('registry', 'name', 'labels', 'start', 'wall_start')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.start
+        self.registry.observe('stage_seconds', duration, stage=self.name, **self.labels)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown[self.name] = breakdown.get(self.name, 0.0) + duration
+        if self.registry.hooks:
+            span = Span(self.name, self.wall_start, duration, self.labels, exc)
+            for hook in list(self.registry.hooks):
+                try:
+                    hook(span)
+                except Exception:
+                    pass
+        return False
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms"""
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.hooks: List[Callable[[Span], None]] = []
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add amount to a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record a duration in a histogram"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def stage(self, name: str, **labels):
+        """Context manager timing a pipeline stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, labels)
+
+    def add_span_hook(self, hook: Callable[[Span], None]):
+        """Call hook(span) whenever a stage finishes, e.g. to export tracing spans"""
+        self.hooks.append(hook)
+
+    def remove_span_hook(self, hook: Callable[[Span], None]):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def counters(self, name: str) -> Dict[Labels, float]:
+        """All label sets of one counter"""
+        with self._lock:
+            return {labels: value for (counter, labels), value in self._counters.items() if counter == name}
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Current values as {'counters': {...}, 'histograms': {...}} keyed by 'name{labels}'"""
+        with self._lock:
+            return {
+                'counters': {_series(name, labels): value for (name, labels), value in self._counters.items()},
+                'histograms': {_series(name, labels): histogram.as_dict()
+                               for (name, labels), histogram in self._histograms.items()}
+            }
+
+    def to_prometheus(self, prefix: str = 'weather_bot_') -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            seen = set()
+            for (name, labels), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {prefix}{name} counter")
+                lines.append(f"{_series(prefix + name, labels)} {_number(value)}")
+            for (name, labels), histogram in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {prefix}{name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{_series(prefix + name + '_bucket', labels + (('le', le),))} {cumulative}")
+                lines.append(f"{_series(prefix + name + '_sum', labels)} {_number(histogram.sum)}")
+                lines.append(f"{_series(prefix + name + '_count', labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+def _series(name: str, labels: Labels) -> str:
+    if not labels:
+        return name
+    rendered = ','.join(f'{key}="{_escape(str(value))}"' for key, value in labels)
+    return f"{name}{{{rendered}}}"
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+@contextlib.contextmanager
+def stage_breakdown():
+    """Collect per-stage durations of the enclosed work into the yielded dict"""
+    breakdown: Dict[str, float] = {}
+    token = _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _breakdown.reset(token)
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide registry, enabled per Config.METRICS_ENABLED"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(Config.METRICS_ENABLED)
+    return _registry
@@ -0,0 +1,201 @@
+"""
+Single-pass query analyzer
+
+Tokenizes a query once with a combined regex, runs the tokens through a
+word-level Aho-Corasick automaton built at import time, and derives the
+location, query type and day offset from that one scan. Results are memoized
+so replaying query logs with repeated queries costs a dict lookup.
+"""
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    from .utils import clean_location_string
+except ImportError:
+    from utils import clean_location_string
+
+ANALYSIS_CACHE_SIZE = 65536
+
+class QueryAnalysis(NamedTuple):
+    """Everything the pipeline needs to know about a query"""
+    location: Optional[str]
+    query_type: str
+    day_offset: Optional[int]
+    # Set for "next N days": the offset is then a number of days rather than one target day
+    day_span: Optional[int] = None
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over word tokens, so multi-word phrases match in one pass"""
+
+    def __init__(self, phrases: Dict[Tuple[str, ...], str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, str]]] = [[]]
+
+        for phrase, label in phrases.items():
+            state = 0
+            for word in phrase:
+                if word not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][word] = len(self._goto) - 1
+                state = self._goto[state][word]
+            self._output[state].append((len(phrase), label))
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                if state:
+                    self._fail[next_state] = self._goto[fallback].get(word, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def step(self, state: int, word: str) -> int:
+        """Advance the automaton by one token"""
+        while state and word not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(word, 0)
+
+    def matches(self, state: int) -> List[Tuple[int, str]]:
+        """(phrase length, label) pairs ending at the current token"""
+        return self._output[state]
+
+    def scan(self, words: Iterable[str]) -> List[Tuple[int, int, str]]:
+        """All (start, end, label) matches in a token sequence"""
+        found = []
+        state = 0
+        for index, word in enumerate(words):
+            state = self.step(state, word)
+            for length, label in self.matches(state):
+                found.append((index - length + 1, index + 1, label))
+        return found
+
+# Keyword phrases and what they tell us about the query
+KEYWORDS: Dict[Tuple[str, ...], str] = {
+    ('in',): 'preposition',
+    ('for',): 'preposition',
+    ('at',): 'preposition',
+    ('weather',): 'subject',
+    ('temperature',): 'subject',
+    ('forecast',): 'subject_forecast',
+    ('tomorrow',): 'tomorrow',
+    ('tonight',): 'tonight',
+    ('today',): 'today',
+    ('next', 'week'): 'next_week',
+    ('next',): 'forecast',
+    ('upcoming',): 'forecast',
+    ('will',): 'forecast',
+    ('later',): 'forecast',
+    ('coming',): 'forecast',
+    ('weekend',): 'forecast',
+    ('day',): 'days',
+    ('days',): 'days'
+}
+FORECAST_LABELS = {'forecast', 'subject_forecast', 'tomorrow', 'tonight', 'next_week', 'days'}
+
+# Words that end a location phrase ("weather in Boston tomorrow", "Tokyo forecast")
+NON_LOCATION_WORDS = frozenset({
+    'in', 'for', 'at', 'on', 'during', 'the', 'a', 'and', 'like', 'please',
+    'today', 'tonight', 'tomorrow', 'now', 'currently', 'right', 'later',
+    'next', 'this', 'coming', 'upcoming', 'week', 'weekend', 'day', 'days',
+    'weather', 'forecast', 'temperature', 'current', "what's", 'what', 'how',
+    "how's", 'will', 'is', 'it'
+})
+
+# One combined tokenizer: words, numbers, commas and any other punctuation
+TOKEN_PATTERN = re.compile(r"(?P<word>[A-Za-z][\w'.-]*)|(?P<number>\d+)|(?P<comma>,)|(?P<other>[^\w\s])")
+MATCHER = KeywordMatcher(KEYWORDS)
+
+def _location_from(tokens: List[Tuple[str, str, str]], start: int) -> Optional[str]:
+    """Read a "City" or "City, Region" phrase starting at a token index"""
+    words = []
+    seen_comma = False
+    for kind, text, lower in tokens[start:]:
+        if kind == 'word' and lower.rstrip('.') not in NON_LOCATION_WORDS:
+            words.append(text)
+        elif kind == 'comma' and words and not seen_comma:
+            seen_comma = True
+            words.append(',')
+        else:
+            break
+
+    location = clean_location_string(' '.join(words).replace(' ,', ',')).rstrip(',')
+    return location or None
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def analyze_query(user_input: str) -> QueryAnalysis:
+    """
+    Analyze a natural language weather query in a single pass
+
+    Args:
+        user_input: Raw query such as "Will it rain next week in Seattle?"
+
+    Returns:
+        QueryAnalysis with the location (or None), "current"/"forecast", the
+        day offset (or None when no time is mentioned) and, for "N days", the span
+    """
+    tokens = []
+    state = 0
+    prepositions = []
+    forecast = False
+    day_offset = None
+    day_span = None
+    time_labels = set()
+    leading_words = True
+    leading_subject = False
+
+    for match in TOKEN_PATTERN.finditer(user_input or ''):
+        kind = match.lastgroup
+        text = match.group()
+        lower = text.lower()
+        index = len(tokens)
+        tokens.append((kind, text, lower))
+
+        if kind == 'number':
+            state = 0
+            leading_words = False
+            continue
+        if kind != 'word':
+            state = 0
+            leading_words = leading_words and kind == 'comma'
+            continue
+
+        state = MATCHER.step(state, lower)
+        for length, label in MATCHER.matches(state):
+            if label == 'preposition':
+                prepositions.append(index + 1)
+            elif label in ('subject', 'subject_forecast') and leading_words and index > 0:
+                leading_subject = True
+            if label in FORECAST_LABELS:
+                forecast = True
+            if label == 'days' and index > 0 and tokens[index - 1][0] == 'number' and day_offset is None:
+                day_offset = day_span = int(tokens[index - 1][1])
+            elif label in ('tomorrow', 'next_week', 'today', 'tonight'):
+                time_labels.add(label)
+
+    # Resolve the location: the first preposition phrase that yields a place,
+    # otherwise a leading "<City> weather/forecast/temperature" phrase
+    resolved = None
+    for start in prepositions:
+        resolved = _location_from(tokens, start)
+        if resolved:
+            break
+    if resolved is None and leading_subject:
+        resolved = _location_from(tokens, 0)
+
+    if day_offset is None:
+        for label, offset in (('tomorrow', 1), ('next_week', 7), ('today', 0), ('tonight', 0)):
+            if label in time_labels:
+                day_offset = offset
+                break
+
+    return QueryAnalysis(resolved, "forecast" if forecast else "current", day_offset, day_span)
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Compact, immutable weather records
+
+WeatherRecord and ForecastSlot hold the same fields as the dicts produced by
+format_weather_data and fetch_weather_forecast, but use __slots__ instead of a
+per-instance dict and intern repeated strings (location, description). They
+implement the read-only Mapping interface, so record['temperature'],
+record.get('pop'), dict(record) and record == some_dict all keep working.
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class _Record(Mapping):
+    """Slotted, read-only record with a mapping-style interface"""
+
+    __slots__ = ()
+    _fields = ()
+    _interned = ()
+
+    def __init__(self, **values):
+        for field in self._fields:
+            value = values.get(field)
+            if field in self._interned:
+                value = _intern(value)
+            object.__setattr__(self, field, value)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> '_Record':
+        return cls(**{field: data.get(field) for field in cls._fields})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self._fields}
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, key) -> bool:
+        return key in self._fields
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, field) for field in self._fields))
+
+    def __reduce__(self):
+        return (_rebuild, (type(self), self.to_dict()))
+
+    def __repr__(self) -> str:
+        values = ', '.join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"{type(self).__name__}({values})"
+
+def _rebuild(cls, values):
+    return cls(**values)
+
+class WeatherRecord(_Record):
+    """One current weather observation (the format_weather_data fields)"""
+
+    _fields = ('location', 'temperature', 'humidity', 'pressure', 'description',
+               'wind_speed', 'wind_direction', 'timestamp')
+    _interned = ('location', 'description')
+    __slots__ = _fields
+
+class ForecastSlot(_Record):
+    """One 3-hour forecast slot (the fetch_weather_forecast slot fields)"""
+
+    _fields = ('datetime', 'temperature', 'humidity', 'pressure', 'description',
+               'wind_speed', 'wind_direction', 'pop')
+    _interned = ('datetime', 'description')
+    __slots__ = _fields
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+Background refresh of cached weather
+
+BackgroundRefresher runs deduplicated refresh jobs at BACKGROUND priority so
+stale cache entries can be served while a fresh copy is fetched. HotSet
+tracks the most requested keys with a count-min sketch, which lets the
+refresher's prefetch loop renew popular entries before they go stale.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from .scheduler import BACKGROUND, request_priority
+except ImportError:
+    from scheduler import BACKGROUND, request_priority
+
+class CountMinSketch:
+    """Approximate frequency counts in fixed memory (estimates never undercount)"""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [[0] * width for _ in range(depth)]
+
+    def _cells(self, key: Hashable):
+        return [hash((seed, key)) % self.width for seed in range(self.depth)]
+
+    def add(self, key: Hashable, count: int = 1) -> int:
+        """Count key (conservative update) and return its new estimate"""
+        cells = self._cells(key)
+        estimate = min(row[cell] for row, cell in zip(self._rows, cells)) + count
+        for row, cell in zip(self._rows, cells):
+            if row[cell] < estimate:
+                row[cell] = estimate
+        return estimate
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[cell] for row, cell in zip(self._rows, self._cells(key)))
+
+    def halve(self):
+        """Age all counts so the sketch follows recent popularity"""
+        for row in self._rows:
+            for i, value in enumerate(row):
+                row[i] = value >> 1
+
+class HotSet:
+    """
+    The top_n most frequently recorded keys, each with a job that refreshes it
+
+    Keys leave the set when a hotter key displaces them, when decay brings
+    their count to zero, or when they have not been recorded for idle_seconds.
+    """
+
+    def __init__(self, top_n: int, width: int = 2048, depth: int = 4, decay_every: int = 10000,
+                 idle_seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.top_n = top_n
+        self.decay_every = decay_every
+        self.idle_seconds = idle_seconds
+        self.sketch = CountMinSketch(width, depth)
+        # key -> [estimate, job, last recorded]
+        self._top: Dict[Hashable, list] = {}
+        # (estimate, sequence, key) min-heap over _top; an item is stale once its
+        # key has left the set or its estimate has grown, and is fixed on the way out
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._sequence = itertools.count()
+        self._recorded = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, make_job: Callable[..., Callable[[], bool]], *args):
+        """Count one request for key; make_job(*args) builds its refresh job when it enters the set"""
+        if self.top_n <= 0:
+            return
+        with self._lock:
+            now = self._clock()
+            estimate = self.sketch.add(key)
+            entry = self._top.get(key)
+            if entry is not None:
+                entry[0] = estimate
+                entry[2] = now
+            elif len(self._top) < self.top_n:
+                self._insert(key, estimate, make_job(*args), now)
+            else:
+                coldest_estimate, _, coldest = self._coldest()
+                if estimate > coldest_estimate:
+                    heapq.heappop(self._heap)
+                    del self._top[coldest]
+                    self._insert(key, estimate, make_job(*args), now)
+
+            self._recorded += 1
+            if self._recorded >= self.decay_every:
+                self._recorded = 0
+                self.sketch.halve()
+                for entry_key in list(self._top):
+                    entry = self._top[entry_key]
+                    entry[0] >>= 1
+                    if not entry[0]:
+                        del self._top[entry_key]
+                self._rebuild_heap()
+
+    def _insert(self, key: Hashable, estimate: int, job: Callable[[], bool], now: float):
+        self._top[key] = [estimate, job, now]
+        heapq.heappush(self._heap, (estimate, next(self._sequence), key))
+        if len(self._heap) > 2 * self.top_n:
+            self._rebuild_heap()
+
+    def _coldest(self) -> Tuple[int, int, Hashable]:
+        """Heap item of the key with the lowest estimate, dropping or updating stale items first"""
+        heap = self._heap
+        while True:
+            estimate, _, key = heap[0]
+            entry = self._top.get(key)
+            if entry is None:
+                heapq.heappop(heap)
+            elif entry[0] != estimate:
+                heapq.heapreplace(heap, (entry[0], next(self._sequence), key))
+            else:
+                return heap[0]
+
+    def _rebuild_heap(self):
+        self._heap = [(entry[0], next(self._sequence), key) for key, entry in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def top(self) -> List[Tuple[Hashable, int, Callable[[], bool]]]:
+        """(key, estimated count, job) for the hottest keys, most requested first; idle keys are dropped"""
+        with self._lock:
+            if self.idle_seconds is not None:
+                cutoff = self._clock() - self.idle_seconds
+                for key in [key for key, entry in self._top.items() if entry[2] < cutoff]:
+                    del self._top[key]
+            entries = [(key, count, job) for key, (count, job, _) in self._top.items()]
+        return sorted(entries, key=lambda entry: entry[1], reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._top)
+
+class BackgroundRefresher:
+    """Deduplicated refresh jobs on a small pool of background threads"""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'failed': 0, 'prefetched': 0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prefetch_thread: Optional[threading.Thread] = None
+
+    def submit(self, key: Hashable, job: Callable[[], bool]) -> bool:
+        """
+        Schedule job unless a refresh of key is already pending
+
+        The job runs at BACKGROUND priority and should return False when the
+        refresh failed (the stale entry is then kept until it expires).
+
+        Returns:
+            True if the job was scheduled
+        """
+        with self._lock:
+            if key in self._pending:
+                self.stats['deduplicated'] += 1
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='weather-bot-refresh')
+            self._pending.add(key)
+            self.stats['submitted'] += 1
+        self._executor.submit(self._run, key, job)
+        return True
+
+    def _run(self, key: Hashable, job: Callable[[], bool]):
+        try:
+            with request_priority(BACKGROUND):
+                ok = job()
+        except Exception:
+            ok = False
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                if ok is False:
+                    self.stats['failed'] += 1
+
+    def prefetch(self, hot_set: HotSet, needs_refresh: Callable[[Hashable], bool]) -> int:
+        """Submit refreshes for hot keys that needs_refresh selects; returns how many were scheduled"""
+        scheduled = 0
+        for key, _, job in hot_set.top():
+            if needs_refresh(key) and self.submit(key, job):
+                scheduled += 1
+        with self._lock:
+            self.stats['prefetched'] += scheduled
+        return scheduled
+
+    def start_prefetch(self, hot_set: HotSet, needs_refresh: Callable[[Hashable], bool], interval: float):
+        """Run prefetch every interval seconds on a daemon thread (once per refresher)"""
+        with self._lock:
+            if self._prefetch_thread is not None:
+                return
+
+            def loop():
+                while not self._stop.wait(interval):
+                    try:
+                        self.prefetch(hot_set, needs_refresh)
+                    except Exception:
+                        pass
+
+            self._prefetch_thread = threading.Thread(target=loop, name='weather-bot-prefetch', daemon=True)
+            self._prefetch_thread.start()
+
+    def close(self, wait: bool = False):
+        """Stop the prefetch loop and let running refreshes finish (waiting for them if wait)"""
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,215 @@
+"""
+Quota-aware request scheduling
+
+Token buckets per (service, API key) and optionally per endpoint shape
+outgoing requests to the provider's per-minute limits. Callers wait in a
+bounded, priority-ordered queue: interactive requests are served before
+background refreshes, and a request that cannot get a token before its
+deadline fails fast with QuotaExceeded instead of turning into a 429.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    from .config import Config
+except ImportError:
+    from config import Config
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority: contextvars.ContextVar = contextvars.ContextVar('request_priority', default=INTERACTIVE)
+
+class QuotaExceeded(Exception):
+    """A request could not be scheduled within its quota"""
+
+class TokenBucket:
+    """Refills rate_per_minute tokens per minute, holding at most burst tokens"""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, rate_per_minute / 10.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def release(self):
+        """Return a token taken by try_acquire for a request that was never sent"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def time_until_available(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class _Lane:
+    """A bucket together with its queue of waiting requests"""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.waiting = []
+        self.condition = threading.Condition()
+
+class QuotaScheduler:
+    """Hands out request slots from per-key and per-endpoint token buckets"""
+
+    def __init__(self, limits: Dict[str, Optional[float]], max_queue: int = 100, burst_fraction: float = 0.1,
+                 clock=time.monotonic):
+        """
+        Args:
+            limits: Requests per minute keyed by "service" or "service:endpoint";
+                None or a missing entry means unlimited
+            max_queue: Requests allowed to wait per bucket before new ones are rejected
+            burst_fraction: Bucket capacity as a fraction of the per-minute limit
+            clock: Monotonic time source for refills and deadlines
+        """
+        self.limits = limits
+        self.max_queue = max_queue
+        self.burst_fraction = burst_fraction
+        self.clock = clock
+        self.stats = {'granted': 0, 'waited': 0, 'rejected': 0, 'expired': 0}
+        self._lanes: Dict[Tuple[str, ...], _Lane] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def _lane(self, name: str, key_id: str) -> Optional[_Lane]:
+        limit = self.limits.get(name)
+        if limit is None:
+            return None
+        with self._lock:
+            lane = self._lanes.get((name, key_id))
+            if lane is None:
+                bucket = TokenBucket(limit, max(1.0, limit * self.burst_fraction), self.clock)
+                lane = self._lanes[(name, key_id)] = _Lane(bucket)
+            return lane
+
+    def acquire(self, service: str, endpoint: Optional[str] = None, api_key: Optional[str] = None,
+                priority: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Block until a request to service/endpoint may be sent
+
+        Args:
+            service: Provider name, e.g. "openweather" or "gemini"
+            endpoint: Endpoint name for endpoint-specific limits
+            api_key: Key the request is billed to (buckets are per key)
+            priority: INTERACTIVE or BACKGROUND (default: current_priority())
+            timeout: Maximum seconds to wait (default from Config by priority)
+
+        Raises:
+            QuotaExceeded: The queue is full or no token became available in time
+        """
+        if priority is None:
+            priority = _priority.get()
+        if timeout is None:
+            timeout = (Config.QUOTA_INTERACTIVE_TIMEOUT_SECONDS if priority == INTERACTIVE
+                       else Config.QUOTA_BACKGROUND_TIMEOUT_SECONDS)
+        deadline = self.clock() + timeout
+        key_id = hashlib.sha1((api_key or '').encode()).hexdigest()[:12]
+
+        acquired = []
+        try:
+            for name in (service, f"{service}:{endpoint}" if endpoint else None):
+                lane = self._lane(name, key_id) if name else None
+                if lane is not None:
+                    self._wait_for_token(lane, priority, deadline)
+                    acquired.append(lane)
+        except QuotaExceeded:
+            # The request is not sent, so the key-level token goes back to the next waiter
+            for lane in acquired:
+                with lane.condition:
+                    lane.bucket.release()
+                    lane.condition.notify_all()
+            raise
+        self.stats['granted'] += 1
+
+    def _wait_for_token(self, lane: _Lane, priority: int, deadline: float):
+        with lane.condition:
+            if len(lane.waiting) >= self.max_queue:
+                self.stats['rejected'] += 1
+                raise QuotaExceeded("Request queue is full")
+
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(lane.waiting, ticket)
+            waited = False
+            try:
+                while True:
+                    if lane.waiting[0] == ticket and lane.bucket.try_acquire():
+                        if waited:
+                            self.stats['waited'] += 1
+                        return
+
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self.stats['expired'] += 1
+                        raise QuotaExceeded("No request quota available before the deadline")
+
+                    delay = lane.bucket.time_until_available() if lane.waiting[0] == ticket else remaining
+                    waited = True
+                    lane.condition.wait(min(max(delay, 0.001), remaining))
+            finally:
+                lane.waiting.remove(ticket)
+                heapq.heapify(lane.waiting)
+                lane.condition.notify_all()
+
+def current_priority() -> int:
+    """Priority of requests made from the current context"""
+    return _priority.get()
+
+@contextlib.contextmanager
+def request_priority(priority: int):
+    """Run the enclosed requests at the given priority, e.g. BACKGROUND for refresh jobs"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+_scheduler: Optional[QuotaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def _configured_limits(share: float = 1.0) -> Dict[str, Optional[float]]:
+    limits = {
+        'openweather': Config.OPENWEATHER_REQUESTS_PER_MINUTE,
+        'gemini': Config.GEMINI_REQUESTS_PER_MINUTE
+    }
+    limits.update(Config.ENDPOINT_REQUESTS_PER_MINUTE)
+    return {name: None if limit is None else limit * share for name, limit in limits.items()}
+
+def get_scheduler() -> QuotaScheduler:
+    """Return the process-wide scheduler configured from Config"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = QuotaScheduler(_configured_limits(), Config.QUOTA_MAX_QUEUE)
+    return _scheduler
+
+def split_quota(processes: int):
+    """
+    Give this process an equal share of every configured quota
+
+    Buckets live in process memory, so each of N worker processes spending
+    the same API keys calls this with N to keep their total within the quota.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = QuotaScheduler(_configured_limits(1.0 / max(processes, 1)), Config.QUOTA_MAX_QUEUE)
@@ -0,0 +1,353 @@
+"""
+Asyncio HTTP front end for the weather bot
+
+Endpoints:
+    POST /query   {"query": "..."}          -> {"response": "..."}
+    GET  /query?q=...                       -> {"response": "..."}
+    POST /batch   {"queries": ["...", ...]} -> {"responses": [...]}
+    GET  /health                            -> {"status": "ok", ...}
+    GET  /metrics                           -> Prometheus text format
+
+Run from the project root:
+    python -m src.server --port 8080 --workers 4 --cache-db /var/tmp/weather_bot.db
+
+Workers are separate processes bound to the same port with SO_REUSEPORT;
+they share weather data through the SQLite cache tier (Config.CACHE_DB_PATH) or,
+without one, a SharedCache in shared memory. Each worker gets an equal share
+of the per-key request quotas (OPENWEATHER_/GEMINI_REQUESTS_PER_MINUTE), so
+the workers together stay within them, and writes its own interaction log.
+Requests are parsed on the event loop and the blocking pipeline stages run on
+the bot's worker threads, so the loop keeps serving other clients meanwhile.
+The OpenWeatherMap and Gemini concurrency limits and the coalescing of
+identical fetches are shared by all requests a worker is serving.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from .config import Config
+    from .metrics import get_metrics
+    from .scheduler import split_quota
+    from .shared_cache import SharedCache
+    from . import weather_bot
+except ImportError:
+    from config import Config
+    from metrics import get_metrics
+    from scheduler import split_quota
+    from shared_cache import SharedCache
+    import weather_bot
+
+class HttpError(Exception):
+    """An error answered with the given status and message"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class WeatherBotServer:
+    """Minimal HTTP/1.1 server with keep-alive, timeouts and graceful shutdown"""
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, reuse_port: bool = False):
+        self.host = host if host is not None else Config.SERVER_HOST
+        self.port = port if port is not None else Config.SERVER_PORT
+        self.reuse_port = reuse_port
+        self.started = time.time()
+        self.inflight = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._closing = False
+        self._idle: Optional[asyncio.Event] = None
+        self._query_limit: Optional[asyncio.Semaphore] = None
+        self._connections = set()
+
+    async def start(self) -> Tuple[str, int]:
+        """Start listening; returns the bound (host, port)"""
+        # Created here so they belong to the running loop
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._query_limit = asyncio.Semaphore(Config.MAX_CONCURRENT_QUERIES)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  reuse_port=self.reuse_port or None,
+                                                  limit=Config.SERVER_MAX_BODY_BYTES)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def serve_forever(self):
+        """Serve until shutdown() is called or SIGINT/SIGTERM is received"""
+        if self._server is None:
+            await self.start()
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        closed = asyncio.ensure_future(self._server.wait_closed())
+        waiter = asyncio.ensure_future(stop.wait())
+        await asyncio.wait([closed, waiter], return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        await self.shutdown()
+
+    async def shutdown(self, grace_seconds: Optional[float] = None):
+        """Stop accepting connections, let in-flight requests finish, then close idle connections"""
+        if self._closing:
+            return
+        self._closing = True
+        grace_seconds = grace_seconds if grace_seconds is not None else Config.SERVER_SHUTDOWN_GRACE_SECONDS
+        if self._server is not None:
+            self._server.close()
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), grace_seconds)
+            except asyncio.TimeoutError:
+                pass
+        for writer in list(self._connections):
+            writer.close()
+        interaction_log = weather_bot.get_interaction_log()
+        if interaction_log is not None:
+            interaction_log.flush()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while not self._closing:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                self._begin()
+                try:
+                    status, content_type, payload = await self._respond(method, target, body)
+                finally:
+                    self._end()
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                              and not self._closing)
+                self._write(writer, status, content_type, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as exc:
+            self._write(writer, exc.status, 'application/json', _json({'error': str(exc)}), False)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """(method, target, version, headers, body), or None when the client is done"""
+        try:
+            line = await _readline(reader, Config.SERVER_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+        if not line.strip():
+            return None
+
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        method, target, version = parts
+
+        headers = {}
+        while True:
+            line = await _readline(reader, Config.SERVER_REQUEST_TIMEOUT_SECONDS)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > Config.SERVER_MAX_BODY_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = b''
+        if length:
+            body = await asyncio.wait_for(reader.readexactly(length), Config.SERVER_REQUEST_TIMEOUT_SECONDS)
+        return method.upper(), target, version, headers, body
+
+    async def _respond(self, method: str, target: str, body: bytes) -> Tuple[int, str, bytes]:
+        url = urlsplit(target)
+        route = url.path.rstrip('/') or '/'
+        started = time.perf_counter()
+        try:
+            status, content_type, payload = await self._route(method, route, parse_qs(url.query), body)
+        except HttpError as exc:
+            status, content_type, payload = exc.status, 'application/json', _json({'error': str(exc)})
+        except asyncio.TimeoutError:
+            status, content_type, payload = (HTTPStatus.GATEWAY_TIMEOUT, 'application/json',
+                                             _json({'error': "Request timed out"}))
+        metrics = get_metrics()
+        label = route if route in ('/query', '/batch', '/health', '/metrics') else 'other'
+        metrics.inc('http_requests_total', route=label, status=str(int(status)))
+        metrics.observe('http_request_seconds', time.perf_counter() - started, route=label)
+        return status, content_type, payload
+
+    async def _route(self, method: str, route: str, query: Dict[str, List[str]],
+                     body: bytes) -> Tuple[int, str, bytes]:
+        if route == '/health' and method == 'GET':
+            return HTTPStatus.OK, 'application/json', _json({
+                'status': 'shutting_down' if self._closing else 'ok',
+                'pid': os.getpid(),
+                'inflight': self.inflight,
+                'uptime_seconds': round(time.time() - self.started, 3)
+            })
+        if route == '/metrics' and method == 'GET':
+            return (HTTPStatus.OK, 'text/plain; version=0.0.4',
+                    weather_bot.get_metrics_prometheus().encode())
+
+        if route == '/query':
+            if method == 'GET':
+                user_input = (query.get('q') or [''])[0]
+            elif method == 'POST':
+                user_input = _parse_body(body).get('query')
+            else:
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET or POST")
+            if not isinstance(user_input, str) or not user_input.strip():
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Missing 'query'")
+            responses = await self._answer([user_input])
+            return HTTPStatus.OK, 'application/json', _json({'query': user_input, 'response': responses[0]})
+
+        if route == '/batch':
+            if method != 'POST':
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+            queries = _parse_body(body).get('queries')
+            if not isinstance(queries, list) or not all(isinstance(item, str) for item in queries):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "'queries' must be a list of strings")
+            if len(queries) > Config.SERVER_MAX_BATCH:
+                raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                f"At most {Config.SERVER_MAX_BATCH} queries per batch")
+            responses = await self._answer(queries) if queries else []
+            return HTTPStatus.OK, 'application/json', _json({'responses': responses})
+
+        if route in ('/health', '/metrics'):
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+        raise HttpError(HTTPStatus.NOT_FOUND, f"No route for {route}")
+
+    async def _answer(self, queries: List[str]) -> List[str]:
+        async with self._query_limit:
+            return await asyncio.wait_for(weather_bot.process_user_queries_async(queries),
+                                          Config.SERVER_REQUEST_TIMEOUT_SECONDS)
+
+    def _begin(self):
+        self.inflight += 1
+        self._idle.clear()
+
+    def _end(self):
+        self.inflight -= 1
+        if not self.inflight:
+            self._idle.set()
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, status: int, content_type: str, payload: bytes, keep_alive: bool):
+        status = HTTPStatus(status)
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+
+def _json(data: Dict) -> bytes:
+    return json.dumps(data).encode()
+
+def _parse_body(body: bytes) -> Dict:
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+    if not isinstance(data, dict):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+    return data
+
+async def _readline(reader: asyncio.StreamReader, timeout: float) -> bytes:
+    try:
+        return await asyncio.wait_for(reader.readline(), timeout)
+    except ValueError:
+        # StreamReader.readline reports a line over its buffer limit as ValueError
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request line or header too long")
+
+def _run_worker(host: str, port: int, reuse_port: bool, shared_cache: Optional[SharedCache] = None,
+                workers: int = 1, index: int = 0):
+    """Entry point of one worker process"""
+    if workers > 1:
+        # Before the transport is created, so it takes the scheduler with this worker's share
+        weather_bot.reset_process_state()
+        split_quota(workers)
+        weather_bot.use_worker_files(index)
+    if shared_cache is not None:
+        weather_bot.use_shared_cache(shared_cache)
+    weather_bot.start_prefetch()
+    server = WeatherBotServer(host, port, reuse_port=reuse_port)
+    asyncio.run(server.serve_forever())
+
+def serve(host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None,
+          cache_db: Optional[str] = None):
+    """
+    Run the HTTP service in the foreground
+
+    Args:
+        host: Interface to bind (default Config.SERVER_HOST)
+        port: Port to bind (default Config.SERVER_PORT)
+        workers: Worker processes (default Config.SERVER_WORKERS); more than one needs SO_REUSEPORT
+        cache_db: SQLite cache shared by the workers (default Config.CACHE_DB_PATH); without
+            one, several workers share an in-memory SharedCache instead
+    """
+    host = host if host is not None else Config.SERVER_HOST
+    port = port if port is not None else Config.SERVER_PORT
+    workers = workers or Config.SERVER_WORKERS
+
+    cache_db = cache_db or Config.CACHE_DB_PATH
+    if cache_db:
+        # Read lazily by Config, so every worker process picks it up
+        os.environ['WEATHER_BOT_CACHE_DB'] = cache_db
+
+    if workers == 1:
+        _run_worker(host, port, False)
+        return
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise RuntimeError("Multiple workers need SO_REUSEPORT, which this platform lacks")
+
+    shared_cache = None if cache_db else SharedCache.create(Config.SHARED_CACHE_SLOTS,
+                                                            Config.SHARED_CACHE_SLOT_BYTES)
+    processes = [multiprocessing.Process(target=_run_worker, args=(host, port, True, shared_cache, workers, i),
+                                         daemon=False)
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+    if shared_cache is not None:
+        shared_cache.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Weather bot HTTP service")
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-db', default=None, help="SQLite cache file shared by all workers")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.cache_db)
+
+if __name__ == "__main__":
+    main()
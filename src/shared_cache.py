@@ -0,0 +1,216 @@
+"""
+Cache tier shared by worker processes through a memory-mapped file
+
+SharedCache is a fixed-size, set-associative hash table: a key hashes to
+one set of WAYS slots, and each slot holds a header, the key and the
+JSON-encoded value. Readers never lock. Every slot has a sequence number
+that writers make odd while they write, and a read that sees it odd or
+changed is retried (a seqlock). Writers take one of a set of striped
+multiprocessing locks. When a set is full, the entry closest to expiry is
+evicted. Values that do not fit in a slot are not stored.
+
+It has the same get_entry/set/delete interface as SQLiteCache, so it can be
+the second tier of a TieredCache. Pass the instance to child processes (fork
+or spawn) and they map the same file.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Optional
+
+try:
+    from .cache import CacheStats, _to_json
+except ImportError:
+    from cache import CacheStats, _to_json
+
+# sequence, key hash, expires_at, stale_at, key length, value length
+HEADER = struct.Struct('<IQddHI')
+SEQUENCE = struct.Struct('<I')
+WAYS = 8
+READ_RETRIES = 16
+
+def _hash(key: bytes) -> int:
+    """Stable across processes, unlike hash(); never 0, which marks an empty slot"""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+def _shm_dir() -> str:
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+class SharedCache:
+    """Fixed-size TTL hash table in a memory-mapped file shared across processes"""
+
+    TIER = 'shared'
+
+    def __init__(self, path: str, slots: int, slot_bytes: int, locks, owner: bool = False):
+        """
+        Attach to an existing table; use SharedCache.create to make one
+
+        Args:
+            path: Backing file
+            slots: Total slots, a multiple of WAYS
+            slot_bytes: Bytes per slot, including the header
+            locks: Writer locks shared by every process using the table
+            owner: Remove the file on close
+        """
+        self.path = path
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.sets = slots // WAYS
+        self.locks = locks
+        self.owner = owner
+        self.oversize = 0
+        self.stats = CacheStats()
+        with open(path, 'r+b') as handle:
+            self._map = mmap.mmap(handle.fileno(), slots * slot_bytes)
+
+    @classmethod
+    def create(cls, slots: int = 4096, slot_bytes: int = 8192, lock_stripes: int = 64, context=None,
+               directory: Optional[str] = None) -> 'SharedCache':
+        """
+        Create an empty table in a new file (in /dev/shm where available)
+
+        Args:
+            slots: Entry capacity, rounded up to a multiple of WAYS
+            slot_bytes: Largest entry, header and key included
+            lock_stripes: Number of writer locks
+            context: multiprocessing context whose locks the workers will use
+        """
+        import multiprocessing
+        context = context or multiprocessing.get_context()
+        slots = -(-slots // WAYS) * WAYS
+        handle, path = tempfile.mkstemp(prefix='weather_bot_cache_', dir=directory or _shm_dir())
+        try:
+            os.ftruncate(handle, slots * slot_bytes)
+        finally:
+            os.close(handle)
+        locks = [context.Lock() for _ in range(lock_stripes)]
+        return cls(path, slots, slot_bytes, locks, owner=True)
+
+    def __reduce__(self):
+        # Child processes attach to the same file; only the creator removes it
+        return SharedCache, (self.path, self.slots, self.slot_bytes, self.locks, False)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """Return (value, expires_at, stale_at), or None if missing or expired"""
+        key_bytes = key.encode('utf-8')
+        key_hash = _hash(key_bytes)
+        base = (key_hash % self.sets) * WAYS
+        for slot in range(base, base + WAYS):
+            found = self._read(slot, key_hash, key_bytes)
+            if found is None:
+                continue
+            expires_at, stale_at, payload = found
+            if expires_at <= time.time():
+                self.stats.expirations += 1
+                break
+            self.stats.hits += 1
+            return json.loads(payload), expires_at, stale_at
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl_seconds: float, stale_seconds: float = 0):
+        """Store a JSON-serializable value, fresh for ttl_seconds and stale for stale_seconds more"""
+        key_bytes = key.encode('utf-8')
+        payload = json.dumps(value, default=_to_json).encode('utf-8')
+        if HEADER.size + len(key_bytes) + len(payload) > self.slot_bytes:
+            self.oversize += 1
+            return
+        key_hash = _hash(key_bytes)
+        stale_at = time.time() + ttl_seconds
+        with self._lock_for(key_hash):
+            slot, evicting = self._choose_slot(key_hash, key_bytes)
+            if evicting:
+                self.stats.evictions += 1
+            self._write(slot, key_hash, stale_at + stale_seconds, stale_at, key_bytes, payload)
+
+    def delete(self, key: str):
+        key_bytes = key.encode('utf-8')
+        key_hash = _hash(key_bytes)
+        with self._lock_for(key_hash):
+            base = (key_hash % self.sets) * WAYS
+            for slot in range(base, base + WAYS):
+                if self._read(slot, key_hash, key_bytes) is not None:
+                    self._write(slot, 0, 0.0, 0.0, b'', b'')
+
+    def clear(self):
+        for index in range(self.sets):
+            with self.locks[index % len(self.locks)]:
+                for slot in range(index * WAYS, (index + 1) * WAYS):
+                    self._write(slot, 0, 0.0, 0.0, b'', b'')
+
+    def __len__(self) -> int:
+        """Unexpired entries (a racy count, for stats)"""
+        now = time.time()
+        count = 0
+        for slot in range(self.slots):
+            _, key_hash, expires_at, _, _, _ = HEADER.unpack_from(self._map, slot * self.slot_bytes)
+            if key_hash and expires_at > now:
+                count += 1
+        return count
+
+    def close(self):
+        self._map.close()
+        if self.owner and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _lock_for(self, key_hash: int):
+        return self.locks[(key_hash % self.sets) % len(self.locks)]
+
+    def _read(self, slot: int, key_hash: int, key_bytes: bytes) -> Optional[tuple]:
+        """(expires_at, stale_at, payload) if the slot holds key, else None"""
+        offset = slot * self.slot_bytes
+        for _ in range(READ_RETRIES):
+            sequence, stored_hash, expires_at, stale_at, key_length, value_length = \
+                HEADER.unpack_from(self._map, offset)
+            if sequence & 1:
+                continue
+            if stored_hash != key_hash:
+                return None
+            start = offset + HEADER.size
+            stored_key = self._map[start:start + key_length]
+            payload = self._map[start + key_length:start + key_length + value_length]
+            if SEQUENCE.unpack_from(self._map, offset)[0] != sequence:
+                continue
+            return (expires_at, stale_at, payload) if stored_key == key_bytes else None
+        # Still being rewritten: treat as a miss rather than spin
+        return None
+
+    def _choose_slot(self, key_hash: int, key_bytes: bytes):
+        """The slot already holding key, else an empty or expired one, else the one closest to expiry"""
+        now = time.time()
+        base = (key_hash % self.sets) * WAYS
+        free, oldest, oldest_expires = None, base, float('inf')
+        for slot in range(base, base + WAYS):
+            _, stored_hash, expires_at, _, key_length, _ = HEADER.unpack_from(self._map, slot * self.slot_bytes)
+            if stored_hash == key_hash:
+                start = slot * self.slot_bytes + HEADER.size
+                if self._map[start:start + key_length] == key_bytes:
+                    return slot, False
+            if not stored_hash or expires_at <= now:
+                if free is None:
+                    free = slot
+            elif expires_at < oldest_expires:
+                oldest, oldest_expires = slot, expires_at
+        if free is not None:
+            return free, False
+        return oldest, True
+
+    def _write(self, slot: int, key_hash: int, expires_at: float, stale_at: float, key_bytes: bytes,
+               payload: bytes):
+        offset = slot * self.slot_bytes
+        # Odd while writing; a slot left odd by a writer that died mid-write stays odd until now
+        writing = SEQUENCE.unpack_from(self._map, offset)[0] | 1
+        SEQUENCE.pack_into(self._map, offset, writing)
+        start = offset + HEADER.size
+        self._map[start:start + len(key_bytes) + len(payload)] = key_bytes + payload
+        HEADER.pack_into(self._map, offset, writing, key_hash, expires_at, stale_at, len(key_bytes), len(payload))
+        SEQUENCE.pack_into(self._map, offset, (writing + 1) & 0xFFFFFFFF)
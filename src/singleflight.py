@@ -0,0 +1,86 @@
+"""
+Request coalescing: concurrent calls with the same key share one execution
+"""
+
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+class _Call:
+    """An in-flight call that waiting threads block on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Thread-safe single-flight group"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call with the same key is in flight
+
+        The first caller executes fn; callers arriving while it runs wait and
+        receive the same result, or have the same exception raised.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+class AsyncSingleFlight:
+    """Single-flight group for coroutines running on one event loop"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, coro_fn: Callable, *args, **kwargs) -> Any:
+        """
+        Await coro_fn(*args, **kwargs), sharing the result with concurrent callers of key
+
+        The call runs as a task of its own that every caller shields, so a
+        caller that is cancelled (or times out) stops waiting without
+        cancelling the call for the others.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._calls[key] = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            task.add_done_callback(functools.partial(self._finished, key))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every caller stopped waiting
+            task.exception()
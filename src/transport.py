@@ -0,0 +1,116 @@
+"""
+Shared HTTP transport for OpenWeatherMap calls
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .config import Config
+    from .metrics import get_metrics
+    from .scheduler import QuotaScheduler, get_scheduler
+except ImportError:
+    from config import Config
+    from metrics import get_metrics
+    from scheduler import QuotaScheduler, get_scheduler
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_BACKOFF_SECONDS = 30.0
+
+class HttpTransport:
+    """Keep-alive connection pool with timeouts and bounded, jittered retries"""
+
+    def __init__(self, pool_size: Optional[int] = None, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, backoff: Optional[float] = None,
+                 scheduler: Optional[QuotaScheduler] = None, service: str = 'openweather'):
+        self.pool_size = pool_size if pool_size is not None else Config.HTTP_POOL_SIZE
+        self.timeout = timeout if timeout is not None else Config.HTTP_TIMEOUT_SECONDS
+        self.max_retries = max_retries if max_retries is not None else Config.HTTP_MAX_RETRIES
+        self.backoff = backoff if backoff is not None else Config.HTTP_BACKOFF_SECONDS
+        self.scheduler = scheduler
+        self.service = service
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None) -> requests.Response:
+        """
+        Send a GET request over the pooled session
+
+        Retries connection failures and RETRY_STATUS_CODES up to max_retries
+        times. The last response is returned as-is so callers can report it
+        through handle_api_errors; a network failure on the last attempt raises
+        requests.RequestException. With a scheduler, every attempt first waits
+        for request quota and may raise QuotaExceeded.
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+        api_key = (params or {}).get('appid')
+        metrics = get_metrics()
+        attempt = 0
+        while True:
+            if self.scheduler is not None:
+                self.scheduler.acquire(self.service, endpoint, api_key)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                metrics.inc('upstream_responses_total', service=self.service, endpoint=endpoint,
+                            status=type(exc).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                metrics.inc('upstream_retries_total', service=self.service, endpoint=endpoint)
+                time.sleep(self._backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            metrics.observe('upstream_request_seconds', time.perf_counter() - started,
+                            service=self.service, endpoint=endpoint)
+            metrics.inc('upstream_responses_total', service=self.service, endpoint=endpoint,
+                        status=str(response.status_code))
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                return response
+
+            metrics.inc('upstream_retries_total', service=self.service, endpoint=endpoint)
+            time.sleep(self._backoff_delay(attempt, response))
+            attempt += 1
+
+    def _backoff_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Full-jitter exponential backoff, honouring a numeric Retry-After header"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), MAX_BACKOFF_SECONDS)
+        return random.uniform(0, min(self.backoff * (2 ** attempt), MAX_BACKOFF_SECONDS))
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+_transport: Optional[HttpTransport] = None
+_transport_lock = threading.Lock()
+
+def get_transport() -> HttpTransport:
+    """Return the process-wide transport, creating it on first use"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HttpTransport(scheduler=get_scheduler())
+    return _transport
+
+def set_transport(transport: Optional[HttpTransport]) -> Optional[HttpTransport]:
+    """Replace the process-wide transport and return the previous one"""
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
\ No newline at end of file
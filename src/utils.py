@@ -6,6 +6,9 @@ import re
 from datetime import datetime
 from typing import Dict, Optional, Any
 
+# Compass sectors, 45 degrees each, starting at north
+WIND_DIRECTIONS = ("N", "NE", "E", "SE", "S", "SW", "W", "NW")
+
 def handle_api_errors(response) -> Optional[Dict[str, Any]]:
     """Handle API response errors"""
     if response.status_code == 200:
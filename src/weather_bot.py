@@ -4,36 +4,1266 @@ Weather Bot Main Implementation
 Start implementing your functions here. Import from config and utils as needed.
 """
 
+import asyncio
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
 import requests
 import re
-from datetime import datetime
-from typing import Tuple, Dict, Optional, List, Union
-import google.generativeai as genai
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Tuple, Dict, Optional, List, Union, Iterator, Iterable
 
-from .config import Config, load_configuration
-from .utils import handle_api_errors, format_timestamp, clean_location_string
+try:
+    from .config import Config, load_configuration
+    from .utils import handle_api_errors, format_timestamp, clean_location_string, WIND_DIRECTIONS
+    from .transport import get_transport, set_transport
+    from .cache import MemoryCache, SQLiteCache, TieredCache
+    from .gazetteer import Gazetteer
+    from .geo import GridQuantizer
+    from .singleflight import AsyncSingleFlight, SingleFlight
+    from .query_analyzer import analyze_query
+    from .records import ForecastSlot, WeatherRecord
+    from .refresh import BackgroundRefresher, HotSet
+    from .metrics import get_metrics, stage_breakdown
+    from .interaction_log import InteractionLogWriter, worker_log_path
+    from .scheduler import QuotaExceeded, get_scheduler
+    from .alerts import Alert, AlertEngine
+except ImportError:
+    from config import Config, load_configuration
+    from utils import handle_api_errors, format_timestamp, clean_location_string, WIND_DIRECTIONS
+    from transport import get_transport, set_transport
+    from cache import MemoryCache, SQLiteCache, TieredCache
+    from gazetteer import Gazetteer
+    from geo import GridQuantizer
+    from singleflight import AsyncSingleFlight, SingleFlight
+    from query_analyzer import analyze_query
+    from records import ForecastSlot, WeatherRecord
+    from refresh import BackgroundRefresher, HotSet
+    from metrics import get_metrics, stage_breakdown
+    from interaction_log import InteractionLogWriter, worker_log_path
+    from scheduler import QuotaExceeded, get_scheduler
+    from alerts import Alert, AlertEngine
+
+def _error_message(error_info: Dict) -> str:
+    """Render a handle_api_errors result as an error string"""
+    return f"Error {error_info['status_code']}: {error_info['message']}"
+
+def _valid_coordinates(lat: float, lon: float) -> bool:
+    """Check that coordinates are within valid ranges"""
+    return -90 <= lat <= 90 and -180 <= lon <= 180
+
+_cache: Optional[TieredCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> TieredCache:
+    """Return the process-wide weather cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                disk = SQLiteCache(Config.CACHE_DB_PATH) if Config.CACHE_DB_PATH else None
+                _cache = TieredCache(MemoryCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_MAX_BYTES), disk)
+    return _cache
+
+def use_shared_cache(shared):
+    """
+    Put a SharedCache behind this process's in-memory tier
+
+    Called in worker processes so they share fetched weather and geocoding
+    results instead of each keeping a full cache of its own.
+    """
+    global _cache
+    with _cache_lock:
+        _cache = TieredCache(MemoryCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_MAX_BYTES), shared)
+
+def reset_process_state():
+    """
+    Forget thread pools, the refresher and its hot set, the interaction log
+    writer, the history store and the HTTP transport inherited from a parent
+    process
+
+    Called first in forked worker processes, where the parent's threads,
+    open files and pooled connections are unusable; each is recreated on
+    first use.
+    """
+    global _executor, _gemini_executor, _refresher, _hot_set, _interaction_log, _history
+    _executor = None
+    _gemini_executor = None
+    _refresher = None
+    _hot_set = None
+    _interaction_log = None
+    _history = None
+    set_transport(None)
+
+def use_worker_files(index: int):
+    """
+    Give worker process index its own interaction log and history store
+
+    Both have a single writer: log rotation and the history store's append
+    log and location ids cannot be shared between processes. Config reads
+    the paths lazily, so this only has to run before their first use.
+    """
+    if Config.INTERACTION_LOG_PATH:
+        os.environ['WEATHER_BOT_INTERACTION_LOG'] = worker_log_path(Config.INTERACTION_LOG_PATH, index)
+    if Config.HISTORY_PATH:
+        # history -> history.worker-0
+        os.environ['WEATHER_BOT_HISTORY'] = f"{os.path.normpath(Config.HISTORY_PATH)}.worker-{index}"
+
+def _cache_key(location: str) -> str:
+    """Normalize a location into a cache key"""
+    return clean_location_string(location).lower()
+
+def cache_weather_data(location: str, data: Dict, minutes: int = Config.CACHE_DURATION_MINUTES,
+                       stale_minutes: int = 0):
+    """
+    Cache weather data for a location
+
+    Args:
+        location: Location name or internal cache key
+        data: JSON-serializable weather data
+        minutes: Time to live in minutes
+        stale_minutes: Further minutes the entry may be served while it is refreshed
+    """
+    get_cache().set(_cache_key(location), data, minutes * 60, stale_minutes * 60)
+
+def get_cached_data(location: str) -> Optional[Dict]:
+    """Return cached weather data for a location, or None if missing or expired"""
+    return get_cache().get(_cache_key(location))
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss/eviction counters for each cache tier"""
+    return get_cache().stats()
+
+_refresher: Optional[BackgroundRefresher] = None
+# Created by start_prefetch; lookups are only counted while prefetch is running
+_hot_set: Optional[HotSet] = None
+
+def get_refresher() -> BackgroundRefresher:
+    """Return the background refresher that renews stale cache entries"""
+    global _refresher
+    if _refresher is None:
+        with _cache_lock:
+            if _refresher is None:
+                _refresher = BackgroundRefresher(Config.REFRESH_MAX_WORKERS)
+                atexit.register(_refresher.close)
+    return _refresher
+
+def start_prefetch() -> bool:
+    """
+    Start refreshing the Config.PREFETCH_TOP_N most requested locations before they go stale
+
+    Prefetch is opt-in: it runs only once this is called with PREFETCH_TOP_N
+    above zero, and only renews entries that are still cached.
+
+    Returns:
+        True if the prefetch loop is running
+    """
+    global _hot_set
+    if Config.PREFETCH_TOP_N <= 0:
+        return False
+    refresher = get_refresher()
+    with _cache_lock:
+        if _hot_set is None:
+            _hot_set = HotSet(Config.PREFETCH_TOP_N, Config.HOT_SET_SKETCH_WIDTH, Config.HOT_SET_SKETCH_DEPTH,
+                              Config.HOT_SET_DECAY_EVERY, Config.HOT_SET_IDLE_SECONDS)
+    refresher.start_prefetch(_hot_set, _needs_prefetch, Config.PREFETCH_INTERVAL_SECONDS)
+    return True
+
+def get_refresh_stats() -> Dict[str, int]:
+    """Background refresh and prefetch counters"""
+    hot_set = _hot_set
+    return dict(get_refresher().stats, hot_entries=0 if hot_set is None else len(hot_set))
+
+def _needs_prefetch(cache_key: str) -> bool:
+    """True when a hot entry is still cached and goes stale before the next prefetch pass"""
+    memory = get_cache().memory
+    stale_in = memory.stale_in(cache_key)
+    remaining = memory.remaining_ttl(cache_key)
+    if stale_in is None or remaining is None or remaining <= 0:
+        return False
+    return stale_in <= Config.PREFETCH_INTERVAL_SECONDS
+
+def _refresh_job(fetch: Callable, *args) -> Callable[[], bool]:
+    """Wrap an upstream fetch as a refresh job that reports success"""
+    return lambda: not isinstance(fetch(*args), str)
+
+def _cached_weather(cache_key: str, fetch: Callable, *args):
+    """
+    Serve a weather entry until its hard TTL, refreshing it in the background once stale
+
+    fetch(*args) gets a fresh copy from upstream. While prefetch is running,
+    every lookup also counts towards its hot set.
+    """
+    cache_key = _cache_key(cache_key)
+    hot_set = _hot_set
+    if hot_set is not None:
+        hot_set.record(cache_key, _refresh_job, fetch, *args)
+    metrics = get_metrics()
+    with metrics.stage('cache'):
+        entry = get_cache().get_entry(cache_key)
+    if entry is None:
+        metrics.inc('cache_requests_total', cache='weather', result='miss')
+        return None
+
+    value, _, stale_at = entry
+    if stale_at <= time.time():
+        metrics.inc('cache_requests_total', cache='weather', result='stale')
+        get_refresher().submit(cache_key, _refresh_job(fetch, *args))
+    else:
+        metrics.inc('cache_requests_total', cache='weather', result='hit')
+    return value
+
+_quantizer: Optional[GridQuantizer] = None
+
+def get_grid_quantizer() -> GridQuantizer:
+    """Return the coordinate quantizer configured by Config.GRID_MODE"""
+    global _quantizer
+    if _quantizer is None:
+        with _cache_lock:
+            if _quantizer is None:
+                _quantizer = GridQuantizer(Config.GRID_MODE, Config.GRID_GEOHASH_PRECISION,
+                                           Config.GRID_STEP_DEGREES)
+    return _quantizer
+
+# Coalesces concurrent upstream fetches for the same (endpoint, coordinates, units, days)
+_weather_flight = SingleFlight()
+_async_coalesced = 0
+
+def get_singleflight_stats() -> Dict[str, int]:
+    """How many weather fetches were coalesced into an in-flight call"""
+    return {'threaded': _weather_flight.coalesced, 'async': _async_coalesced}
+
+def get_grid_stats() -> Dict[str, int]:
+    """How many weather requests were snapped and how many were deduplicated by the grid"""
+    return get_grid_quantizer().stats()
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_loaded = False
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """Return the offline gazetteer configured by Config.GAZETTEER_PATH, if any"""
+    global _gazetteer, _gazetteer_loaded
+    if not _gazetteer_loaded:
+        with _gazetteer_lock:
+            if not _gazetteer_loaded:
+                path = Config.GAZETTEER_PATH
+                if path and os.path.exists(path):
+                    _gazetteer = Gazetteer.load(path)
+                elif path and Config.GAZETTEER_WRITE_BACK:
+                    _gazetteer = Gazetteer()
+                if _gazetteer is not None and Config.GAZETTEER_WRITE_BACK:
+                    atexit.register(save_gazetteer)
+                _gazetteer_loaded = True
+    return _gazetteer
+
+def save_gazetteer() -> bool:
+    """Persist places learned from the geocoding API back to the gazetteer index file"""
+    gazetteer = _gazetteer
+    path = Config.GAZETTEER_PATH
+    if gazetteer is None or not gazetteer.dirty or not path or path.endswith(('.csv', '.json')):
+        return False
+    gazetteer.save(path)
+    return True
+
+def _coordinates_offline(location: str) -> Optional[Tuple[float, float, str]]:
+    """Resolve a cleaned location from the gazetteer or the geocode cache, without the API"""
+    gazetteer = get_gazetteer()
+    metrics = get_metrics()
+    if gazetteer is not None:
+        match = gazetteer.lookup(location)
+        if match is not None:
+            metrics.inc('cache_requests_total', cache='geocode', result='gazetteer')
+            return match
+
+    cached = get_cached_data(f"geocode:{location}")
+    metrics.inc('cache_requests_total', cache='geocode', result='miss' if cached is None else 'hit')
+    return None if cached is None else tuple(cached)
 
-# Example function to get you started:
 def get_coordinates(location_string: str) -> Tuple[Optional[float], Optional[float], Optional[str]]:
     """
     Get latitude, longitude, and formatted city name for a location
-    
+
     Args:
         location_string: City name or "City, Country" format
-        
+
     Returns:
         Tuple of (latitude, longitude, formatted_city_name) or (None, None, None)
     """
     if not location_string or not location_string.strip():
         return None, None, None
-    
-    # TODO: Implement this function
-    # 1. Clean the location string
-    # 2. Make API call to OpenWeatherMap geocoding
-    # 3. Parse response and return coordinates
-    pass
-
-# Add all your other functions here...
-# def fetch_current_weather(lat: float, lon: float) -> Union[Dict, str]:
-# def fetch_weather_forecast(lat: float, lon: float, days: int = 5) -> Union[Dict, str]:
-# etc...
\ No newline at end of file
+
+    location = clean_location_string(location_string)
+    coordinates = _coordinates_offline(location)
+    if coordinates is not None:
+        return coordinates
+
+    gazetteer = get_gazetteer()
+    cache_key = f"geocode:{location}"
+    params = {'q': location, 'limit': 1, 'appid': Config.OPENWEATHER_API_KEY}
+    try:
+        response = get_transport().get(f"{Config.OPENWEATHER_GEO_URL}/direct", params=params)
+    except (requests.RequestException, QuotaExceeded):
+        return None, None, None
+
+    if handle_api_errors(response):
+        return None, None, None
+
+    results = response.json()
+    if not results:
+        return None, None, None
+
+    match = results[0]
+    coordinates = float(match['lat']), float(match['lon']), match['name']
+    if gazetteer is not None and Config.GAZETTEER_WRITE_BACK:
+        gazetteer.add(match['name'], match['lat'], match['lon'], match.get('country'), match.get('state'))
+    cache_weather_data(cache_key, list(coordinates), Config.GEOCODE_CACHE_DURATION_MINUTES)
+    return coordinates
+
+def format_weather_data(raw_data: Dict) -> Dict:
+    """
+    Flatten an OpenWeatherMap current weather payload
+
+    Args:
+        raw_data: JSON body returned by the /weather endpoint
+
+    Returns:
+        Dict with location, temperature, humidity, pressure, description,
+        wind_speed, wind_direction and timestamp (missing fields are None)
+    """
+    main = raw_data.get('main', {})
+    wind = raw_data.get('wind', {})
+    weather = raw_data.get('weather') or [{}]
+    timestamp = raw_data.get('dt')
+
+    return {
+        'location': raw_data.get('name'),
+        'temperature': main.get('temp'),
+        'humidity': main.get('humidity'),
+        'pressure': main.get('pressure'),
+        'description': weather[0].get('description'),
+        'wind_speed': wind.get('speed'),
+        'wind_direction': wind.get('deg'),
+        'timestamp': format_timestamp(timestamp) if timestamp else format_timestamp(int(datetime.now().timestamp()))
+    }
+
+def fetch_current_weather(lat: float, lon: float) -> Union[Dict, str]:
+    """
+    Fetch current weather conditions for a coordinate pair
+
+    Args:
+        lat: Latitude in degrees
+        lon: Longitude in degrees
+
+    Returns:
+        Formatted weather dict, or an error string
+    """
+    if not _valid_coordinates(lat, lon):
+        return f"Error: invalid coordinates ({lat}, {lon})"
+
+    lat, lon = get_grid_quantizer().snap(lat, lon)
+    cached = _current_weather_from_cache(lat, lon)
+    if cached is not None:
+        return cached
+    return _current_weather_from_upstream(lat, lon)
+
+def _current_weather_from_cache(lat: float, lon: float) -> Optional[Dict]:
+    """Cached current weather for already-snapped coordinates"""
+    cached = _cached_weather(f"current:{lat:.4f},{lon:.4f}", _current_weather_from_upstream, lat, lon)
+    return None if cached is None else dict(cached)
+
+def _current_weather_from_upstream(lat: float, lon: float) -> Union[Dict, str]:
+    """Fetch current weather for already-snapped coordinates, coalescing identical calls"""
+    key = ('current', lat, lon, Config.DEFAULT_UNITS)
+    return _weather_flight.do(key, _request_current_weather, lat, lon, f"current:{lat:.4f},{lon:.4f}")
+
+def _request_current_weather(lat: float, lon: float, cache_key: str) -> Union[Dict, str]:
+    """Call the /weather endpoint and cache a successful result"""
+    params = {'lat': lat, 'lon': lon, 'units': Config.DEFAULT_UNITS, 'appid': Config.OPENWEATHER_API_KEY}
+    try:
+        response = get_transport().get(f"{Config.OPENWEATHER_BASE_URL}/weather", params=params)
+    except (requests.RequestException, QuotaExceeded) as exc:
+        return f"Error: {exc}"
+
+    error_info = handle_api_errors(response)
+    if error_info:
+        return _error_message(error_info)
+
+    raw_data = response.json()
+    weather_data = format_weather_data(raw_data)
+    cache_weather_data(cache_key, WeatherRecord.from_dict(weather_data),
+                       stale_minutes=Config.CACHE_STALE_MINUTES)
+    _record_history(lat, lon, weather_data, raw_data.get('dt'))
+    return weather_data
+
+def _format_forecast_slot(raw_slot: Dict) -> Dict:
+    """Flatten a single 3-hour slot from the /forecast endpoint"""
+    main = raw_slot.get('main', {})
+    wind = raw_slot.get('wind', {})
+    weather = raw_slot.get('weather') or [{}]
+
+    return {
+        'datetime': raw_slot.get('dt_txt') or format_timestamp(raw_slot['dt']),
+        'temperature': main.get('temp'),
+        'humidity': main.get('humidity'),
+        'pressure': main.get('pressure'),
+        'description': weather[0].get('description'),
+        'wind_speed': wind.get('speed'),
+        'wind_direction': wind.get('deg'),
+        'pop': raw_slot.get('pop')
+    }
+
+def fetch_weather_forecast(lat: float, lon: float, days: int = 5) -> Union[Dict, str]:
+    """
+    Fetch a 3-hourly weather forecast for a coordinate pair
+
+    Args:
+        lat: Latitude in degrees
+        lon: Longitude in degrees
+        days: Number of days to forecast (1 to Config.MAX_FORECAST_DAYS)
+
+    Returns:
+        Dict with 'location' and a 'forecast' list of slots, or an error string
+    """
+    if not _valid_coordinates(lat, lon):
+        return f"Error: invalid coordinates ({lat}, {lon})"
+
+    lat, lon = get_grid_quantizer().snap(lat, lon)
+    days = max(1, min(days, Config.MAX_FORECAST_DAYS))
+    cached = _weather_forecast_from_cache(lat, lon, days)
+    if cached is not None:
+        return cached
+    return _weather_forecast_from_upstream(lat, lon, days)
+
+def _weather_forecast_from_cache(lat: float, lon: float, days: int) -> Optional[Dict]:
+    """Cached forecast for already-snapped coordinates"""
+    cached = _cached_weather(f"forecast:{lat:.4f},{lon:.4f}:{days}", _weather_forecast_from_upstream,
+                             lat, lon, days)
+    if cached is None:
+        return None
+    return {'location': cached['location'], 'forecast': [dict(slot) for slot in cached['forecast']]}
+
+def _weather_forecast_from_upstream(lat: float, lon: float, days: int) -> Union[Dict, str]:
+    """Fetch a forecast for already-snapped coordinates, coalescing identical calls"""
+    key = ('forecast', lat, lon, Config.DEFAULT_UNITS, days)
+    return _weather_flight.do(key, _request_weather_forecast, lat, lon, days,
+                              f"forecast:{lat:.4f},{lon:.4f}:{days}")
+
+def _request_weather_forecast(lat: float, lon: float, days: int, cache_key: str) -> Union[Dict, str]:
+    """Call the /forecast endpoint and cache a successful result"""
+    params = {
+        'lat': lat,
+        'lon': lon,
+        'cnt': days * 8,
+        'units': Config.DEFAULT_UNITS,
+        'appid': Config.OPENWEATHER_API_KEY
+    }
+    try:
+        response = get_transport().get(f"{Config.OPENWEATHER_BASE_URL}/forecast", params=params)
+    except (requests.RequestException, QuotaExceeded) as exc:
+        return f"Error: {exc}"
+
+    error_info = handle_api_errors(response)
+    if error_info:
+        return _error_message(error_info)
+
+    raw_data = response.json()
+    forecast_data = {
+        'location': raw_data.get('city', {}).get('name'),
+        'forecast': [_format_forecast_slot(slot) for slot in raw_data.get('list', [])]
+    }
+    cache_weather_data(cache_key, {
+        'location': forecast_data['location'],
+        'forecast': [ForecastSlot.from_dict(slot) for slot in forecast_data['forecast']]
+    }, stale_minutes=Config.CACHE_STALE_MINUTES)
+    if Config.HISTORY_RECORD_FORECASTS:
+        timestamps = [slot.get('dt') for slot in raw_data.get('list', [])]
+        _record_history(lat, lon, forecast_data, None if None in timestamps else timestamps)
+    _evaluate_alerts(lat, lon, forecast_data)
+    return forecast_data
+
+Location = Union[str, Tuple[float, float]]
+
+def fetch_current_weather_many(locations: Iterable[Location],
+                               max_workers: Optional[int] = None) -> Iterator[Tuple[Location, Union[Dict, str]]]:
+    """
+    Fetch current weather for many locations, yielding results as they complete
+
+    Args:
+        locations: City names and/or (lat, lon) pairs
+        max_workers: Parallel upstream fetches (default Config.OPENWEATHER_MAX_CONCURRENCY)
+
+    Yields:
+        (location, weather dict or error string) for every input location;
+        cached results first, then deduplicated upstream fetches in completion order
+    """
+    return _fetch_many(locations, None, max_workers)
+
+def fetch_weather_forecast_many(locations: Iterable[Location], days: int = 5,
+                                max_workers: Optional[int] = None) -> Iterator[Tuple[Location, Union[Dict, str]]]:
+    """
+    Fetch forecasts for many locations, yielding results as they complete
+
+    Same behaviour as fetch_current_weather_many, with forecast dicts as results.
+    """
+    return _fetch_many(locations, max(1, min(days, Config.MAX_FORECAST_DAYS)), max_workers)
+
+def _fetch_by_name(location: str, days: Optional[int]) -> Union[Dict, str]:
+    """Geocode a location and fetch its weather (forecast when days is given)"""
+    lat, lon, _ = get_coordinates(location)
+    if lat is None:
+        return f"Error: location not found: {location}"
+    if days is None:
+        return fetch_current_weather(lat, lon)
+    return fetch_weather_forecast(lat, lon, days)
+
+def _fetch_snapped(lat: float, lon: float, days: Optional[int]) -> Union[Dict, str]:
+    if days is None:
+        return _current_weather_from_upstream(lat, lon)
+    return _weather_forecast_from_upstream(lat, lon, days)
+
+def _fetch_many(locations: Iterable[Location], days: Optional[int],
+                max_workers: Optional[int]) -> Iterator[Tuple[Location, Union[Dict, str]]]:
+    quantizer = get_grid_quantizer()
+    pending: Dict[Tuple[float, float], List[Location]] = {}
+    unresolved: Dict[str, List[Location]] = {}
+
+    # Answer everything that needs no network first
+    for location in locations:
+        if isinstance(location, str):
+            name = clean_location_string(location)
+            if not name:
+                yield location, "Error: empty location"
+                continue
+            coordinates = _coordinates_offline(name)
+            if coordinates is None:
+                unresolved.setdefault(name, []).append(location)
+                continue
+            lat, lon = coordinates[0], coordinates[1]
+        else:
+            lat, lon = location
+
+        if not _valid_coordinates(lat, lon):
+            yield location, f"Error: invalid coordinates ({lat}, {lon})"
+            continue
+
+        lat, lon = quantizer.snap(lat, lon)
+        if days is None:
+            cached = _current_weather_from_cache(lat, lon)
+        else:
+            cached = _weather_forecast_from_cache(lat, lon, days)
+        if cached is not None:
+            yield location, cached
+        else:
+            pending.setdefault((lat, lon), []).append(location)
+
+    if not pending and not unresolved:
+        return
+
+    # Fetch each distinct miss once, in parallel; the caller's context (e.g. its
+    # request priority) is copied into every task
+    executor = ThreadPoolExecutor(max_workers=max_workers or Config.OPENWEATHER_MAX_CONCURRENCY,
+                                  thread_name_prefix='weather-bot-bulk')
+    futures = {}
+    for (lat, lon), waiting in pending.items():
+        future = executor.submit(contextvars.copy_context().run, _fetch_snapped, lat, lon, days)
+        futures[future] = waiting
+    for name, waiting in unresolved.items():
+        future = executor.submit(contextvars.copy_context().run, _fetch_by_name, name, days)
+        futures[future] = waiting
+
+    try:
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = f"Error: {exc}"
+            for location in futures[future]:
+                yield location, result
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+def validate_api_keys(openweather_key: str, gemini_key: str) -> bool:
+    """
+    Check that both API keys are present and the OpenWeatherMap key is accepted
+
+    This is a one-off startup check, so it deliberately uses a plain request
+    rather than the pooled transport.
+    """
+    if not openweather_key or not gemini_key:
+        return False
+
+    params = {'q': 'London', 'appid': openweather_key}
+    try:
+        response = requests.get(f"{Config.OPENWEATHER_BASE_URL}/weather", params=params,
+                                timeout=Config.HTTP_TIMEOUT_SECONDS)
+    except requests.RequestException:
+        return False
+
+    return handle_api_errors(response) is None
+
+def extract_location_from_query(user_input: str) -> Optional[str]:
+    """
+    Extract the location mentioned in a natural language query
+
+    Args:
+        user_input: Raw query such as "weather in Dallas, Texas" or "Tokyo forecast"
+
+    Returns:
+        Location string, or None if no location is mentioned
+    """
+    return analyze_query(user_input or '').location
+
+def determine_query_type(user_input: str) -> str:
+    """Classify a query as "current" or "forecast" weather"""
+    return analyze_query(user_input or '').query_type
+
+def parse_time_intent(user_input: str) -> Optional[int]:
+    """
+    Extract how many days ahead a query is asking about
+
+    Returns:
+        Day offset (0 for today, 1 for tomorrow, 7 for next week, N for
+        "N days"), or None when no time is mentioned
+    """
+    return analyze_query(user_input or '').day_offset
+
+def convert_units(celsius: float) -> Tuple[float, float, float]:
+    """Convert a Celsius temperature to (celsius, fahrenheit, kelvin)"""
+    return celsius, round(celsius * 9 / 5 + 32, 2), round(celsius + 273.15, 2)
+
+def calculate_wind_direction(degrees: float) -> str:
+    """Map a wind bearing in degrees to one of eight compass directions"""
+    return WIND_DIRECTIONS[int(((degrees % 360) + 22.5) // 45) % 8]
+
+def _temperature_unit() -> str:
+    """Temperature unit symbol for Config.DEFAULT_UNITS"""
+    return {'metric': '°C', 'imperial': '°F'}.get(Config.DEFAULT_UNITS, 'K')
+
+def initialize_gemini_client(api_key: str):
+    """
+    Configure the Gemini SDK and create a model client
+
+    Returns:
+        GenerativeModel instance, or None if no key was given
+    """
+    if not api_key:
+        return None
+
+    # Imported here: the SDK pulls in gRPC/protobuf, which dominates import time
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(Config.GEMINI_MODEL)
+
+_gemini_clients: Dict[str, object] = {}
+
+def _get_gemini_client():
+    """Return a Gemini client for the configured key, reusing it across calls"""
+    api_key = Config.GEMINI_API_KEY
+    if not api_key:
+        return None
+    if api_key not in _gemini_clients:
+        _gemini_clients[api_key] = initialize_gemini_client(api_key)
+    return _gemini_clients[api_key]
+
+def _build_prompt(weather_data: Dict, query: str) -> str:
+    """Build the Gemini prompt for a query and its weather data"""
+    return (
+        "You are a friendly weather assistant. Answer the user's question in two or three "
+        "sentences using only the weather data below. Always mention the location by name.\n"
+        f"Temperatures are in {_temperature_unit()}.\n\n"
+        f"Question: {query}\n"
+        f"Weather data: {weather_data}"
+    )
+
+_response_cache = MemoryCache(Config.RESPONSE_CACHE_MAX_ENTRIES)
+
+def _bucket(value: Optional[float], size: float) -> Optional[float]:
+    """Round a reading to the nearest bucket so small changes share a key"""
+    return None if value is None else round(value / size) * size
+
+def _response_cache_key(weather_data: Dict, query: str) -> str:
+    """Key a generation on intent, location and bucketed weather rather than the raw text"""
+    analysis = analyze_query(query)
+    size = Config.RESPONSE_TEMPERATURE_BUCKET
+    if 'forecast' in weather_data:
+        slots = weather_data['forecast']
+        temperatures = [slot['temperature'] for slot in slots if slot.get('temperature') is not None]
+        features = (
+            _bucket(min(temperatures), size) if temperatures else None,
+            _bucket(max(temperatures), size) if temperatures else None,
+            tuple(sorted({slot.get('description') or '' for slot in slots}))
+        )
+    else:
+        wind = weather_data.get('wind_direction')
+        features = (
+            _bucket(weather_data.get('temperature'), size),
+            weather_data.get('description'),
+            calculate_wind_direction(wind) if wind is not None else None
+        )
+    location = (weather_data.get('location') or '').lower()
+    return repr((analysis.query_type, analysis.day_offset, location, features))
+
+def get_response_cache_stats() -> Dict[str, int]:
+    """Hit/miss/eviction counters for the Gemini response cache"""
+    stats = _response_cache.stats.as_dict()
+    stats['entries'] = len(_response_cache)
+    return stats
+
+_gemini_executor: Optional[ThreadPoolExecutor] = None
+_gemini_slots: Optional[threading.BoundedSemaphore] = None
+_gemini_executor_lock = threading.Lock()
+_budget_stats = {'budget_exceeded': 0, 'queue_full': 0}
+_budget_stats_lock = threading.Lock()
+
+def _get_gemini_executor() -> ThreadPoolExecutor:
+    """Worker threads for budgeted Gemini calls; also caps calls that outlive their deadline"""
+    global _gemini_executor, _gemini_slots
+    if _gemini_executor is None:
+        with _gemini_executor_lock:
+            if _gemini_executor is None:
+                _gemini_slots = threading.BoundedSemaphore(Config.GEMINI_MAX_CONCURRENCY + Config.GEMINI_MAX_QUEUE)
+                _gemini_executor = ThreadPoolExecutor(max_workers=Config.GEMINI_MAX_CONCURRENCY,
+                                                      thread_name_prefix='weather-bot-gemini')
+    return _gemini_executor
+
+def _submit_gemini(fn: Callable, *args) -> Optional[Future]:
+    """
+    Queue fn on the Gemini executor, or return None when GEMINI_MAX_QUEUE calls already wait
+
+    Keeps a backlog of calls whose callers have given up from delaying new
+    queries past their own budget.
+    """
+    executor = _get_gemini_executor()
+    slots = _gemini_slots
+    if not slots.acquire(blocking=False):
+        _count_budget_stat('queue_full')
+        return None
+    future = executor.submit(fn, *args)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+def _count_budget_stat(name: str):
+    with _budget_stats_lock:
+        _budget_stats[name] += 1
+    if name == 'budget_exceeded':
+        get_metrics().inc('latency_budget_exceeded_total')
+    else:
+        get_metrics().inc('gemini_queue_full_total')
+
+def get_latency_budget_stats() -> Dict[str, int]:
+    """
+    How many responses fell back to the template because Gemini missed the
+    budget, or because too many Gemini calls were already queued
+    """
+    with _budget_stats_lock:
+        return dict(_budget_stats)
+
+def _gemini_status(exc: Optional[Exception]) -> str:
+    """Status label for a Gemini call: 200, 429, throttled (local quota) or error"""
+    if exc is None:
+        return '200'
+    if isinstance(exc, QuotaExceeded):
+        return 'throttled'
+    if '429' in str(exc) or type(exc).__name__ == 'ResourceExhausted':
+        return '429'
+    return 'error'
+
+def _record_gemini_call(started: float, exc: Optional[Exception] = None):
+    metrics = get_metrics()
+    metrics.observe('upstream_request_seconds', time.perf_counter() - started, service='gemini', endpoint='generate')
+    metrics.inc('upstream_responses_total', service='gemini', endpoint='generate', status=_gemini_status(exc))
+
+def _generate_with_gemini(client, weather_data: Dict, query: str, cache_key: Optional[str]) -> Optional[str]:
+    """Call Gemini and cache the answer; None when the call fails or returns nothing"""
+    started = time.perf_counter()
+    try:
+        get_scheduler().acquire('gemini', 'generate', Config.GEMINI_API_KEY)
+        text = client.generate_content(_build_prompt(weather_data, query)).text.strip()
+    except Exception as exc:
+        _record_gemini_call(started, exc)
+        return None
+    _record_gemini_call(started)
+    if text and cache_key is not None:
+        _response_cache.set(cache_key, text, Config.RESPONSE_CACHE_MINUTES * 60)
+    return text or None
+
+def generate_natural_response(weather_data: Dict, query: str, budget_seconds: Optional[float] = None) -> str:
+    """
+    Generate a conversational answer with Gemini
+
+    Answers are cached on the query intent, location and bucketed weather, so
+    repeated questions skip the model until the weather meaningfully changes.
+    Falls back to create_fallback_response when Gemini is not configured, the
+    call fails, or it has not answered within budget_seconds (default
+    Config.QUERY_LATENCY_BUDGET_SECONDS). A late answer still fills the cache.
+    """
+    client = _get_gemini_client()
+    if client is None:
+        return create_fallback_response(weather_data)
+
+    cache_key = _response_cache_key(weather_data, query) if Config.RESPONSE_CACHE_ENABLED else None
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key)
+        get_metrics().inc('cache_requests_total', cache='response', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached
+
+    if budget_seconds is None:
+        budget_seconds = Config.QUERY_LATENCY_BUDGET_SECONDS
+    if budget_seconds is None:
+        text = _generate_with_gemini(client, weather_data, query, cache_key)
+    else:
+        future = _submit_gemini(_generate_with_gemini, client, weather_data, query, cache_key)
+        try:
+            text = future.result(timeout=max(budget_seconds, 0)) if future is not None else None
+        except FutureTimeoutError:
+            # Drops the call if it has not started; a running one still fills the cache
+            future.cancel()
+            _count_budget_stat('budget_exceeded')
+            text = None
+
+    return text or create_fallback_response(weather_data)
+
+def stream_natural_response(weather_data: Dict, query: str,
+                            budget_seconds: Optional[float] = None) -> Iterator[str]:
+    """
+    Yield a Gemini answer chunk by chunk as it is generated
+
+    A cached answer is yielded in one piece. If no chunk arrives within
+    budget_seconds (default Config.QUERY_LATENCY_BUDGET_SECONDS), or Gemini
+    fails before producing any text, the fallback response is yielded instead;
+    the stream keeps running in the background and caches the full answer. If
+    Gemini fails mid-answer, the fallback response is appended and nothing is
+    cached.
+    """
+    client = _get_gemini_client()
+    if client is None:
+        yield create_fallback_response(weather_data)
+        return
+
+    cache_key = _response_cache_key(weather_data, query) if Config.RESPONSE_CACHE_ENABLED else None
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key)
+        get_metrics().inc('cache_requests_total', cache='response', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            yield cached
+            return
+
+    chunks: "queue.Queue" = queue.Queue()
+    done = object()
+    failed = object()
+
+    def produce():
+        parts = []
+        started = time.perf_counter()
+        try:
+            get_scheduler().acquire('gemini', 'generate', Config.GEMINI_API_KEY)
+            for chunk in client.generate_content(_build_prompt(weather_data, query), stream=True):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    chunks.put(chunk.text)
+        except Exception as exc:
+            _record_gemini_call(started, exc)
+            chunks.put(failed)
+        else:
+            _record_gemini_call(started)
+            # Only complete answers are cached
+            text = ''.join(parts).strip()
+            if text and cache_key is not None:
+                _response_cache.set(cache_key, text, Config.RESPONSE_CACHE_MINUTES * 60)
+            chunks.put(done)
+
+    future = _submit_gemini(produce)
+    if future is None:
+        yield create_fallback_response(weather_data)
+        return
+
+    if budget_seconds is None:
+        budget_seconds = Config.QUERY_LATENCY_BUDGET_SECONDS
+    try:
+        first = chunks.get(timeout=None if budget_seconds is None else max(budget_seconds, 0))
+    except queue.Empty:
+        future.cancel()
+        _count_budget_stat('budget_exceeded')
+        first = failed
+    if first is done or first is failed:
+        yield create_fallback_response(weather_data)
+        return
+
+    yield first
+    while True:
+        chunk = chunks.get()
+        if chunk is done:
+            return
+        if chunk is failed:
+            # Gemini broke off mid-answer: finish with the template response
+            yield "\n\n" + create_fallback_response(weather_data)
+            return
+        yield chunk
+
+def create_fallback_response(weather_data: Dict) -> str:
+    """Build a plain template response without the AI model"""
+    location = weather_data.get('location') or 'your location'
+    unit = _temperature_unit()
+
+    if 'forecast' in weather_data:
+        slots = [slot for slot in weather_data['forecast'] if slot.get('temperature') is not None]
+        if not slots:
+            return f"Sorry, no forecast data is available for {location}."
+        temperatures = [slot['temperature'] for slot in slots]
+        descriptions = list(dict.fromkeys(slot['description'] for slot in slots if slot.get('description')))
+        response = (f"Forecast for {location}: temperatures between {min(temperatures):.0f}{unit} "
+                    f"and {max(temperatures):.0f}{unit}")
+        if descriptions:
+            response += f" with {', '.join(descriptions)}"
+        return response + "."
+
+    response = f"The current weather in {location} is {weather_data.get('temperature')}{unit}"
+    if weather_data.get('description'):
+        response += f" with {weather_data['description']}"
+    response += "."
+    if weather_data.get('humidity') is not None:
+        response += f" Humidity is at {weather_data['humidity']}%."
+    return response
+
+def _fetch_for_query(lat: float, lon: float, query_type: str, days: Optional[int]) -> Union[Dict, str]:
+    """Fetch current weather or a forecast depending on the query"""
+    if query_type == "forecast":
+        return fetch_weather_forecast(lat, lon, days)
+    return fetch_current_weather(lat, lon)
+
+def _forecast_window(day_offset: Optional[int], day_span: Optional[int]) -> Tuple[int, Optional[int]]:
+    """
+    Days of forecast to fetch for a query, and the day offset whose slots to keep
+
+    "Next 3 days" fetches three days and keeps them all; "tomorrow" fetches
+    enough days to reach tomorrow and keeps only its slots. Offsets past the
+    forecast range ("next week") get the whole range.
+    """
+    if day_span:
+        return max(1, min(day_span, Config.MAX_FORECAST_DAYS)), None
+    if day_offset is None or day_offset >= Config.MAX_FORECAST_DAYS:
+        return Config.MAX_FORECAST_DAYS, None
+    return day_offset + 1, day_offset
+
+def _forecast_for_day(forecast_data: Dict, day_offset: int) -> Dict:
+    """Keep the slots on the (UTC) date day_offset days from now, or all of them if none fall on it"""
+    date = (datetime.now(timezone.utc) + timedelta(days=day_offset)).strftime('%Y-%m-%d')
+    slots = [slot for slot in forecast_data['forecast'] if str(slot.get('datetime') or '').startswith(date)]
+    return {**forecast_data, 'forecast': slots} if slots else forecast_data
+
+def _run_in_executor(loop, executor, fn, *args):
+    """run_in_executor that carries the caller's context (stage breakdown, priority) into the thread"""
+    return loop.run_in_executor(executor, contextvars.copy_context().run, fn, *args)
+
+async def _process_query_async(user_input: str, loop, executor, owm_limit, gemini_limit, flight) -> str:
+    """Run one query through the pipeline, holding the matching limit around each stage"""
+    started = loop.time()
+    metrics = get_metrics()
+    with metrics.stage('parse'):
+        location, query_type, day_offset, day_span = analyze_query(user_input)
+    if not location:
+        return "Please specify a location, for example: \"What's the weather in Boston?\""
+
+    async with owm_limit:
+        with metrics.stage('geocode'):
+            lat, lon, city = await _run_in_executor(loop, executor, get_coordinates, location)
+    if lat is None:
+        return f"Sorry, I couldn't find the location '{location}'."
+
+    days, target_day = _forecast_window(day_offset, day_span) if query_type == "forecast" else (None, None)
+
+    async def fetch():
+        async with owm_limit:
+            return await _run_in_executor(loop, executor, _fetch_for_query, lat, lon, query_type, days)
+
+    # Waiting here rather than in SingleFlight keeps duplicates from tying up executor threads
+    with metrics.stage('weather'):
+        weather_data = await flight.do((query_type, lat, lon, Config.DEFAULT_UNITS, days), fetch)
+    if isinstance(weather_data, str):
+        return f"Sorry, I couldn't get the weather for {city}. {weather_data}"
+
+    if target_day is not None:
+        weather_data = _forecast_for_day(weather_data, target_day)
+    weather_data = {**weather_data, 'location': city}
+    async with gemini_limit:
+        budget = Config.QUERY_LATENCY_BUDGET_SECONDS
+        if budget is not None:
+            budget -= loop.time() - started
+        with metrics.stage('generate'):
+            return await _run_in_executor(loop, executor, generate_natural_response, weather_data, user_input,
+                                          budget)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+def _get_executor() -> Tuple[ThreadPoolExecutor, int]:
+    """Shared worker threads for the blocking stages of the async pipeline, and how many there are"""
+    global _executor, _executor_workers
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = Config.OPENWEATHER_MAX_CONCURRENCY + Config.GEMINI_MAX_CONCURRENCY
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather-bot')
+                _executor_workers = workers
+    return _executor, _executor_workers
+
+def _cancelling(task) -> bool:
+    """Whether task itself has been asked to cancel (always assumed before Python 3.11)"""
+    cancelling = getattr(task, 'cancelling', None)
+    return cancelling is None or cancelling() > 0
+
+class _LoopLimits:
+    """OpenWeatherMap/Gemini limits and the fetch single-flight shared by every batch on one event loop"""
+
+    __slots__ = ('openweather', 'gemini', 'flight', 'reported')
+
+    def __init__(self):
+        self.openweather = asyncio.Semaphore(Config.OPENWEATHER_MAX_CONCURRENCY)
+        self.gemini = asyncio.Semaphore(Config.GEMINI_MAX_CONCURRENCY)
+        self.flight = AsyncSingleFlight()
+        # flight.coalesced already added to _async_coalesced
+        self.reported = 0
+
+_loop_limits: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_loop_limits_lock = threading.Lock()
+
+def _get_loop_limits(loop) -> _LoopLimits:
+    """Limits for a running loop, created on its first batch"""
+    with _loop_limits_lock:
+        limits = _loop_limits.get(loop)
+        if limits is None:
+            limits = _loop_limits[loop] = _LoopLimits()
+        return limits
+
+async def process_user_queries_async(queries: List[str], max_concurrency: Optional[int] = None,
+                                     openweather_concurrency: Optional[int] = None,
+                                     gemini_concurrency: Optional[int] = None) -> List[str]:
+    """
+    Answer a batch of queries concurrently
+
+    Geocoding, weather fetches and Gemini generation of different queries
+    overlap, with separate limits on in-flight OpenWeatherMap and Gemini calls.
+    By default those limits and the coalescing of identical fetches are shared
+    by every batch running on the same event loop, so concurrent callers (such
+    as the HTTP service's clients) are limited together.
+
+    Args:
+        queries: User queries to answer
+        max_concurrency: Maximum queries of this batch in flight (default Config.MAX_CONCURRENT_QUERIES)
+        openweather_concurrency: Maximum concurrent OpenWeatherMap calls for this batch alone
+            (default: the loop's shared Config.OPENWEATHER_MAX_CONCURRENCY limit)
+        gemini_concurrency: Maximum concurrent Gemini calls for this batch alone
+            (default: the loop's shared Config.GEMINI_MAX_CONCURRENCY limit)
+
+    Returns:
+        Responses in the same order as queries
+    """
+    max_concurrency = max_concurrency or Config.MAX_CONCURRENT_QUERIES
+    loop = asyncio.get_running_loop()
+    shared = _get_loop_limits(loop)
+    query_limit = asyncio.Semaphore(max_concurrency)
+    owm_limit = asyncio.Semaphore(openweather_concurrency) if openweather_concurrency else shared.openweather
+    gemini_limit = asyncio.Semaphore(gemini_concurrency) if gemini_concurrency else shared.gemini
+    flight = shared.flight
+
+    executor, workers = _get_executor()
+    threads = ((openweather_concurrency or Config.OPENWEATHER_MAX_CONCURRENCY)
+               + (gemini_concurrency or Config.GEMINI_MAX_CONCURRENCY))
+    owns_executor = threads > workers
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=threads)
+
+    async def run(user_input: str) -> str:
+        async with query_limit:
+            timestamp = datetime.now()
+            with stage_breakdown() as stages:
+                with get_metrics().stage('total'):
+                    try:
+                        response = await _process_query_async(user_input, loop, executor, owm_limit,
+                                                              gemini_limit, flight)
+                    except asyncio.CancelledError:
+                        if _cancelling(asyncio.current_task()):
+                            raise
+                        # A shared fetch was cancelled elsewhere; only the caller's own cancellation propagates
+                        response = ("Sorry, something went wrong while processing your request: "
+                                    "the request was cancelled")
+                    except Exception as exc:
+                        response = f"Sorry, something went wrong while processing your request: {exc}"
+            log_user_interaction(user_input, response, timestamp, stages)
+            return response
+
+    global _async_coalesced
+    try:
+        return list(await asyncio.gather(*(run(query) for query in queries)))
+    finally:
+        # Runs on the loop's thread, so batches sharing the flight never count a coalesce twice
+        _async_coalesced += flight.coalesced - shared.reported
+        shared.reported = flight.coalesced
+        if owns_executor:
+            executor.shutdown(wait=False)
+
+def get_metrics_snapshot() -> Dict[str, Dict]:
+    """
+    Counters, stage/upstream latency histograms and cache hit ratios
+
+    Returns:
+        Dict with 'counters' and 'histograms' keyed by Prometheus-style series
+        names, and 'cache_hit_ratio' per cache (weather, geocode, response)
+    """
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+    totals: Dict[str, List[float]] = {}
+    for labels, value in metrics.counters('cache_requests_total').items():
+        labels = dict(labels)
+        hits_and_total = totals.setdefault(labels['cache'], [0, 0])
+        hits_and_total[0] += value if labels['result'] != 'miss' else 0
+        hits_and_total[1] += value
+    snapshot['cache_hit_ratio'] = {cache: hits / total for cache, (hits, total) in totals.items() if total}
+    return snapshot
+
+def get_metrics_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return get_metrics().to_prometheus()
+
+_interaction_logger = logging.getLogger('weather_bot.interactions')
+_interaction_log: Optional[InteractionLogWriter] = None
+_interaction_log_lock = threading.Lock()
+
+def get_interaction_log() -> Optional[InteractionLogWriter]:
+    """Return the background interaction log writer configured by Config.INTERACTION_LOG_PATH, if any"""
+    global _interaction_log
+    if _interaction_log is None and Config.INTERACTION_LOG_PATH:
+        with _interaction_log_lock:
+            if _interaction_log is None:
+                _interaction_log = InteractionLogWriter(
+                    Config.INTERACTION_LOG_PATH,
+                    max_queue=Config.INTERACTION_LOG_MAX_QUEUE,
+                    batch_size=Config.INTERACTION_LOG_BATCH_SIZE,
+                    flush_interval=Config.INTERACTION_LOG_FLUSH_SECONDS,
+                    max_bytes=Config.INTERACTION_LOG_MAX_BYTES,
+                    rotate_seconds=Config.INTERACTION_LOG_ROTATE_SECONDS,
+                    compression=Config.INTERACTION_LOG_COMPRESSION,
+                    policy=Config.INTERACTION_LOG_FULL_POLICY)
+                atexit.register(_interaction_log.close)
+    return _interaction_log
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history_store():
+    """Return the observation HistoryStore configured by Config.HISTORY_PATH, if any"""
+    global _history
+    if _history is None and Config.HISTORY_PATH:
+        with _history_lock:
+            if _history is None:
+                # Deferred so numpy is only imported when history is enabled
+                try:
+                    from .history import HistoryStore
+                except ImportError:
+                    from history import HistoryStore
+                _history = HistoryStore(Config.HISTORY_PATH, Config.HISTORY_SEGMENT_ROWS)
+                atexit.register(_history.close)
+    return _history
+
+def _record_history(lat: float, lon: float, data: Dict, timestamps=None):
+    """Append a fetched observation or forecast to the history store, if enabled"""
+    history = get_history_store()
+    if history is None:
+        return
+    location = f"{lat:.4f},{lon:.4f}"
+    try:
+        if 'forecast' in data:
+            rows = history.record_forecast(location, data, timestamps)
+            get_metrics().inc('history_rows_total', rows, kind='forecast')
+        else:
+            rows = history.record_current(location, data, timestamps)
+            get_metrics().inc('history_rows_total', rows, kind='observation')
+    except (OSError, ValueError):
+        get_metrics().inc('history_errors_total')
+
+_alert_logger = logging.getLogger('weather_bot.alerts')
+_alert_engine: Optional[AlertEngine] = None
+_alert_engine_lock = threading.Lock()
+
+def _log_alert(alert: Alert):
+    rule = alert.rule
+    _alert_logger.info("Alert %s for %s: %s %s %s (%s at %s)", rule.rule_id, alert.location, rule.metric,
+                       rule.op, rule.threshold, alert.value, alert.at)
+
+def get_alert_engine() -> AlertEngine:
+    """Return the process-wide alert rule engine; alerts are logged to 'weather_bot.alerts'"""
+    global _alert_engine
+    if _alert_engine is None:
+        with _alert_engine_lock:
+            if _alert_engine is None:
+                engine = AlertEngine(Config.ALERT_DEDUP_SECONDS)
+                engine.add_handler(_log_alert)
+                _alert_engine = engine
+    return _alert_engine
+
+def _evaluate_alerts(lat: float, lon: float, forecast_data: Dict):
+    """Check a freshly fetched forecast against the alert rules, if any are registered"""
+    engine = _alert_engine
+    if engine is None or not len(engine):
+        return
+    alerts = engine.evaluate(forecast_data, lat, lon)
+    if alerts:
+        get_metrics().inc('alerts_fired_total', len(alerts))
+
+def log_user_interaction(query: str, response: str, timestamp: Optional[datetime] = None,
+                         stages: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    Record one answered query
+
+    With Config.INTERACTION_LOG_PATH set, the record is queued for the
+    background JSONL writer and this call does no file I/O.
+
+    Args:
+        query: The user's query
+        response: The answer returned
+        timestamp: When the query arrived (default now)
+        stages: Seconds spent per pipeline stage, as collected by stage_breakdown()
+
+    Returns:
+        The logged record, with stage timings in milliseconds
+    """
+    record = {
+        'timestamp': (timestamp or datetime.now()).isoformat(),
+        'query': query,
+        'response': response,
+        'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in (stages or {}).items()}
+    }
+    writer = get_interaction_log()
+    if writer is not None:
+        writer.write(record)
+    elif _interaction_logger.isEnabledFor(logging.INFO):
+        _interaction_logger.info(json.dumps(record))
+    return record
+
+def process_user_query(user_input: str) -> str:
+    """
+    Answer a single natural language weather query
+
+    Thin synchronous wrapper around process_user_queries_async; from inside
+    a running event loop, await process_user_queries_async instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("process_user_query cannot run inside an event loop; "
+                           "await process_user_queries_async([query]) instead")
+    return asyncio.run(process_user_queries_async([user_input], max_concurrency=1))[0]
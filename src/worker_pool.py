@@ -0,0 +1,248 @@
+"""
+Multi-process query execution
+
+WorkerPool spreads queries over worker processes so parsing, formatting and
+JSON decoding are not serialized by one interpreter's GIL. A query is routed
+by a hash of its location, so repeat queries for a place land on the same
+worker and hit that worker's in-memory cache. Behind that tier, all workers
+share one SharedCache, so weather and geocoding results fetched by one
+worker are reused by the others instead of being kept N times.
+
+Each worker runs an event loop that answers its queries concurrently with
+process_user_queries_async, under that loop's shared OpenWeatherMap and Gemini
+limits and an equal share of the per-key request quotas. A worker that dies
+fails the queries it was given and is replaced, with a growing delay if it
+keeps crashing. Each worker writes its own interaction log and history store,
+if configured (see use_worker_files).
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Set
+
+try:
+    from .config import Config
+    from .scheduler import split_quota
+    from .shared_cache import SharedCache
+    from . import weather_bot
+except ImportError:
+    from config import Config
+    from scheduler import split_quota
+    from shared_cache import SharedCache
+    import weather_bot
+
+_STOP = None
+# Seconds between checks that every worker process is still alive
+LIVENESS_INTERVAL = 0.2
+# A crashed worker is replaced at once, then after RESTART_BACKOFF seconds,
+# doubling up to RESTART_BACKOFF_MAX while it keeps crashing without answering
+# a query; after MAX_CONSECUTIVE_CRASHES it is not replaced and its shard's
+# queries fail
+RESTART_BACKOFF = 0.5
+RESTART_BACKOFF_MAX = 30.0
+MAX_CONSECUTIVE_CRASHES = 5
+
+class WorkerPool:
+    """Location-sharded pool of query worker processes sharing one cache"""
+
+    def __init__(self, workers: Optional[int] = None, shared_cache: Optional[SharedCache] = None,
+                 start_method: Optional[str] = None):
+        """
+        Args:
+            workers: Worker processes (default Config.WORKER_POOL_SIZE, else one per CPU)
+            shared_cache: Cache tier for the workers (default a new SharedCache sized by Config)
+            start_method: multiprocessing start method (default Config.WORKER_START_METHOD)
+        """
+        self.workers = workers or Config.WORKER_POOL_SIZE or os.cpu_count() or 1
+        self._context = multiprocessing.get_context(start_method or Config.WORKER_START_METHOD)
+        self._owns_cache = shared_cache is None
+        self.cache = shared_cache or SharedCache.create(Config.SHARED_CACHE_SLOTS, Config.SHARED_CACHE_SLOT_BYTES,
+                                                        context=self._context)
+        self.submitted = [0] * self.workers
+        self.restarts = 0
+        # Crashes since each worker last answered a query, and when a crashed one is due to be replaced
+        self._crashes = [0] * self.workers
+        self._restart_at: List[Optional[float]] = [None] * self.workers
+
+        self._results = self._context.Queue()
+        self._futures: Dict[int, Future] = {}
+        # Task ids each worker has been given and not yet answered
+        self._assigned: List[Set[int]] = [set() for _ in range(self.workers)]
+        self._ids = itertools.count()
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._tasks = [self._context.Queue() for _ in range(self.workers)]
+        self._processes = [self._spawn(i) for i in range(self.workers)]
+        self._collector = threading.Thread(target=self._collect, name='weather-bot-pool-results', daemon=True)
+        self._collector.start()
+
+    def __enter__(self) -> 'WorkerPool':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def shard(self, query: str) -> int:
+        """Worker index for a query: a hash of its location, or round robin when it names none"""
+        location = weather_bot.extract_location_from_query(query)
+        if not location:
+            return next(self._round_robin) % self.workers
+        return zlib.crc32(weather_bot._cache_key(location).encode('utf-8')) % self.workers
+
+    def submit(self, query: str) -> Future:
+        """Queue one query; the future resolves to its response"""
+        if self._closed:
+            raise RuntimeError("WorkerPool is closed")
+        future: Future = Future()
+        worker = self.shard(query)
+        with self._lock:
+            if self._processes[worker] is None:
+                future.set_exception(RuntimeError(f"Worker {worker} kept crashing and was not restarted"))
+                return future
+            task_id = next(self._ids)
+            self._futures[task_id] = future
+            self._assigned[worker].add(task_id)
+            self.submitted[worker] += 1
+            tasks = self._tasks[worker]
+        tasks.put((task_id, query))
+        return future
+
+    def map(self, queries: List[str], timeout: Optional[float] = None) -> List[str]:
+        """Answer queries across the workers; responses are in the same order"""
+        futures = [self.submit(query) for query in queries]
+        return [future.result(timeout) for future in futures]
+
+    def close(self, timeout: Optional[float] = 30):
+        """Let the workers finish queued queries, stop them and release the shared cache"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            processes = [process for process in self._processes if process is not None]
+        for tasks in self._tasks:
+            tasks.put(_STOP)
+        for process in processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(_STOP)
+        self._collector.join(timeout)
+        with self._lock:
+            for future in self._futures.values():
+                future.set_exception(RuntimeError("WorkerPool closed before the query was answered"))
+            self._futures.clear()
+        if self._owns_cache:
+            self.cache.close()
+
+    def _spawn(self, index: int):
+        process = self._context.Process(target=_worker_main,
+                                        args=(index, self.workers, self._tasks[index], self._results, self.cache),
+                                        name=f'weather-bot-worker-{index}', daemon=True)
+        process.start()
+        return process
+
+    def _collect(self):
+        while True:
+            try:
+                item = self._results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if item is _STOP:
+                return
+            task_id, ok, payload = item
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+                for index, assigned in enumerate(self._assigned):
+                    if task_id in assigned:
+                        assigned.discard(task_id)
+                        self._crashes[index] = 0
+            if future is None:
+                continue
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+            self._check_workers()
+
+    def _check_workers(self):
+        """Fail the queries of any worker that died and start a replacement once its backoff has passed"""
+        if self._closed:
+            return
+        now = time.monotonic()
+        for index, process in enumerate(self._processes):
+            if process is None or process.exitcode is None:
+                continue
+            if self._restart_at[index] is None:
+                self._worker_died(index, process.exitcode, now)
+            restart_at = self._restart_at[index]
+            if restart_at is None or now < restart_at:
+                continue
+            # Started outside the lock, so submit() is not held up while the process starts
+            replacement = self._spawn(index)
+            with self._lock:
+                if self._closed:
+                    replacement.terminate()
+                    return
+                self._processes[index] = replacement
+                self._restart_at[index] = None
+                self.restarts += 1
+
+    def _worker_died(self, index: int, exitcode: int, now: float):
+        with self._lock:
+            lost = [self._futures.pop(task_id) for task_id in self._assigned[index] if task_id in self._futures]
+            self._assigned[index].clear()
+            # Its queue may be left half-read; the replacement gets a new one
+            self._tasks[index] = self._context.Queue()
+            self._crashes[index] += 1
+            crashes = self._crashes[index]
+            if crashes > MAX_CONSECUTIVE_CRASHES:
+                self._processes[index] = None
+            elif crashes == 1:
+                self._restart_at[index] = now
+            else:
+                self._restart_at[index] = now + min(RESTART_BACKOFF * 2 ** (crashes - 2), RESTART_BACKOFF_MAX)
+        for future in lost:
+            future.set_exception(RuntimeError(f"Worker {index} exited with code {exitcode}"))
+
+def _worker_main(index: int, workers: int, tasks, results, shared_cache: SharedCache):
+    """Entry point of one worker process"""
+    weather_bot.reset_process_state()
+    weather_bot.use_shared_cache(shared_cache)
+    if workers > 1:
+        split_quota(workers)
+    weather_bot.use_worker_files(index)
+    asyncio.run(_serve(tasks, results))
+
+async def _serve(tasks, results):
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(Config.MAX_CONCURRENT_QUERIES)
+    running = set()
+
+    async def answer(task_id: int, query: str):
+        async with limit:
+            try:
+                response = (await weather_bot.process_user_queries_async([query]))[0]
+            except Exception as exc:
+                results.put((task_id, False, f"{type(exc).__name__}: {exc}"))
+            else:
+                results.put((task_id, True, response))
+
+    while True:
+        item = await loop.run_in_executor(None, tasks.get)
+        if item is _STOP:
+            break
+        task = asyncio.ensure_future(answer(*item))
+        running.add(task)
+        task.add_done_callback(running.discard)
+    if running:
+        await asyncio.gather(*running)
@@ -0,0 +1,129 @@
+"""
+Tests for the indexed forecast alert engine
+"""
+
+import unittest.mock as mock
+
+import pytest
+
+from src import weather_bot
+from src.alerts import AlertEngine, AlertRule
+from src.geo import geohash_encode
+
+NOW = 1704067200  # 2024-01-01 00:00:00 UTC
+
+def forecast(location, temperatures, wind=None):
+    """3-hourly slots starting at NOW"""
+    wind = wind or [1] * len(temperatures)
+    return {'location': location, 'forecast': [
+        {'datetime': f"2024-01-{1 + i // 8:02d} {3 * (i % 8):02d}:00:00", 'temperature': temperature,
+         'wind_speed': speed}
+        for i, (temperature, speed) in enumerate(zip(temperatures, wind))]}
+
+class TestAlertRuleParsing:
+    """Tests for AlertRule.parse"""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("temp < 0 in Minneapolis within 24h",
+         AlertRule('r', 'temperature', '<', 0.0, location='Minneapolis', within_hours=24.0)),
+        ("wind > 15 m/s anywhere in grid cell 9zvxv",
+         AlertRule('r', 'wind_speed', '>', 15.0, cell='9zvxv')),
+        ("rain >= 70% anywhere", AlertRule('r', 'pop', '>=', 0.7)),
+        ("humidity <= 20 in New York City", AlertRule('r', 'humidity', '<=', 20.0, location='New York City')),
+    ])
+    def test_parse(self, text, expected):
+        assert AlertRule.parse('r', text) == expected
+
+    def test_rejects_unknown_rules(self):
+        with pytest.raises(ValueError):
+            AlertRule.parse('r', "temp is cold")
+        with pytest.raises(ValueError):
+            AlertEngine().add_rule(AlertRule('r', 'snow', '>', 1))
+
+class TestAlertEngine:
+    """Tests for candidate lookup, horizons and deduplication"""
+
+    def test_fires_matching_rules_only(self):
+        engine = AlertEngine()
+        engine.add_rule(AlertRule.parse('freeze', "temp < 0 in Minneapolis within 24h"))
+        engine.add_rule(AlertRule.parse('deep-freeze', "temp < -20 in Minneapolis"))
+        engine.add_rule(AlertRule.parse('other-city', "temp < 0 in Boston"))
+
+        alerts = engine.evaluate(forecast('Minneapolis', [3, 1, -2, -4]), now=NOW)
+        assert [alert.rule.rule_id for alert in alerts] == ['freeze']
+        assert alerts[0].value == -2
+        assert alerts[0].at == '2024-01-01 06:00:00'
+
+    def test_only_candidate_thresholds_are_checked(self):
+        engine = AlertEngine()
+        for i in range(1000):
+            engine.add_rule(AlertRule('hot-%d' % i, 'temperature', '>', float(i), location='Phoenix'))
+            engine.add_rule(AlertRule('cold-%d' % i, 'temperature', '<', float(-i), location='Phoenix'))
+
+        alerts = engine.evaluate(forecast('Phoenix', [-1.5, 2.5]), now=NOW)
+        assert sorted(alert.rule.rule_id for alert in alerts) == ['cold-0', 'cold-1', 'hot-0', 'hot-1', 'hot-2']
+        # Only thresholds inside the forecast's -1.5..2.5 range are checked
+        assert engine.stats['candidates'] == 5
+
+    def test_horizon_excludes_later_slots(self):
+        engine = AlertEngine()
+        engine.add_rule(AlertRule.parse('soon', "temp < 0 in Oslo within 6h"))
+        assert engine.evaluate(forecast('Oslo', [5, 5, 5, -1]), now=NOW) == []
+        assert len(engine.evaluate(forecast('Oslo', [5, 5, -1, -1]), now=NOW)) == 1
+
+    def test_cell_and_anywhere_rules(self):
+        lat, lon = 44.98, -93.27
+        engine = AlertEngine()
+        engine.add_rule(AlertRule.parse('cell', f"wind > 15 in cell {geohash_encode(lat, lon, 4)}"))
+        engine.add_rule(AlertRule.parse('elsewhere', "wind > 15 in cell u4pr"))
+        engine.add_rule(AlertRule.parse('any', "wind >= 20 anywhere"))
+
+        alerts = engine.evaluate(forecast('Minneapolis', [0, 0], wind=[10, 20]), lat, lon, now=NOW)
+        assert sorted(alert.rule.rule_id for alert in alerts) == ['any', 'cell']
+
+    def test_deduplicates_until_cleared_or_expired(self):
+        engine = AlertEngine(dedup_seconds=3600)
+        engine.add_rule(AlertRule.parse('freeze', "temp < 0 in Minneapolis"))
+        cold, mild = forecast('Minneapolis', [-5]), forecast('Minneapolis', [5])
+
+        assert len(engine.evaluate(cold, now=NOW)) == 1
+        assert engine.evaluate(cold, now=NOW + 60) == []
+        assert engine.stats['suppressed'] == 1
+        assert len(engine.evaluate(cold, now=NOW + 3600)) == 1
+
+        engine.evaluate(mild, now=NOW + 3700)
+        assert len(engine.evaluate(cold, now=NOW + 3800)) == 1
+
+    def test_remove_rule_and_handlers(self, caplog):
+        received = []
+        engine = AlertEngine()
+        engine.add_handler(received.append)
+        engine.add_handler(lambda alert: 1 / 0)
+        engine.add_rule(AlertRule.parse('freeze', "temp < 0 in Minneapolis"))
+
+        engine.evaluate(forecast('Minneapolis', [-5]), now=NOW)
+        assert [alert.rule.rule_id for alert in received] == ['freeze']
+        assert engine.stats['handler_errors'] == 1
+        assert any(record.name == 'weather_bot.alerts' and record.exc_info for record in caplog.records)
+
+        assert engine.remove_rule('freeze')
+        assert not engine.remove_rule('freeze')
+        assert len(engine) == 0
+        assert engine.evaluate(forecast('Minneapolis', [-5]), now=NOW + 60) == []
+
+class TestWeatherBotAlerts:
+    """Fetched forecasts are checked against registered rules"""
+
+    def test_forecast_fetch_evaluates_rules(self):
+        engine = AlertEngine()
+        engine.add_rule(AlertRule.parse('freeze', "temp < 0 in Test City"))
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'city': {'name': 'Test City'}, 'list': [
+            {'dt': NOW, 'dt_txt': '2024-01-01 00:00:00', 'main': {'temp': -3}}]}
+
+        with mock.patch.object(weather_bot, '_alert_engine', engine), \
+                mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+            mock_transport.return_value.get.return_value = response
+            weather_bot._request_weather_forecast(44.98, -93.27, 1, "forecast:44.9800,-93.2700:1")
+
+        assert engine.stats['fired'] == 1
@@ -0,0 +1,207 @@
+"""
+Tests for the asyncio batch query engine
+"""
+
+import asyncio
+import threading
+import time
+import unittest.mock as mock
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import weather_bot
+from src.weather_bot import process_user_queries_async, process_user_query
+
+class ConcurrencyProbe:
+    """Records the peak number of overlapping calls"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def __exit__(self, *exc_info):
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+def fake_coordinates(location):
+    return 1.0, 2.0, location
+
+def fake_weather(lat, lon):
+    return {'temperature': 20, 'description': 'clear sky'}
+
+def fake_response(weather_data, query, budget_seconds=None):
+    return f"{weather_data['location']}: {weather_data['temperature']}"
+
+@mock.patch.object(weather_bot, 'generate_natural_response', side_effect=fake_response)
+@mock.patch.object(weather_bot, 'fetch_current_weather', side_effect=fake_weather)
+@mock.patch.object(weather_bot, 'get_coordinates', side_effect=fake_coordinates)
+class TestProcessUserQueriesAsync:
+    """Tests for ordering, limits and the sync wrapper"""
+
+    def test_results_in_input_order(self, *mocks):
+        queries = [f"weather in City{i}" for i in range(20)]
+        results = asyncio.run(process_user_queries_async(queries))
+        assert results == [f"City{i}: 20" for i in range(20)]
+
+    def test_missing_location_does_not_fail_batch(self, *mocks):
+        results = asyncio.run(process_user_queries_async(["What's the weather?", "weather in Boston"]))
+        assert 'location' in results[0].lower()
+        assert results[1] == "Boston: 20"
+
+    def test_openweather_concurrency_limit(self, mock_coordinates, *mocks):
+        probe = ConcurrencyProbe()
+
+        def slow_coordinates(location):
+            with probe:
+                return fake_coordinates(location)
+
+        mock_coordinates.side_effect = slow_coordinates
+        queries = [f"weather in City{i}" for i in range(12)]
+        asyncio.run(process_user_queries_async(queries, openweather_concurrency=3))
+        assert probe.peak <= 3
+
+    def test_gemini_concurrency_limit(self, mock_coordinates, mock_weather, mock_generate):
+        probe = ConcurrencyProbe()
+
+        def slow_response(weather_data, query, budget_seconds=None):
+            with probe:
+                return fake_response(weather_data, query)
+
+        mock_generate.side_effect = slow_response
+        queries = [f"weather in City{i}" for i in range(12)]
+        asyncio.run(process_user_queries_async(queries, gemini_concurrency=2))
+        assert probe.peak <= 2
+
+    def test_limits_and_coalescing_are_shared_by_concurrent_batches(self, mock_coordinates, mock_weather,
+                                                                    *mocks):
+        probe = ConcurrencyProbe(delay=0.2)
+
+        def slow_weather(lat, lon):
+            with probe:
+                return fake_weather(lat, lon)
+
+        mock_weather.side_effect = slow_weather
+        before = weather_bot.get_singleflight_stats()['async']
+
+        async def clients():
+            # Every query resolves to the same coordinates, so the batches share one fetch at a time
+            return await asyncio.gather(*(process_user_queries_async([f"weather in City{i}"]) for i in range(6)))
+
+        with mock.patch.object(weather_bot.Config, 'OPENWEATHER_MAX_CONCURRENCY', 2):
+            asyncio.run(clients())
+        assert probe.peak == 1
+        assert mock_weather.call_count == 1
+        assert weather_bot.get_singleflight_stats()['async'] - before == 5
+
+    def test_caller_timeout_does_not_fail_coalesced_callers(self, mock_coordinates, mock_weather, *mocks):
+        def slow_weather(lat, lon):
+            time.sleep(0.3)
+            return fake_weather(lat, lon)
+
+        mock_weather.side_effect = slow_weather
+
+        async def clients():
+            hasty = asyncio.wait_for(process_user_queries_async(["weather in Boston"]), 0.1)
+            patient = asyncio.wait_for(process_user_queries_async(["weather in Boston"]), 5)
+            return await asyncio.gather(hasty, patient, return_exceptions=True)
+
+        hasty, patient = asyncio.run(clients())
+        assert isinstance(hasty, asyncio.TimeoutError)
+        assert patient == ["Boston: 20"]
+        assert mock_weather.call_count == 1
+
+    def test_cancelled_shared_fetch_becomes_an_error_response(self, mock_coordinates, mock_weather, *mocks):
+        mock_weather.side_effect = lambda lat, lon: time.sleep(0.2) or fake_weather(lat, lon)
+
+        async def client():
+            batch = asyncio.ensure_future(process_user_queries_async(["weather in Boston"]))
+            flight = weather_bot._get_loop_limits(asyncio.get_running_loop()).flight
+            while not flight._calls:
+                await asyncio.sleep(0.01)
+            for task in flight._calls.values():
+                task.cancel()
+            return await batch
+
+        assert "cancelled" in asyncio.run(client())[0]
+
+    def test_openweather_limit_spans_batches(self, mock_coordinates, *mocks):
+        probe = ConcurrencyProbe()
+
+        def slow_coordinates(location):
+            with probe:
+                return fake_coordinates(location)
+
+        mock_coordinates.side_effect = slow_coordinates
+
+        async def clients():
+            return await asyncio.gather(*(process_user_queries_async([f"weather in City{i}"]) for i in range(8)))
+
+        with mock.patch.object(weather_bot.Config, 'OPENWEATHER_MAX_CONCURRENCY', 2):
+            asyncio.run(clients())
+        assert probe.peak <= 2
+
+    def test_stage_errors_are_reported_per_query(self, mock_coordinates, *mocks):
+        mock_coordinates.side_effect = [RuntimeError("boom"), (1.0, 2.0, "Boston")]
+        results = asyncio.run(process_user_queries_async(["weather in Paris", "weather in Boston"],
+                                                         max_concurrency=1))
+        assert 'boom' in results[0]
+        assert results[1] == "Boston: 20"
+
+    def test_sync_wrapper(self, *mocks):
+        assert process_user_query("weather in Boston") == "Boston: 20"
+
+    def test_sync_wrapper_rejects_running_loop(self, *mocks):
+        async def call():
+            return process_user_query("weather in Boston")
+
+        with pytest.raises(RuntimeError, match="process_user_queries_async"):
+            asyncio.run(call())
+
+def forecast_slots(days):
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return [{'datetime': (start + timedelta(hours=3 * i)).strftime('%Y-%m-%d %H:%M:%S'), 'temperature': i}
+            for i in range(days * 8)]
+
+class TestForecastWindow:
+    """Tests for turning a query's day offset into the forecast it is answered from"""
+
+    @pytest.mark.parametrize("query, expected", [
+        ("Weather forecast for Austin tomorrow", (2, 1)),
+        ("forecast for the next 3 days in Paris", (3, None)),
+        ("Will it rain next week in Seattle?", (5, None)),
+        ("Tokyo forecast", (5, None)),
+        ("weather in St. Louis tonight", (1, 0)),
+    ])
+    def test_window(self, query, expected):
+        analysis = weather_bot.analyze_query(query)
+        assert weather_bot._forecast_window(analysis.day_offset, analysis.day_span) == expected
+
+    def test_tomorrow_answers_from_tomorrows_slots(self):
+        answered = []
+
+        def fake_forecast(lat, lon, days):
+            return {'location': 'Austin', 'forecast': forecast_slots(days)}
+
+        def capture(weather_data, query, budget_seconds=None):
+            answered.append(weather_data)
+            return "ok"
+
+        with mock.patch.object(weather_bot, 'get_coordinates', side_effect=fake_coordinates), \
+                mock.patch.object(weather_bot, 'fetch_weather_forecast', side_effect=fake_forecast) as fetch, \
+                mock.patch.object(weather_bot, 'generate_natural_response', side_effect=capture):
+            asyncio.run(process_user_queries_async(["Weather forecast for Austin tomorrow"]))
+
+        assert fetch.call_args[0][2] == 2
+        tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).strftime('%Y-%m-%d')
+        slots = answered[0]['forecast']
+        assert len(slots) == 8
+        assert all(slot['datetime'].startswith(tomorrow) for slot in slots)
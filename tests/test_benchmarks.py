@@ -0,0 +1,70 @@
+"""
+Tests for the hermetic benchmark fakes and harness
+"""
+
+from benchmarks.bench_suite import _queries, bench_worker_pool
+from benchmarks.fakes import UpstreamProfile, fake_services
+from benchmarks.harness import BenchResult, compare, measure, percentile, report
+from src import weather_bot
+
+class TestHarness:
+    """Tests for latency statistics and result comparison"""
+
+    def test_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)]
+        assert percentile(values, 50) == 0.05
+        assert percentile(values, 99) == 0.099
+        assert percentile([], 50) == 0.0
+
+    def test_measure_counts_errors(self):
+        result = measure("bench", lambda x: 1 / x, [1, 2, 0, 4])
+        row = result.to_dict()
+        assert row['count'] == 4
+        assert row['errors'] == 1
+
+    def test_compare_reports_relative_change(self):
+        baseline = report([BenchResult("bench", [0.010] * 10, 1.0)])
+        current = report([BenchResult("bench", [0.012] * 10, 0.5)])
+        row = compare(baseline, current)[0]
+        assert row['p50_ms'] == 20.0
+        assert row['throughput_per_sec'] == 100.0
+
+class TestFakeServices:
+    """Tests for running the bot against the local stand-ins"""
+
+    def test_process_user_query_runs_offline(self):
+        with fake_services() as (session, model):
+            response = weather_bot.process_user_query("What's the weather in Springfield?")
+        assert response.startswith("Here is your weather update")
+        assert session.calls['direct'] == 1
+        assert session.calls['weather'] == 1
+        assert model.calls == 1
+
+    def test_rate_limited_calls_are_retried(self):
+        with fake_services(UpstreamProfile(rate_limit_rate=0.3, seed=1)) as (session, _):
+            for i in range(5):
+                weather_bot.fetch_current_weather(10.0 + i, 20.0)
+        assert session.status_counts.get(429, 0) > 0
+        assert session.status_counts[200] == 5
+
+    def test_queries_resolve_to_distinct_locations(self):
+        locations = [weather_bot.extract_location_from_query(query) for query in _queries(400, 300, seed=0)]
+        assert len(set(locations)) == 300
+        assert len(set(location.lower() for location in locations)) == 300
+
+    def test_refresher_does_not_outlive_fakes(self):
+        refresher = weather_bot._refresher
+        with fake_services():
+            weather_bot.cache_weather_data("current:10.0000,20.0000", {'temperature': 1}, 0, stale_minutes=5)
+            weather_bot.fetch_current_weather(10.0, 20.0)
+            fake_refresher = weather_bot._refresher
+            assert fake_refresher is not refresher
+        assert weather_bot._refresher is refresher
+        assert fake_refresher.stats['submitted'] == 1
+        assert fake_refresher._stop.is_set()
+
+    def test_worker_pool_benchmark_runs_offline(self):
+        results = bench_worker_pool(8, [2], UpstreamProfile(), UpstreamProfile(), seed=0)
+        assert [result.name for result in results] == ["pool.workers_2"]
+        assert results[0].errors == 0
+        assert sum(results[0].extra['per_worker']) == 8 + 2 * 4
@@ -0,0 +1,101 @@
+"""
+Tests for the multi-location bulk fetch API
+"""
+
+import threading
+import time
+import unittest.mock as mock
+
+import pytest
+
+from src import weather_bot
+from src.gazetteer import Gazetteer
+from src.scheduler import BACKGROUND, current_priority, request_priority
+
+def weather_response(name, temperature):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'name': name, 'main': {'temp': temperature}}
+    return response
+
+@pytest.fixture
+def transport():
+    with mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+        yield mock_transport.return_value
+
+@pytest.fixture
+def gazetteer():
+    index = Gazetteer.from_records([
+        {'name': 'Quito', 'lat': -0.18, 'lon': -78.47, 'country': 'EC'},
+        {'name': 'Nairobi', 'lat': -1.29, 'lon': 36.82, 'country': 'KE'}
+    ])
+    with mock.patch.object(weather_bot, 'get_gazetteer', return_value=index):
+        yield index
+
+class TestFetchCurrentWeatherMany:
+    """Tests for cache-first, deduplicated parallel fetching"""
+
+    def test_cached_locations_skip_upstream(self, transport, gazetteer):
+        weather_bot.cache_weather_data("current:-0.1800,-78.4700", {'temperature': 14})
+        results = list(weather_bot.fetch_current_weather_many(["Quito", (-0.18, -78.47)]))
+        assert results == [("Quito", {'temperature': 14}), ((-0.18, -78.47), {'temperature': 14})]
+        transport.get.assert_not_called()
+
+    def test_duplicates_fetched_once_in_parallel(self, transport, gazetteer):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow_get(url, params):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return weather_response('Somewhere', params['lat'])
+
+        transport.get.side_effect = slow_get
+        locations = [(10.5, 1.0), (10.5, 1.0), (11.5, 1.0), (12.5, 1.0)]
+        results = list(weather_bot.fetch_current_weather_many(locations, max_workers=4))
+        assert sorted(location for location, _ in results) == sorted(locations)
+        assert transport.get.call_count == 3
+        assert peak[0] > 1
+
+    def test_errors_are_per_location(self, transport, gazetteer):
+        error = mock.Mock(status_code=500, text="boom")
+        transport.get.return_value = error
+        results = dict(weather_bot.fetch_current_weather_many([(20.5, 3.0), (999, 0), ""]))
+        assert "error" in results[(20.5, 3.0)].lower()
+        assert "error" in results[(999, 0)].lower()
+        assert "error" in results[""].lower()
+
+    def test_unknown_names_are_geocoded(self, transport, gazetteer):
+        geocode = mock.Mock(status_code=200)
+        geocode.json.return_value = [{'name': 'Hanoi', 'lat': 21.03, 'lon': 105.85}]
+        transport.get.side_effect = [geocode, weather_response('Hanoi', 30)]
+        results = list(weather_bot.fetch_current_weather_many(["Hanoi"]))
+        assert results[0][0] == "Hanoi"
+        assert results[0][1]['temperature'] == 30
+
+    def test_caller_priority_reaches_workers(self, transport, gazetteer):
+        seen = []
+
+        def record_priority(url, params):
+            seen.append(current_priority())
+            return weather_response('X', 1)
+
+        transport.get.side_effect = record_priority
+        with request_priority(BACKGROUND):
+            list(weather_bot.fetch_current_weather_many([(30.5, 5.0)]))
+        assert seen == [BACKGROUND]
+
+class TestFetchWeatherForecastMany:
+    """Tests for the forecast variant"""
+
+    def test_forecasts(self, transport, gazetteer):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'city': {'name': 'Nairobi'}, 'list': [
+            {'dt': 1704067200, 'main': {'temp': 21}, 'weather': [{'description': 'clear sky'}]}]}
+        transport.get.return_value = response
+        results = list(weather_bot.fetch_weather_forecast_many(["Nairobi"], days=1))
+        assert results[0][1]['forecast'][0]['temperature'] == 21
+        assert transport.get.call_args.kwargs['params']['cnt'] == 8
@@ -0,0 +1,92 @@
+"""
+Tests for the two-tier weather cache
+"""
+
+import unittest.mock as mock
+
+from src.cache import MemoryCache, SQLiteCache, TieredCache
+from src import weather_bot
+
+class TestMemoryCache:
+    """Tests for the in-process LRU tier"""
+
+    def test_hit_and_miss_counters(self):
+        cache = MemoryCache(max_entries=4)
+        cache.set('boston', {'temperature': 20}, 60)
+        assert cache.get('boston') == {'temperature': 20}
+        assert cache.get('chicago') is None
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.get('a')
+        cache.set('c', 3, 60)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats.evictions == 1
+
+    def test_byte_cap(self):
+        cache = MemoryCache(max_entries=100, max_bytes=40)
+        for i in range(10):
+            cache.set(f'key{i}', {'temperature': i}, 60)
+        assert 0 < len(cache) < 10
+        assert cache.stats.evictions == 10 - len(cache)
+
+    def test_entries_expire(self):
+        cache = MemoryCache()
+        with mock.patch('src.cache.time.time', return_value=1000.0):
+            cache.set('boston', 1, 60)
+        with mock.patch('src.cache.time.time', return_value=1061.0):
+            assert cache.get('boston') is None
+        assert cache.stats.expirations == 1
+
+class TestSQLiteCache:
+    """Tests for the persistent tier"""
+
+    def test_survives_reopen(self, tmp_path):
+        path = str(tmp_path / 'cache.db')
+        cache = SQLiteCache(path)
+        cache.set('boston', {'temperature': 20}, 60)
+        cache.close()
+
+        reopened = SQLiteCache(path)
+        value, expires_at = reopened.get('boston')
+        assert value == {'temperature': 20}
+        assert reopened.stats.hits == 1
+
+    def test_expired_entries_are_misses(self, tmp_path):
+        cache = SQLiteCache(str(tmp_path / 'cache.db'))
+        cache.set('boston', 1, -1)
+        assert cache.get('boston') is None
+        assert cache.stats.expirations == 1
+
+class TestTieredCache:
+    """Tests for promotion between tiers"""
+
+    def test_disk_hit_is_promoted_to_memory(self, tmp_path):
+        disk = SQLiteCache(str(tmp_path / 'cache.db'))
+        disk.set('boston', {'temperature': 20}, 60)
+        cache = TieredCache(MemoryCache(), disk)
+
+        assert cache.get('boston') == {'temperature': 20}
+        assert cache.get('boston') == {'temperature': 20}
+        stats = cache.stats()
+        assert stats['disk']['hits'] == 1
+        assert stats['memory']['hits'] == 1
+        assert 0 < cache.memory.remaining_ttl('boston') <= 60
+
+class TestWeatherBotCache:
+    """Tests for cache_weather_data / get_cached_data"""
+
+    def test_round_trip_normalizes_location(self):
+        weather_bot.cache_weather_data("  Boston. ", {'temperature': 20}, 10)
+        assert weather_bot.get_cached_data("boston") == {'temperature': 20}
+
+    def test_current_weather_served_from_cache(self):
+        weather_bot.cache_weather_data("current:10.0000,20.0000", {'temperature': 5})
+        with mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+            assert weather_bot.fetch_current_weather(10.0, 20.0) == {'temperature': 5}
+        mock_transport.assert_not_called()
\ No newline at end of file
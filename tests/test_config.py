@@ -0,0 +1,48 @@
+"""
+Tests for deferred configuration loading and import-time cost
+"""
+
+import subprocess
+import sys
+import unittest.mock as mock
+
+from benchmarks.bench_startup import PROJECT_ROOT, parse_importtime
+from src import config
+from src.config import Config, load_configuration
+
+class TestDeferredConfig:
+    """Tests for environment-backed settings resolved on access"""
+
+    def test_keys_are_read_at_call_time(self):
+        with mock.patch.dict('os.environ', {'OPENWEATHER_API_KEY': 'first', 'GEMINI_API_KEY': 'g'}):
+            assert load_configuration()['openweather_key'] == 'first'
+        with mock.patch.dict('os.environ', {'OPENWEATHER_API_KEY': 'second', 'GEMINI_API_KEY': 'g'}):
+            assert Config.OPENWEATHER_API_KEY == 'second'
+
+    def test_dotenv_loaded_once_on_first_access(self):
+        with mock.patch.object(config, '_dotenv_loaded', False), \
+                mock.patch('dotenv.load_dotenv') as load_dotenv:
+            Config.GEMINI_API_KEY
+            Config.CACHE_DB_PATH
+        load_dotenv.assert_called_once()
+
+    def test_settings_can_still_be_patched(self):
+        with mock.patch.object(Config, 'GEMINI_API_KEY', 'patched'):
+            assert Config.GEMINI_API_KEY == 'patched'
+        assert isinstance(Config.__dict__['GEMINI_API_KEY'], config._Env)
+
+class TestStartup:
+    """Tests that importing the bot stays cheap"""
+
+    def test_import_skips_gemini_sdk_and_dotenv(self):
+        probe = ("import sys, src.weather_bot; "
+                 "print('google.generativeai' in sys.modules, 'dotenv' in sys.modules)")
+        completed = subprocess.run([sys.executable, '-c', probe], cwd=PROJECT_ROOT, capture_output=True,
+                                   text=True, check=True)
+        assert completed.stdout.split() == ['False', 'False']
+
+    def test_parse_importtime(self):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   json\n"
+                  "import time:      3000 |       3120 | src.weather_bot\n")
+        assert parse_importtime(stderr) == [('json', 120, 120), ('src.weather_bot', 3000, 3120)]
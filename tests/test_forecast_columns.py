@@ -0,0 +1,74 @@
+"""
+Tests for the columnar forecast representation
+"""
+
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.forecast_columns import ForecastColumns, convert_units_array, wind_sectors_array
+from src.weather_bot import calculate_wind_direction, convert_units, create_fallback_response
+
+FORECAST = {
+    'location': 'Test City',
+    'forecast': [
+        {'datetime': '2024-01-01 15:00:00', 'temperature': 20, 'humidity': 50, 'wind_speed': 3,
+         'wind_direction': 90, 'pop': 0.1, 'description': 'sunny'},
+        {'datetime': '2024-01-01 18:00:00', 'temperature': 18, 'humidity': 60, 'wind_speed': 5,
+         'wind_direction': 200, 'pop': None, 'description': 'clear'},
+        {'datetime': '2024-01-02 09:00:00', 'temperature': 16, 'humidity': 70, 'wind_speed': 2,
+         'wind_direction': None, 'pop': 0.8, 'description': 'cloudy'}
+    ]
+}
+
+class TestVectorizedConversions:
+    """Vectorized conversions agree with the scalar functions"""
+
+    def test_convert_units_array_matches_scalar(self):
+        celsius = [-10, 0, 20, 37.5]
+        _, fahrenheit, kelvin = convert_units_array(celsius)
+        for i, value in enumerate(celsius):
+            assert (fahrenheit[i], kelvin[i]) == convert_units(value)[1:]
+
+    def test_wind_sectors_match_scalar(self):
+        degrees = [0, 45, 90, 135, 180, 225, 270, 315, 360, -45, 22.4, 22.5]
+        assert list(wind_sectors_array(degrees)) == [calculate_wind_direction(d) for d in degrees]
+
+    def test_missing_wind_direction(self):
+        assert list(wind_sectors_array([np.nan, 90])) == ['', 'E']
+
+class TestForecastColumns:
+    """Tests for conversion and daily roll-ups"""
+
+    def test_round_trip_to_dict_shape(self):
+        columns = ForecastColumns.from_forecast(FORECAST)
+        assert len(columns) == 3
+        result = columns.to_forecast()
+        assert result['location'] == 'Test City'
+        assert result['forecast'][1]['pop'] is None
+        assert result['forecast'][2]['description'] == 'cloudy'
+        assert result['forecast'][0]['datetime'] == '2024-01-01 15:00:00'
+        assert 'Test City' in create_fallback_response(result)
+
+    def test_daily_summary(self):
+        summary = ForecastColumns.from_forecast(FORECAST).daily_summary()
+        assert [day['date'] for day in summary] == ['2024-01-01', '2024-01-02']
+        first, second = summary
+        assert (first['temp_min'], first['temp_max'], first['temp_mean']) == (18, 20, 19)
+        assert first['pop_max'] == 0.1
+        assert first['slots'] == 2
+        assert second['wind_speed_max'] == 2
+
+    def test_all_missing_values_aggregate_to_nan(self):
+        forecast = {'location': 'X', 'forecast': [{'datetime': '2024-01-01 00:00', 'temperature': None}]}
+        summary = ForecastColumns.from_forecast(forecast).daily_summary()
+        assert math.isnan(summary[0]['temp_max'])
+
+    def test_temperatures_in_all_units(self):
+        celsius, fahrenheit, kelvin = ForecastColumns.from_forecast(FORECAST).temperatures()
+        assert list(fahrenheit) == [68.0, 64.4, 60.8]
+
+    def test_empty_forecast(self):
+        assert ForecastColumns.from_forecast({'location': 'X', 'forecast': []}).daily_summary() == []
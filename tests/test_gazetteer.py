@@ -0,0 +1,97 @@
+"""
+Tests for the offline gazetteer
+"""
+
+import json
+import unittest.mock as mock
+
+import pytest
+
+from src.gazetteer import Gazetteer
+from src import weather_bot
+
+CITIES = [
+    {'name': 'Boston', 'lat': 42.36, 'lon': -71.06, 'country': 'US', 'state': 'Massachusetts', 'population': 650000},
+    {'name': 'Boston', 'lat': 52.98, 'lon': -0.03, 'country': 'GB', 'state': 'England', 'population': 40000},
+    {'name': 'Dallas', 'lat': 32.78, 'lon': -96.80, 'country': 'US', 'state': 'Texas', 'population': 1300000},
+    {'name': 'London', 'lat': 51.51, 'lon': -0.13, 'country': 'GB', 'state': 'England', 'population': 8900000},
+    {'name': 'San Francisco', 'lat': 37.77, 'lon': -122.42, 'country': 'US', 'state': 'California',
+     'population': 870000}
+]
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer.from_records(CITIES)
+
+class TestGazetteer:
+    """Tests for exact, qualified and fuzzy lookups"""
+
+    def test_city_prefers_most_populous(self, gazetteer):
+        assert gazetteer.lookup("Boston") == (42.36, -71.06, 'Boston')
+
+    def test_city_country(self, gazetteer):
+        assert gazetteer.lookup("Boston, GB") == (52.98, -0.03, 'Boston')
+        assert gazetteer.lookup("London, UK") == (51.51, -0.13, 'London')
+
+    def test_city_state(self, gazetteer):
+        assert gazetteer.lookup("Dallas, Texas") == (32.78, -96.80, 'Dallas')
+        assert gazetteer.lookup("Dallas, Ohio") is None
+
+    def test_normalizes_input(self, gazetteer):
+        assert gazetteer.lookup("  boston!! ") == (42.36, -71.06, 'Boston')
+
+    def test_prefix_match(self, gazetteer):
+        assert gazetteer.lookup("San Fran") == (37.77, -122.42, 'San Francisco')
+
+    def test_typo_match(self, gazetteer):
+        assert gazetteer.lookup("Bostn") == (42.36, -71.06, 'Boston')
+        assert gazetteer.lookup("Sna Francisco")[2] == 'San Francisco'
+
+    def test_short_or_ambiguous_prefixes_are_not_guessed(self, gazetteer):
+        gazetteer.add('Niceville', 30.52, -86.48, 'US', 'Florida', 15000)
+        assert gazetteer.lookup("Nice") is None
+        gazetteer.add('Springfield', 39.8, -89.64, 'US', 'Illinois', 114000)
+        gazetteer.add('Springdale', 36.19, -94.13, 'US', 'Arkansas', 87000)
+        assert gazetteer.lookup("Spring") is None
+        assert gazetteer.lookup("Springfiel")[2] == 'Springfield'
+
+    def test_distant_or_ambiguous_names_are_not_guessed(self, gazetteer):
+        gazetteer.add('New York', 40.71, -74.01, 'US', 'New York', 8300000)
+        assert gazetteer.lookup("York") is None
+        gazetteer.add('Dalles', 45.6, -121.18, 'US', 'Oregon', 15000)
+        assert gazetteer.lookup("Dallis") is None
+
+    def test_miss(self, gazetteer):
+        assert gazetteer.lookup("Tokyo") is None
+
+    def test_index_file_round_trip(self, gazetteer, tmp_path):
+        path = str(tmp_path / 'cities.idx')
+        gazetteer.save(path)
+        loaded = Gazetteer.load(path)
+        assert len(loaded) == len(CITIES)
+        assert loaded.lookup("Boston, GB") == (52.98, -0.03, 'Boston')
+
+    def test_load_json_dump(self, tmp_path):
+        path = tmp_path / 'cities.json'
+        path.write_text(json.dumps(CITIES))
+        assert Gazetteer.load(str(path)).lookup("London") == (51.51, -0.13, 'London')
+
+class TestGetCoordinatesWithGazetteer:
+    """Tests for the gazetteer in front of the geocoding API"""
+
+    def test_index_hit_skips_api(self, gazetteer):
+        with mock.patch.object(weather_bot, 'get_gazetteer', return_value=gazetteer), \
+                mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+            assert weather_bot.get_coordinates("Dallas, Texas") == (32.78, -96.80, 'Dallas')
+        mock_transport.assert_not_called()
+
+    def test_index_miss_writes_back(self, gazetteer):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = [{'name': 'Reykjavik', 'lat': 64.15, 'lon': -21.94, 'country': 'IS'}]
+        with mock.patch.object(weather_bot, 'get_gazetteer', return_value=gazetteer), \
+                mock.patch.object(weather_bot.Config, 'GAZETTEER_WRITE_BACK', True), \
+                mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+            mock_transport.return_value.get.return_value = response
+            assert weather_bot.get_coordinates("Reykjavik") == (64.15, -21.94, 'Reykjavik')
+        assert gazetteer.lookup("Reykjavik, IS") == (64.15, -21.94, 'Reykjavik')
+        assert gazetteer.dirty
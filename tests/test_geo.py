@@ -0,0 +1,60 @@
+"""
+Tests for coordinate quantization
+"""
+
+import unittest.mock as mock
+
+import pytest
+
+from src.geo import GridQuantizer, geohash_decode, geohash_encode, snap_to_grid
+from src import weather_bot
+
+class TestGeohash:
+    """Tests for geohash encoding"""
+
+    def test_known_geohash(self):
+        assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+    def test_decode_returns_cell_centre(self):
+        lat, lon = geohash_decode(geohash_encode(40.7128, -74.0060, 6))
+        assert abs(lat - 40.7128) < 0.01
+        assert abs(lon + 74.0060) < 0.01
+
+class TestGridQuantizer:
+    """Tests for snapping and deduplication counters"""
+
+    def test_disabled_mode_is_passthrough(self):
+        quantizer = GridQuantizer(None)
+        assert quantizer.snap(40.7128, -74.0060) == (40.7128, -74.0060)
+        assert quantizer.stats() == {'requests': 0, 'deduplicated': 0}
+
+    def test_degree_grid(self):
+        assert snap_to_grid(40.7128, -74.0060, 0.1) == (40.75, -74.05)
+
+    def test_nearby_points_share_cell(self):
+        quantizer = GridQuantizer('geohash', precision=5)
+        assert quantizer.snap(40.7128, -74.0060) == quantizer.snap(40.7130, -74.0059)
+        quantizer.snap(40.7128, -74.0060)
+        assert quantizer.stats() == {'requests': 3, 'deduplicated': 1}
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            GridQuantizer('hexagons')
+
+class TestFetchWithGrid:
+    """Tests for snapped cache keys in fetch_current_weather"""
+
+    def test_nearby_coordinates_fetch_once(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'name': 'New York', 'main': {'temp': 21}}
+        quantizer = GridQuantizer('degrees', step=0.05)
+        with mock.patch.object(weather_bot, 'get_grid_quantizer', return_value=quantizer), \
+                mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+            mock_transport.return_value.get.return_value = response
+            first = weather_bot.fetch_current_weather(40.7128, -74.0060)
+            second = weather_bot.fetch_current_weather(40.7140, -74.0110)
+        assert first == second
+        assert mock_transport.return_value.get.call_count == 1
+        params = mock_transport.return_value.get.call_args.kwargs['params']
+        assert (params['lat'], params['lon']) == (40.725, -74.025)
+        assert quantizer.stats()['deduplicated'] == 1
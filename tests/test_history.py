@@ -0,0 +1,125 @@
+"""
+Tests for the memory-mapped observation history store
+"""
+
+import math
+import unittest.mock as mock
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src import weather_bot
+from src.config import Config
+from src.history import FORECAST, OBSERVATION, HistoryStore
+
+HOUR = 3600
+START = 1704067200  # 2024-01-01 00:00:00 UTC
+
+def fill(store, location, hours, offset=0.0):
+    """One hourly observation per append, as the bot records them"""
+    for i in range(hours):
+        store.append(location, [START + i * HOUR], temperature=[i + offset], humidity=[50])
+
+class TestHistoryStore:
+    """Tests for appends, range queries, downsampling and compaction"""
+
+    def test_range_query_spans_segments_and_append_log(self, tmp_path):
+        store = HistoryStore(str(tmp_path), segment_rows=10)
+        fill(store, 'a', 25)
+        fill(store, 'b', 5, offset=100)
+        assert store.summary()['segments'] == 3
+
+        rows = store.query('a', START + 5 * HOUR, START + 22 * HOUR)
+        assert rows['temperature'].tolist() == list(range(5, 22))
+        assert rows['timestamp'][0] == np.datetime64('2024-01-01T05:00:00')
+        assert store.query('b')['temperature'].tolist() == [100, 101, 102, 103, 104]
+        assert len(store.query('missing')['timestamp']) == 0
+
+    def test_query_accepts_date_strings_and_separates_kinds(self, tmp_path):
+        store = HistoryStore(str(tmp_path))
+        fill(store, 'a', 48)
+        store.append('a', ['2024-01-01 03:00:00'], FORECAST, temperature=[-5])
+
+        rows = store.query('a', '2024-01-02 00:00:00')
+        assert rows['temperature'].tolist() == list(range(24, 48))
+        assert store.query('a', kind=FORECAST)['temperature'].tolist() == [-5]
+
+    def test_newest_duplicate_wins(self, tmp_path):
+        store = HistoryStore(str(tmp_path), segment_rows=4)
+        store.append('a', [START, START + HOUR], temperature=[1, 2])
+        store.append('a', [START, START + HOUR], temperature=[3, 4])
+        store.append('a', [START], temperature=[5])
+        assert store.query('a')['temperature'].tolist() == [5, 4]
+
+        store.compact()
+        assert store.query('a')['temperature'].tolist() == [5, 4]
+
+    def test_downsample_hourly_to_daily(self, tmp_path):
+        store = HistoryStore(str(tmp_path))
+        fill(store, 'a', 48)
+        store.append('a', [START + 49 * HOUR], temperature=[None])
+
+        daily = store.downsample('a', 'day', fields=('temperature', 'humidity'))
+        assert daily['count'].tolist() == [24, 24, 1]
+        assert daily['temperature_min'].tolist()[:2] == [0, 24]
+        assert daily['temperature_max'].tolist()[:2] == [23, 47]
+        assert daily['temperature_mean'].tolist()[:2] == [11.5, 35.5]
+        assert daily['humidity_mean'].tolist()[:2] == [50, 50]
+        assert math.isnan(daily['temperature_mean'][2])
+
+    def test_compaction_merges_segments_and_applies_retention(self, tmp_path):
+        store = HistoryStore(str(tmp_path), segment_rows=10)
+        fill(store, 'a', 30)
+        fill(store, 'b', 30, offset=100)
+        assert store.summary()['segments'] == 6
+
+        result = store.compact(drop_before=START + 10 * HOUR)
+        assert result == {'segments': 6, 'rows_in': 60, 'rows_out': 40}
+        assert store.summary()['segments'] == 1
+        assert store.query('a')['temperature'].tolist() == list(range(10, 30))
+        assert store.query('b', end=START + 12 * HOUR)['temperature'].tolist() == [110, 111]
+
+    def test_reopen_recovers_segments_and_torn_append(self, tmp_path):
+        store = HistoryStore(str(tmp_path), segment_rows=10)
+        fill(store, 'a', 15)
+        store.close()
+        # Simulate a crash midway through writing one row
+        with open(tmp_path / 'active' / 'timestamp.bin', 'ab') as handle:
+            handle.write(np.int64(START).tobytes())
+
+        reopened = HistoryStore(str(tmp_path), segment_rows=10)
+        assert reopened.summary()['active_rows'] == 5
+        assert reopened.query('a')['temperature'].tolist() == list(range(15))
+        assert reopened.locations() == {'a': None}
+
+    def test_record_forecast_parses_utc_slot_times(self, tmp_path):
+        store = HistoryStore(str(tmp_path))
+        store.record_forecast('10.0000,20.0000', {'location': 'Test City', 'forecast': [
+            {'datetime': '2024-01-01 03:00:00', 'temperature': 1, 'pop': None},
+            {'datetime': '2024-01-01 06:00:00', 'temperature': 2, 'pop': 0.5}]})
+
+        rows = store.query('10.0000,20.0000', kind=FORECAST)
+        assert rows['timestamp'].astype(np.int64).tolist() == [START + 3 * HOUR, START + 6 * HOUR]
+        assert math.isnan(rows['pop'][0])
+        assert store.locations() == {'10.0000,20.0000': 'Test City'}
+
+class TestWeatherBotHistory:
+    """Fetched observations are recorded when Config.HISTORY_PATH is set"""
+
+    def test_current_weather_is_recorded(self, tmp_path, mock_openweather_response):
+        mock_openweather_response.json.return_value['dt'] = START
+        store = HistoryStore(str(tmp_path))
+        with mock.patch.object(weather_bot, '_history', store), \
+                mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+            mock_transport.return_value.get.return_value = mock_openweather_response
+            weather_bot._request_current_weather(41.0, -71.0, "current:41.0000,-71.0000")
+
+        rows = store.query('41.0000,-71.0000', kind=OBSERVATION)
+        assert rows['timestamp'].astype(np.int64).tolist() == [START]
+        assert rows['temperature'].tolist() == [22.5]
+
+    def test_disabled_by_default(self):
+        with mock.patch.object(weather_bot, '_history', None), \
+                mock.patch.object(Config, 'HISTORY_PATH', None):
+            assert weather_bot.get_history_store() is None
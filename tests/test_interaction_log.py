@@ -0,0 +1,115 @@
+"""
+Tests for the background interaction log writer
+"""
+
+import gzip
+import json
+import threading
+import unittest.mock as mock
+
+import pytest
+
+from src import weather_bot
+from src.config import Config
+from src.interaction_log import BLOCK, InteractionLogWriter, worker_log_path
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+class TestInteractionLogWriter:
+    """Tests for batching, rotation and the full-queue policy"""
+
+    def test_writes_jsonl_and_flushes_on_close(self, tmp_path):
+        path = str(tmp_path / 'interactions.jsonl')
+        writer = InteractionLogWriter(path, flush_interval=0.01)
+        for i in range(100):
+            assert writer.write({'query': f"q{i}"})
+        writer.close()
+        assert [record['query'] for record in read_lines(path)] == [f"q{i}" for i in range(100)]
+        assert writer.stats['written'] == 100
+        assert writer.stats['batches'] >= 1
+
+    def test_rotates_and_gzips_segments(self, tmp_path):
+        path = str(tmp_path / 'interactions.jsonl')
+        writer = InteractionLogWriter(path, batch_size=10, max_bytes=200, flush_interval=0.01)
+        for i in range(50):
+            writer.write({'query': f"query number {i}"})
+        writer.close()
+
+        segments = sorted(tmp_path.glob('interactions.jsonl.*.gz'))
+        assert segments and writer.stats['rotations'] == len(segments)
+        records = []
+        for segment in segments:
+            with gzip.open(segment, 'rt') as f:
+                records.extend(json.loads(line) for line in f)
+        if (tmp_path / 'interactions.jsonl').exists():
+            records.extend(read_lines(path))
+        assert len(records) == 50
+
+    def test_compression_does_not_hold_up_writes(self, tmp_path):
+        path = str(tmp_path / 'interactions.jsonl')
+        release = threading.Event()
+
+        def slow_compress(segment, compression):
+            release.wait(5)
+            return segment
+
+        writer = InteractionLogWriter(path, batch_size=10, max_bytes=200, flush_interval=0.01)
+        with mock.patch('src.interaction_log._compress', side_effect=slow_compress) as compress:
+            for i in range(50):
+                writer.write({'query': f"query number {i}"})
+            writer.flush()
+            assert writer.stats['written'] == 50
+            assert compress.call_count >= 1
+            release.set()
+            writer.close()
+
+    def test_compression_errors_are_logged_and_writing_goes_on(self, tmp_path, caplog):
+        path = str(tmp_path / 'interactions.jsonl')
+        writer = InteractionLogWriter(path, batch_size=10, max_bytes=200, flush_interval=0.01)
+        with mock.patch('src.interaction_log._compress', side_effect=ValueError("bad frame")):
+            for i in range(50):
+                writer.write({'query': f"query number {i}"})
+            writer.close()
+        assert writer.stats['written'] == 50
+        assert writer.stats['errors'] == writer.stats['rotations'] > 0
+        assert any(record.name == 'weather_bot.interaction_log' and record.exc_info for record in caplog.records)
+        assert sorted(tmp_path.glob('interactions.jsonl.*')) and not list(tmp_path.glob('*.gz'))
+
+    def test_drop_policy_never_blocks(self, tmp_path):
+        writer = InteractionLogWriter(str(tmp_path / 'log.jsonl'), max_queue=1)
+        gate = threading.Event()
+        with mock.patch.object(writer, '_write_batch', side_effect=lambda records: gate.wait(1)):
+            results = [writer.write({'i': i}) for i in range(20)]
+            gate.set()
+        writer.close()
+        assert results.count(False) == writer.stats['dropped'] > 0
+
+    def test_block_policy_waits_for_space(self, tmp_path):
+        path = str(tmp_path / 'log.jsonl')
+        writer = InteractionLogWriter(path, max_queue=2, batch_size=1, policy=BLOCK)
+        assert all(writer.write({'i': i}) for i in range(20))
+        writer.close()
+        assert len(read_lines(path)) == 20
+
+    def test_rejects_unknown_compression(self, tmp_path):
+        with pytest.raises(ValueError):
+            InteractionLogWriter(str(tmp_path / 'log.jsonl'), compression='lz4')
+
+    def test_worker_log_path(self):
+        assert worker_log_path('/var/log/interactions.jsonl', 2) == '/var/log/interactions.worker-2.jsonl'
+        assert worker_log_path('interactions', 0) == 'interactions.worker-0'
+
+class TestLogUserInteraction:
+    """Tests for log_user_interaction with a configured log file"""
+
+    def test_records_go_to_the_writer(self, tmp_path):
+        path = str(tmp_path / 'interactions.jsonl')
+        with mock.patch.object(Config, 'INTERACTION_LOG_PATH', path), \
+                mock.patch.object(weather_bot, '_interaction_log', None):
+            weather_bot.log_user_interaction("weather in Boston", "Sunny", stages={'total': 0.25})
+            weather_bot.get_interaction_log().close()
+        record = read_lines(path)[0]
+        assert record['query'] == "weather in Boston"
+        assert record['stages_ms'] == {'total': 250.0}
@@ -0,0 +1,119 @@
+"""
+Tests for latency-budgeted and streamed Gemini responses
+"""
+
+import threading
+import time
+import unittest.mock as mock
+
+import pytest
+
+from src import weather_bot
+
+WEATHER = {'location': 'Lisbon', 'temperature': 24, 'description': 'clear sky', 'wind_direction': 90}
+
+def chunk(text):
+    part = mock.Mock()
+    part.text = text
+    return part
+
+@pytest.fixture
+def gemini():
+    client = mock.Mock()
+    weather_bot._response_cache.clear()
+    with mock.patch.object(weather_bot, '_get_gemini_client', return_value=client):
+        yield client
+
+class TestLatencyBudget:
+    """Tests for racing Gemini against the fallback response"""
+
+    def test_slow_gemini_returns_fallback_then_fills_cache(self, gemini):
+        finished = threading.Event()
+
+        def slow_generate(prompt):
+            time.sleep(0.2)
+            finished.set()
+            return chunk("Sunny and warm in Lisbon.")
+
+        gemini.generate_content.side_effect = slow_generate
+        started = time.monotonic()
+        result = weather_bot.generate_natural_response(WEATHER, "weather in Lisbon", budget_seconds=0.05)
+        assert time.monotonic() - started < 0.15
+        assert result == weather_bot.create_fallback_response(WEATHER)
+
+        assert finished.wait(1)
+        time.sleep(0.05)
+        assert weather_bot.generate_natural_response(WEATHER, "weather in Lisbon") == "Sunny and warm in Lisbon."
+        assert gemini.generate_content.call_count == 1
+
+    def test_fast_gemini_within_budget(self, gemini):
+        gemini.generate_content.return_value = chunk("Sunny in Lisbon.")
+        assert weather_bot.generate_natural_response(WEATHER, "weather in Lisbon", budget_seconds=1) == \
+            "Sunny in Lisbon."
+
+    def test_exhausted_budget_counts_as_exceeded(self, gemini):
+        gemini.generate_content.side_effect = lambda prompt: time.sleep(0.05) or chunk("late")
+        before = weather_bot.get_latency_budget_stats()['budget_exceeded']
+        weather_bot.generate_natural_response(WEATHER, "weather in Lisbon", budget_seconds=0)
+        assert weather_bot.get_latency_budget_stats()['budget_exceeded'] == before + 1
+
+    def test_calls_past_their_budget_do_not_pile_up(self, gemini):
+        release = threading.Event()
+        gemini.generate_content.side_effect = lambda prompt: release.wait(5) and chunk("late")
+        fallback = weather_bot.create_fallback_response(WEATHER)
+        before = weather_bot.get_latency_budget_stats()
+        with mock.patch.object(weather_bot.Config, 'GEMINI_MAX_CONCURRENCY', 1), \
+                mock.patch.object(weather_bot.Config, 'GEMINI_MAX_QUEUE', 1), \
+                mock.patch.object(weather_bot, '_gemini_executor', None), \
+                mock.patch.object(weather_bot, '_gemini_slots', None):
+            # Runs and holds the only thread; the second waits in the queue and is dropped on timeout
+            assert weather_bot.generate_natural_response(WEATHER, "weather in Lisbon", budget_seconds=0.05) == fallback
+            assert weather_bot.generate_natural_response(WEATHER, "rain in Lisbon", budget_seconds=0.05) == fallback
+            # The queue slot of the dropped call is free again; the one after that finds the queue full
+            weather_bot._submit_gemini(release.wait, 5)
+            started = time.monotonic()
+            assert weather_bot.generate_natural_response(WEATHER, "wind in Lisbon", budget_seconds=1) == fallback
+            assert time.monotonic() - started < 0.5
+            executor = weather_bot._gemini_executor
+            release.set()
+            executor.shutdown(wait=True)
+        stats = weather_bot.get_latency_budget_stats()
+        assert stats['budget_exceeded'] == before['budget_exceeded'] + 2
+        assert stats['queue_full'] == before['queue_full'] + 1
+        assert gemini.generate_content.call_count == 1
+
+class TestStreaming:
+    """Tests for stream_natural_response"""
+
+    def test_yields_chunks_and_caches_full_text(self, gemini):
+        gemini.generate_content.return_value = iter([chunk("Sunny "), chunk("in Lisbon.")])
+        assert list(weather_bot.stream_natural_response(WEATHER, "weather in Lisbon")) == ["Sunny ", "in Lisbon."]
+        assert list(weather_bot.stream_natural_response(WEATHER, "weather in Lisbon")) == ["Sunny in Lisbon."]
+
+    def test_no_first_token_within_budget_yields_fallback(self, gemini):
+        def slow_stream(prompt, stream):
+            time.sleep(0.2)
+            yield chunk("late")
+
+        gemini.generate_content.side_effect = slow_stream
+        result = list(weather_bot.stream_natural_response(WEATHER, "weather in Lisbon", budget_seconds=0.05))
+        assert result == [weather_bot.create_fallback_response(WEATHER)]
+
+    def test_failure_before_first_token_yields_fallback(self, gemini):
+        gemini.generate_content.side_effect = RuntimeError("quota")
+        result = list(weather_bot.stream_natural_response(WEATHER, "weather in Lisbon"))
+        assert result == [weather_bot.create_fallback_response(WEATHER)]
+
+    def test_failure_mid_stream_appends_fallback_and_is_not_cached(self, gemini):
+        def broken_stream(prompt, stream):
+            yield chunk("Sunny ")
+            raise RuntimeError("connection reset")
+
+        gemini.generate_content.side_effect = broken_stream
+        fallback = weather_bot.create_fallback_response(WEATHER)
+        result = list(weather_bot.stream_natural_response(WEATHER, "weather in Lisbon"))
+        assert result == ["Sunny ", "\n\n" + fallback]
+
+        gemini.generate_content.side_effect = None
+        gemini.generate_content.return_value = iter([chunk("Sunny in Lisbon.")])
+        assert list(weather_bot.stream_natural_response(WEATHER, "weather in Lisbon")) == ["Sunny in Lisbon."]
@@ -0,0 +1,78 @@
+"""
+Tests for pipeline metrics and the per-stage breakdown
+"""
+
+import logging
+import unittest.mock as mock
+
+from benchmarks.fakes import UpstreamProfile, fake_services
+from src import metrics as metrics_module
+from src import weather_bot
+from src.metrics import Histogram, MetricsRegistry, stage_breakdown
+
+class TestMetricsRegistry:
+    """Tests for counters, histograms and exports"""
+
+    def test_counters_and_prometheus_dump(self):
+        registry = MetricsRegistry()
+        registry.inc('upstream_responses_total', service='openweather', status='429')
+        registry.inc('upstream_responses_total', service='openweather', status='429')
+        registry.observe('stage_seconds', 0.003, stage='parse')
+        text = registry.to_prometheus()
+        assert '# TYPE weather_bot_upstream_responses_total counter' in text
+        assert 'weather_bot_upstream_responses_total{service="openweather",status="429"} 2' in text
+        assert 'weather_bot_stage_seconds_bucket{stage="parse",le="0.005"} 1' in text
+        assert 'weather_bot_stage_seconds_bucket{stage="parse",le="+Inf"} 1' in text
+        assert 'weather_bot_stage_seconds_count{stage="parse"} 1' in text
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram((0.01, 0.1, 1.0))
+        for value in [0.005] * 90 + [0.5] * 10:
+            histogram.observe(value)
+        assert histogram.quantile(0.5) <= 0.01
+        assert 0.1 < histogram.quantile(0.99) <= 1.0
+
+    def test_stage_fills_breakdown_and_hooks(self):
+        registry = MetricsRegistry()
+        spans = []
+        registry.add_span_hook(spans.append)
+        with stage_breakdown() as stages:
+            with registry.stage('geocode'):
+                pass
+        assert set(stages) == {'geocode'}
+        assert spans[0].name == 'geocode'
+        assert registry.snapshot()['histograms']['stage_seconds{stage="geocode"}']['count'] == 1
+
+    def test_disabled_registry_records_nothing(self):
+        registry = MetricsRegistry(enabled=False)
+        with stage_breakdown() as stages:
+            with registry.stage('parse'):
+                registry.inc('anything')
+        assert stages == {}
+        assert registry.snapshot() == {'counters': {}, 'histograms': {}}
+
+class TestPipelineMetrics:
+    """Tests for instrumentation of process_user_query"""
+
+    def test_query_records_stages_and_interaction(self):
+        registry = MetricsRegistry()
+        with mock.patch.object(metrics_module, '_registry', registry), \
+                mock.patch.object(weather_bot, 'log_user_interaction',
+                                  wraps=weather_bot.log_user_interaction) as log, \
+                fake_services(UpstreamProfile(rate_limit_rate=0.3, seed=1)):
+            weather_bot.process_user_query("What's the weather in Springfield?")
+            weather_bot.process_user_query("What's the weather in Springfield?")
+
+        query, response, timestamp, stages = log.call_args.args
+        assert {'parse', 'geocode', 'weather', 'cache', 'generate', 'total'} <= set(stages)
+        with mock.patch.object(metrics_module, '_registry', registry):
+            snapshot = weather_bot.get_metrics_snapshot()
+        assert snapshot['cache_hit_ratio']['weather'] == 0.5
+        assert snapshot['counters']['upstream_responses_total{endpoint="generate",service="gemini",status="200"}'] == 1
+        assert any('status="429"' in series for series in snapshot['counters'])
+
+    def test_log_user_interaction_record(self, caplog):
+        with caplog.at_level(logging.INFO, logger='weather_bot.interactions'):
+            record = weather_bot.log_user_interaction("q", "r", stages={'parse': 0.0012})
+        assert record['stages_ms'] == {'parse': 1.2}
+        assert '"query": "q"' in caplog.text
@@ -0,0 +1,46 @@
+"""
+Tests for the single-pass query analyzer
+"""
+
+import pytest
+
+from src.query_analyzer import KeywordMatcher, QueryAnalysis, analyze_query
+
+class TestKeywordMatcher:
+    """Tests for the word-level Aho-Corasick automaton"""
+
+    def test_overlapping_phrases(self):
+        matcher = KeywordMatcher({('next',): 'next', ('next', 'week'): 'next_week', ('week',): 'week'})
+        assert matcher.scan("rain next week".split()) == [
+            (1, 2, 'next'), (1, 3, 'next_week'), (2, 3, 'week')]
+
+    def test_failure_links(self):
+        matcher = KeywordMatcher({('a', 'b', 'c'): 'abc', ('b', 'd'): 'bd'})
+        assert matcher.scan("a b d".split()) == [(1, 3, 'bd')]
+
+class TestAnalyzeQuery:
+    """Tests for the combined location / type / day offset analysis"""
+
+    @pytest.mark.parametrize("query, expected", [
+        ("weather in Boston", ("Boston", "current", None)),
+        ("Boston weather", ("Boston", "current", None)),
+        ("How's the weather in Chicago?", ("Chicago", "current", None)),
+        ("weather in Dallas, Texas", ("Dallas, Texas", "current", None)),
+        ("forecast for Miami, FL", ("Miami, FL", "forecast", None)),
+        ("Tokyo forecast", ("Tokyo", "forecast", None)),
+        ("Weather forecast for Austin tomorrow", ("Austin", "forecast", 1)),
+        ("Will it rain next week in Seattle?", ("Seattle", "forecast", 7)),
+        ("forecast for the next 3 days in Paris", ("Paris", "forecast", 3, 3)),
+        ("weather in St. Louis tonight", ("St. Louis", "forecast", 0)),
+        ("What's the weather like?", (None, "current", None)),
+        ("Is it raining?", (None, "current", None)),
+        ("", (None, "current", None)),
+    ])
+    def test_analysis(self, query, expected):
+        assert analyze_query(query) == QueryAnalysis(*expected)
+
+    def test_results_are_memoized(self):
+        analyze_query("weather in Memoville")
+        hits = analyze_query.cache_info().hits
+        analyze_query("weather in Memoville")
+        assert analyze_query.cache_info().hits == hits + 1
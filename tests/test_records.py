@@ -0,0 +1,58 @@
+"""
+Tests for compact weather records
+"""
+
+import json
+import pickle
+
+import pytest
+
+from src.records import ForecastSlot, WeatherRecord
+
+SAMPLE = {
+    'location': 'Test City',
+    'temperature': 22.5,
+    'humidity': 60,
+    'pressure': 1013,
+    'description': 'partly cloudy',
+    'wind_speed': 5.2,
+    'wind_direction': 180,
+    'timestamp': '2024-01-01 12:00:00'
+}
+
+class TestWeatherRecord:
+    """Tests for the mapping interface and immutability"""
+
+    def test_mapping_interface(self):
+        record = WeatherRecord.from_dict(SAMPLE)
+        assert record['temperature'] == 22.5
+        assert record.get('missing') is None
+        assert 'humidity' in record
+        assert dict(record) == SAMPLE
+        assert record == SAMPLE
+
+    def test_has_no_instance_dict(self):
+        assert not hasattr(WeatherRecord.from_dict(SAMPLE), '__dict__')
+
+    def test_immutable(self):
+        record = WeatherRecord.from_dict(SAMPLE)
+        with pytest.raises(AttributeError):
+            record.temperature = 30
+
+    def test_repeated_strings_are_interned(self):
+        first = WeatherRecord.from_dict(dict(SAMPLE, description=''.join(['partly ', 'cloudy'])))
+        second = WeatherRecord.from_dict(dict(SAMPLE, description=''.join(['partly', ' cloudy'])))
+        assert first.description is second.description
+
+    def test_serialization(self):
+        record = WeatherRecord.from_dict(SAMPLE)
+        assert json.loads(json.dumps(record.to_dict())) == SAMPLE
+        assert pickle.loads(pickle.dumps(record)) == record
+
+class TestForecastSlot:
+    """Tests for forecast slots"""
+
+    def test_missing_fields_default_to_none(self):
+        slot = ForecastSlot.from_dict({'datetime': '2024-01-01 15:00:00', 'temperature': 20})
+        assert slot['pop'] is None
+        assert len(slot) == 8
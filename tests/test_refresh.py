@@ -0,0 +1,160 @@
+"""
+Tests for stale-while-revalidate and hot-location prefetch
+"""
+
+import threading
+import unittest.mock as mock
+
+from src import weather_bot
+from src.cache import MemoryCache, SQLiteCache, TieredCache
+from src.refresh import BackgroundRefresher, CountMinSketch, HotSet
+from src.scheduler import BACKGROUND, current_priority
+
+class TestCountMinSketch:
+    """Tests for approximate counting"""
+
+    def test_estimates_never_undercount(self):
+        sketch = CountMinSketch(width=64, depth=3)
+        for i in range(200):
+            sketch.add(f"city{i % 20}")
+        assert all(sketch.estimate(f"city{i}") >= 10 for i in range(20))
+
+    def test_halve_ages_counts(self):
+        sketch = CountMinSketch()
+        for _ in range(8):
+            sketch.add('boston')
+        sketch.halve()
+        assert sketch.estimate('boston') == 4
+
+class TestHotSet:
+    """Tests for top-N tracking"""
+
+    def test_keeps_most_requested_keys(self):
+        hot = HotSet(top_n=2)
+        job = lambda: True
+        made = []
+        for key, count in (('a', 5), ('b', 1), ('c', 3)):
+            for _ in range(count):
+                hot.record(key, lambda key: made.append(key) or job, key)
+        assert [key for key, _, _ in hot.top()] == ['a', 'c']
+        # A job is only built when its key enters the set
+        assert made == ['a', 'b', 'c']
+
+    def test_displaces_the_coldest_key_after_many_updates(self):
+        hot = HotSet(top_n=3)
+        counts = {'a': 50, 'b': 40, 'c': 30, 'd': 20, 'e': 35}
+        for round_ in range(50):
+            for key, count in counts.items():
+                if round_ < count:
+                    hot.record(key, lambda: lambda: True)
+        assert [key for key, _, _ in hot.top()] == ['a', 'b', 'e']
+        assert len(hot._heap) <= 2 * hot.top_n
+
+    def test_idle_keys_drop_out(self):
+        now = [0.0]
+        hot = HotSet(top_n=2, idle_seconds=60, clock=lambda: now[0])
+        hot.record('a', lambda: lambda: True)
+        now[0] = 30.0
+        hot.record('b', lambda: lambda: True)
+        now[0] = 80.0
+        assert [key for key, _, _ in hot.top()] == ['b']
+        assert len(hot) == 1
+
+    def test_decay_removes_keys_no_longer_requested(self):
+        hot = HotSet(top_n=2, decay_every=4)
+        for key in ('a', 'b', 'b', 'b'):
+            hot.record(key, lambda: lambda: True)
+        assert [key for key, _, _ in hot.top()] == ['b']
+
+    def test_disabled_when_top_n_is_zero(self):
+        hot = HotSet(top_n=0)
+        hot.record('a', lambda: lambda: True)
+        assert len(hot) == 0
+
+class TestBackgroundRefresher:
+    """Tests for deduplicated background jobs"""
+
+    def test_deduplicates_pending_refreshes_and_runs_in_background(self):
+        refresher = BackgroundRefresher(max_workers=1)
+        release = threading.Event()
+        priorities = []
+
+        def job():
+            priorities.append(current_priority())
+            release.wait(1)
+            return True
+
+        assert refresher.submit('boston', job)
+        assert not refresher.submit('boston', job)
+        release.set()
+        refresher.close()
+        refresher._executor.shutdown(wait=True)
+        assert priorities == [BACKGROUND]
+        assert refresher.stats['deduplicated'] == 1
+
+    def test_prefetch_submits_hot_keys_that_need_refresh(self):
+        refresher = BackgroundRefresher()
+        hot = HotSet(top_n=3)
+        ran = []
+        for key in ('a', 'b'):
+            hot.record(key, lambda key=key: lambda: ran.append(key) or True)
+        assert refresher.prefetch(hot, lambda key: key == 'b') == 1
+        refresher._executor.shutdown(wait=True)
+        assert ran == ['b']
+
+class TestStaleEntries:
+    """Tests for soft/hard TTLs in the cache tiers"""
+
+    def test_stale_entries_are_served_until_hard_ttl(self):
+        cache = MemoryCache()
+        with mock.patch('src.cache.time.time', return_value=1000.0):
+            cache.set('boston', 1, 60, stale_seconds=30)
+        with mock.patch('src.cache.time.time', return_value=1070.0):
+            assert cache.get_entry('boston') == (1, 1090.0, 1060.0)
+        with mock.patch('src.cache.time.time', return_value=1091.0):
+            assert cache.get('boston') is None
+
+    def test_stale_window_survives_disk_promotion(self, tmp_path):
+        disk = SQLiteCache(str(tmp_path / 'cache.db'))
+        disk.set('boston', 1, 60, stale_seconds=30)
+        cache = TieredCache(MemoryCache(), disk)
+        value, expires_at, stale_at = cache.get_entry('boston')
+        assert expires_at - stale_at == 30
+        assert 0 < cache.memory.stale_in('boston') <= 60
+
+class TestWeatherBotRevalidation:
+    """Tests for stale-while-revalidate in the weather fetch path"""
+
+    def test_stale_entry_served_and_refreshed(self):
+        weather_bot.cache_weather_data("current:40.0000,7.0000", {'temperature': 1}, 0, stale_minutes=5)
+        refresher = BackgroundRefresher()
+        with mock.patch.object(weather_bot, 'get_refresher', return_value=refresher), \
+                mock.patch.object(weather_bot, '_request_current_weather',
+                                  return_value={'temperature': 2}) as upstream:
+            assert weather_bot.fetch_current_weather(40.0, 7.0) == {'temperature': 1}
+            refresher._executor.shutdown(wait=True)
+        upstream.assert_called_once()
+        assert refresher.stats['submitted'] == 1
+
+    def test_fresh_entry_is_not_refreshed(self):
+        weather_bot.cache_weather_data("current:41.0000,7.0000", {'temperature': 1}, 10, stale_minutes=5)
+        refresher = BackgroundRefresher()
+        with mock.patch.object(weather_bot, 'get_refresher', return_value=refresher):
+            assert weather_bot.fetch_current_weather(41.0, 7.0) == {'temperature': 1}
+        assert refresher.stats['submitted'] == 0
+
+    def test_needs_prefetch_near_staleness(self):
+        weather_bot.cache_weather_data("current:42.0000,7.0000", {'temperature': 1}, 0.1)
+        weather_bot.cache_weather_data("current:43.0000,7.0000", {'temperature': 1}, 60)
+        assert weather_bot._needs_prefetch("current:42.0000,7.0000")
+        assert not weather_bot._needs_prefetch("current:43.0000,7.0000")
+        # Evicted or never cached entries are left for the next request to fetch
+        assert not weather_bot._needs_prefetch("current:44.0000,7.0000")
+
+    def test_prefetch_is_opt_in(self):
+        with mock.patch.object(weather_bot, '_hot_set', None), \
+                mock.patch.object(weather_bot.Config, 'PREFETCH_TOP_N', 0):
+            weather_bot.cache_weather_data("current:45.0000,7.0000", {'temperature': 1}, 10)
+            weather_bot.fetch_current_weather(45.0, 7.0)
+            assert not weather_bot.start_prefetch()
+            assert weather_bot._hot_set is None
@@ -0,0 +1,52 @@
+"""
+Tests for the Gemini response cache
+"""
+
+import unittest.mock as mock
+
+import pytest
+
+from src import weather_bot
+
+@pytest.fixture
+def gemini():
+    client = mock.Mock()
+    client.generate_content.return_value.text = "It's a mild day in Oslo."
+    weather_bot._response_cache.clear()
+    with mock.patch.object(weather_bot, '_get_gemini_client', return_value=client):
+        yield client
+
+def weather(temperature, description='clear sky', wind=180):
+    return {'location': 'Oslo', 'temperature': temperature, 'description': description,
+            'wind_direction': wind}
+
+class TestResponseCache:
+    """Tests for generation reuse keyed on bucketed weather"""
+
+    def test_same_intent_and_weather_reuses_text(self, gemini):
+        hits = weather_bot.get_response_cache_stats()['hits']
+        first = weather_bot.generate_natural_response(weather(12.2), "weather in Oslo")
+        second = weather_bot.generate_natural_response(weather(11.9), "How's the weather in Oslo?")
+        assert first == second == "It's a mild day in Oslo."
+        assert gemini.generate_content.call_count == 1
+        assert weather_bot.get_response_cache_stats()['hits'] == hits + 1
+
+    @pytest.mark.parametrize("changed", [
+        weather(15.0), weather(12.0, 'light rain'), weather(12.0, wind=0)
+    ])
+    def test_weather_change_misses(self, gemini, changed):
+        weather_bot.generate_natural_response(weather(12.0), "weather in Oslo")
+        weather_bot.generate_natural_response(changed, "weather in Oslo")
+        assert gemini.generate_content.call_count == 2
+
+    def test_different_intent_misses(self, gemini):
+        forecast = {'location': 'Oslo', 'forecast': [{'temperature': 10, 'description': 'rain'}]}
+        weather_bot.generate_natural_response(forecast, "forecast for Oslo tomorrow")
+        weather_bot.generate_natural_response(forecast, "forecast for 3 days in Oslo")
+        assert gemini.generate_content.call_count == 2
+
+    def test_failures_are_not_cached(self, gemini):
+        gemini.generate_content.side_effect = RuntimeError("quota")
+        result = weather_bot.generate_natural_response(weather(12.0), "weather in Oslo")
+        assert 'Oslo' in result
+        assert len(weather_bot._response_cache) == 0
@@ -0,0 +1,149 @@
+"""
+Tests for the quota-aware request scheduler
+"""
+
+import threading
+import time
+import unittest.mock as mock
+
+import pytest
+
+from src import scheduler as scheduler_module
+from src.config import Config
+from src.scheduler import (BACKGROUND, INTERACTIVE, QuotaExceeded, QuotaScheduler, TokenBucket,
+                           current_priority, request_priority, split_quota)
+from src.transport import HttpTransport
+
+class FakeClock:
+    """Monotonic clock that only moves when advanced"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+class TestTokenBucket:
+    """Tests for refill and burst"""
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate_per_minute=600, burst=2)
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        assert 0 < bucket.time_until_available() <= 0.1
+        time.sleep(0.11)
+        assert bucket.try_acquire()
+
+class TestQuotaScheduler:
+    """Tests for priorities, bounded queues and deadlines"""
+
+    def test_unlimited_service_never_waits(self):
+        scheduler = QuotaScheduler({'openweather': None})
+        for _ in range(100):
+            scheduler.acquire('openweather', 'weather', 'key', timeout=0)
+
+    def test_deadline_raises_instead_of_waiting(self):
+        scheduler = QuotaScheduler({'gemini': 6}, burst_fraction=0)
+        scheduler.acquire('gemini', timeout=0)
+        with pytest.raises(QuotaExceeded):
+            scheduler.acquire('gemini', timeout=0.05)
+        assert scheduler.stats['expired'] == 1
+
+    def test_buckets_are_per_key(self):
+        scheduler = QuotaScheduler({'openweather': 6}, burst_fraction=0)
+        scheduler.acquire('openweather', api_key='free', timeout=0)
+        scheduler.acquire('openweather', api_key='paid', timeout=0)
+        with pytest.raises(QuotaExceeded):
+            scheduler.acquire('openweather', api_key='free', timeout=0)
+
+    def test_endpoint_limit_applies_on_top_of_service(self):
+        scheduler = QuotaScheduler({'openweather': None, 'openweather:forecast': 6}, burst_fraction=0)
+        scheduler.acquire('openweather', 'forecast', timeout=0)
+        scheduler.acquire('openweather', 'weather', timeout=0)
+        with pytest.raises(QuotaExceeded):
+            scheduler.acquire('openweather', 'forecast', timeout=0)
+
+    def test_full_queue_rejects(self):
+        scheduler = QuotaScheduler({'gemini': 6}, max_queue=1, burst_fraction=0)
+        scheduler.acquire('gemini', timeout=0)
+        waiter = threading.Thread(target=lambda: pytest.raises(QuotaExceeded, scheduler.acquire,
+                                                               'gemini', timeout=0.3))
+        waiter.start()
+        time.sleep(0.05)
+        with pytest.raises(QuotaExceeded, match="full"):
+            scheduler.acquire('gemini', timeout=1)
+        waiter.join()
+        assert scheduler.stats['rejected'] == 1
+
+    def test_interactive_served_before_background(self):
+        clock = FakeClock()
+        scheduler = QuotaScheduler({'openweather': 1200}, burst_fraction=0, clock=clock)
+        scheduler.acquire('openweather', timeout=0)
+        lane = next(iter(scheduler._lanes.values()))
+        order = []
+
+        def request(name, priority):
+            scheduler.acquire('openweather', priority=priority, timeout=60)
+            order.append(name)
+
+        background = threading.Thread(target=request, args=('background', BACKGROUND), daemon=True)
+        interactive = threading.Thread(target=request, args=('interactive', INTERACTIVE), daemon=True)
+        background.start()
+        wait_until(lambda: len(lane.waiting) == 1)
+        interactive.start()
+        wait_until(lambda: len(lane.waiting) == 2)
+
+        for thread in (interactive, background):
+            # One token per step: the interactive request is at the head of the queue
+            with lane.condition:
+                clock.now += 0.1
+                lane.condition.notify_all()
+            thread.join(5)
+            assert not thread.is_alive()
+        assert order == ['interactive', 'background']
+
+    def test_lane_timeout_returns_the_key_token(self):
+        clock = FakeClock()
+        scheduler = QuotaScheduler({'openweather': 60, 'openweather:forecast': 6}, burst_fraction=0, clock=clock)
+        scheduler.acquire('openweather', 'forecast', timeout=0)
+        clock.now += 1
+        with pytest.raises(QuotaExceeded):
+            scheduler.acquire('openweather', 'forecast', timeout=0)
+        scheduler.acquire('openweather', 'weather', timeout=0)
+        assert scheduler.stats['granted'] == 2
+
+    def test_split_quota_gives_each_process_a_share(self):
+        with mock.patch.object(scheduler_module, '_scheduler', None), \
+                mock.patch.object(Config, 'OPENWEATHER_REQUESTS_PER_MINUTE', 60), \
+                mock.patch.object(Config, 'GEMINI_REQUESTS_PER_MINUTE', None), \
+                mock.patch.object(Config, 'ENDPOINT_REQUESTS_PER_MINUTE', {'openweather:forecast': 20}):
+            split_quota(4)
+            limits = scheduler_module.get_scheduler().limits
+        assert limits == {'openweather': 15, 'gemini': None, 'openweather:forecast': 5}
+
+class TestRequestPriority:
+    """Tests for the priority context"""
+
+    def test_context_sets_priority(self):
+        assert current_priority() == INTERACTIVE
+        with request_priority(BACKGROUND):
+            assert current_priority() == BACKGROUND
+        assert current_priority() == INTERACTIVE
+
+class TestTransportScheduling:
+    """Tests for quota checks in the transport"""
+
+    def test_every_attempt_acquires_quota(self):
+        scheduler = mock.Mock()
+        transport = HttpTransport(max_retries=1, backoff=0, scheduler=scheduler)
+        responses = [mock.Mock(status_code=503, headers={}), mock.Mock(status_code=200, headers={})]
+        with mock.patch.object(transport.session, 'get', side_effect=responses):
+            transport.get('http://api.openweathermap.org/data/2.5/forecast', params={'appid': 'k'})
+        assert scheduler.acquire.call_args_list == [mock.call('openweather', 'forecast', 'k')] * 2
@@ -0,0 +1,182 @@
+"""
+Tests for the asyncio HTTP front end
+"""
+
+import asyncio
+import json
+import os
+import unittest.mock as mock
+
+import pytest
+
+from src import server as server_module
+from src import weather_bot
+from src.config import Config
+from src.server import WeatherBotServer
+from src.shared_cache import SharedCache
+
+async def fake_queries(queries, *args, **kwargs):
+    await asyncio.sleep(0.01)
+    return [f"answer to {query}" for query in queries]
+
+async def request(port, method, path, body=None, headers=()):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n"
+    head += ''.join(f"{name}: {value}\r\n" for name, value in headers)
+    writer.write(head.encode() + b"\r\n" + payload)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, head.decode(), body
+
+def run_with_server(scenario):
+    async def main():
+        server = WeatherBotServer('127.0.0.1', 0)
+        _, port = await server.start()
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.shutdown(grace_seconds=1)
+    return asyncio.run(main())
+
+@pytest.fixture(autouse=True)
+def fake_pipeline():
+    with mock.patch.object(weather_bot, 'process_user_queries_async', side_effect=fake_queries):
+        yield
+
+class TestRoutes:
+    """Tests for the query, batch, health and metrics endpoints"""
+
+    def test_query_post_and_get(self):
+        async def scenario(server, port):
+            post = await request(port, 'POST', '/query', {'query': "weather in Boston"})
+            get = await request(port, 'GET', '/query?q=weather+in+Paris')
+            return post, get
+
+        (status, _, body), (get_status, _, get_body) = run_with_server(scenario)
+        assert status == 200
+        assert json.loads(body)['response'] == "answer to weather in Boston"
+        assert get_status == 200
+        assert json.loads(get_body)['response'] == "answer to weather in Paris"
+
+    def test_batch(self):
+        async def scenario(server, port):
+            return await request(port, 'POST', '/batch', {'queries': ["a", "b"]})
+
+        status, _, body = run_with_server(scenario)
+        assert status == 200
+        assert json.loads(body) == {'responses': ["answer to a", "answer to b"]}
+
+    def test_bad_requests(self):
+        async def scenario(server, port):
+            return [
+                (await request(port, 'POST', '/query', {'nope': 1}))[0],
+                (await request(port, 'POST', '/batch', {'queries': "a"}))[0],
+                (await request(port, 'GET', '/unknown'))[0],
+                (await request(port, 'DELETE', '/query'))[0]
+            ]
+
+        assert run_with_server(scenario) == [400, 400, 404, 405]
+
+    def test_malformed_headers_get_a_response(self):
+        async def scenario(server, port):
+            return [
+                (await request(port, 'POST', '/query', headers=[('Content-Length', 'abc')]))[0],
+                (await request(port, 'POST', '/query', headers=[('Content-Length', '-5')]))[0],
+                (await request(port, 'GET', '/health', headers=[('X-Padding', 'x' * 2048)]))[0]
+            ]
+
+        with mock.patch.object(Config, 'SERVER_MAX_BODY_BYTES', 1024):
+            assert run_with_server(scenario) == [400, 400, 431]
+
+    def test_health_and_metrics(self):
+        async def scenario(server, port):
+            await request(port, 'POST', '/query', {'query': "weather in Boston"})
+            return await request(port, 'GET', '/health'), await request(port, 'GET', '/metrics')
+
+        (status, _, body), (metrics_status, head, metrics) = run_with_server(scenario)
+        assert status == 200 and json.loads(body)['status'] == 'ok'
+        assert metrics_status == 200
+        assert 'text/plain' in head
+        assert b'weather_bot_http_requests_total{route="/query",status="200"}' in metrics
+
+    def test_keep_alive_serves_several_requests(self):
+        async def scenario(server, port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            statuses = []
+            for _ in range(3):
+                writer.write(b"GET /health HTTP/1.1\r\nHost: test\r\n\r\n")
+                await writer.drain()
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int([line for line in head.split(b"\r\n") if line.lower().startswith(b'content-length')]
+                             [0].split(b':')[1])
+                await reader.readexactly(length)
+                statuses.append(int(head.split()[1]))
+            writer.close()
+            return statuses
+
+        assert run_with_server(scenario) == [200, 200, 200]
+
+class TestTimeoutsAndShutdown:
+    """Tests for request timeouts and graceful shutdown"""
+
+    def test_slow_queries_time_out(self):
+        async def slow(queries, *args, **kwargs):
+            await asyncio.sleep(5)
+
+        async def scenario(server, port):
+            with mock.patch.object(weather_bot, 'process_user_queries_async', side_effect=slow), \
+                    mock.patch.object(Config, 'SERVER_REQUEST_TIMEOUT_SECONDS', 0.05):
+                return await request(port, 'POST', '/query', {'query': "weather in Boston"})
+
+        status, _, _ = run_with_server(scenario)
+        assert status == 504
+
+    def test_shutdown_waits_for_inflight_requests(self):
+        async def scenario(server, port):
+            pending = asyncio.ensure_future(request(port, 'POST', '/query', {'query': "weather in Boston"}))
+            await asyncio.sleep(0.005)
+            await server.shutdown(grace_seconds=2)
+            return await pending
+
+        status, _, body = run_with_server(scenario)
+        assert status == 200
+        assert json.loads(body)['response'] == "answer to weather in Boston"
+
+    def test_multiple_workers_share_a_cache_file(self, tmp_path, monkeypatch):
+        # serve() exports the path; setenv makes monkeypatch remove it afterwards
+        monkeypatch.setenv('WEATHER_BOT_CACHE_DB', '')
+        with mock.patch.object(server_module, 'multiprocessing') as mp, \
+                mock.patch.object(server_module.signal, 'signal'):
+            server_module.serve('127.0.0.1', 0, workers=2, cache_db=str(tmp_path / 'cache.db'))
+        assert mp.Process.call_count == 2
+        assert all(call.kwargs['args'][2:5] == (True, None, 2) for call in mp.Process.call_args_list)
+        assert [call.kwargs['args'][5] for call in mp.Process.call_args_list] == [0, 1]
+        assert Config.CACHE_DB_PATH == str(tmp_path / 'cache.db')
+
+    def test_multiple_workers_share_memory_without_a_cache_file(self, monkeypatch):
+        monkeypatch.setenv('WEATHER_BOT_CACHE_DB', '')
+        with mock.patch.object(server_module, 'multiprocessing') as mp, \
+                mock.patch.object(server_module.signal, 'signal'):
+            server_module.serve('127.0.0.1', 0, workers=2)
+        shared = {id(call.kwargs['args'][3]) for call in mp.Process.call_args_list}
+        assert len(shared) == 1
+        cache = mp.Process.call_args_list[0].kwargs['args'][3]
+        assert isinstance(cache, SharedCache)
+        assert not os.path.exists(cache.path)
+
+    def test_each_worker_takes_a_share_of_the_quota_and_its_own_files(self, monkeypatch):
+        monkeypatch.setenv('WEATHER_BOT_INTERACTION_LOG', '/tmp/interactions.jsonl')
+        monkeypatch.setenv('WEATHER_BOT_HISTORY', '/tmp/history/')
+        with mock.patch.object(server_module, 'split_quota') as split, \
+                mock.patch.object(server_module.weather_bot, 'reset_process_state'), \
+                mock.patch.object(server_module.weather_bot, 'start_prefetch'), \
+                mock.patch.object(server_module.asyncio, 'run') as run:
+            server_module._run_worker('127.0.0.1', 0, True, None, 3, 1)
+            assert Config.INTERACTION_LOG_PATH == '/tmp/interactions.worker-1.jsonl'
+            assert Config.HISTORY_PATH == '/tmp/history.worker-1'
+        split.assert_called_once_with(3)
+        run.call_args[0][0].close()
@@ -0,0 +1,84 @@
+"""
+Tests for the cross-process shared cache tier
+"""
+
+import multiprocessing
+
+import pytest
+
+from src.cache import MemoryCache, TieredCache
+from src.records import WeatherRecord
+from src.shared_cache import WAYS, SharedCache
+
+@pytest.fixture
+def shared(tmp_path):
+    cache = SharedCache.create(slots=64, slot_bytes=512, lock_stripes=4, directory=str(tmp_path))
+    yield cache
+    cache.close()
+
+def _write_from_child(cache, key, value):
+    cache.set(key, value, 60)
+
+class TestSharedCache:
+    """Tests for get/set, expiry, eviction and sharing between processes"""
+
+    def test_round_trip_and_delete(self, shared):
+        shared.set('current:1.0000,2.0000', WeatherRecord.from_dict({'temperature': 20.5}), 60, 30)
+        value, expires_at, stale_at = shared.get_entry('current:1.0000,2.0000')
+        assert value['temperature'] == 20.5
+        assert expires_at - stale_at == pytest.approx(30)
+        assert shared.get('missing') is None
+
+        shared.delete('current:1.0000,2.0000')
+        assert shared.get('current:1.0000,2.0000') is None
+        assert shared.stats.hits == 1 and shared.stats.misses == 2
+
+    def test_overwrite_keeps_one_entry(self, shared):
+        for i in range(5):
+            shared.set('boston', [i], 60)
+        assert shared.get('boston') == [4]
+        assert len(shared) == 1
+
+    def test_expired_entries_are_misses(self, shared):
+        shared.set('boston', [1], -1)
+        assert shared.get('boston') is None
+        assert shared.stats.expirations == 1
+
+    def test_full_set_evicts_entry_closest_to_expiry(self, tmp_path):
+        cache = SharedCache.create(slots=WAYS, slot_bytes=256, lock_stripes=1, directory=str(tmp_path))
+        for i in range(WAYS):
+            cache.set(f"key-{i}", i, 100 + i)
+        cache.set('newcomer', 'x', 1000)
+        assert cache.get('key-0') is None
+        assert cache.get('newcomer') == 'x'
+        assert cache.stats.evictions == 1
+        cache.close()
+
+    def test_oversize_values_are_skipped(self, shared):
+        shared.set('big', 'x' * 1000, 60)
+        assert shared.get('big') is None
+        assert shared.oversize == 1
+
+    def test_visible_across_processes(self, tmp_path):
+        context = multiprocessing.get_context('spawn')
+        shared = SharedCache.create(slots=64, slot_bytes=512, context=context, directory=str(tmp_path))
+        process = context.Process(target=_write_from_child, args=(shared, 'paris', {'temperature': 9}))
+        process.start()
+        process.join(30)
+        assert process.exitcode == 0
+        assert shared.get('paris') == {'temperature': 9}
+        shared.close()
+
+    def test_close_removes_the_owners_file_only(self, tmp_path):
+        cache = SharedCache.create(slots=8, slot_bytes=256, directory=str(tmp_path))
+        attached = SharedCache(cache.path, cache.slots, cache.slot_bytes, cache.locks)
+        attached.close()
+        assert (tmp_path / cache.path.split('/')[-1]).exists()
+        cache.close()
+        assert not list(tmp_path.iterdir())
+
+    def test_second_tier_of_tiered_cache(self, shared):
+        TieredCache(MemoryCache(), shared).set('rome', {'temperature': 25}, 60)
+        fresh = TieredCache(MemoryCache(), shared)
+        assert fresh.get('rome') == {'temperature': 25}
+        assert fresh.stats()['shared']['hits'] == 1
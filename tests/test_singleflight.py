@@ -0,0 +1,130 @@
+"""
+Tests for request coalescing
+"""
+
+import asyncio
+import threading
+import time
+import unittest.mock as mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.singleflight import AsyncSingleFlight, SingleFlight
+from src import weather_bot
+
+class TestSingleFlight:
+    """Tests for the threaded single-flight group"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'temperature': 20}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: flight.do('boston', slow_fetch), range(8)))
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert flight.coalesced == 7
+
+    def test_errors_reach_every_caller(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing_fetch():
+            started.set()
+            time.sleep(0.05)
+            raise RuntimeError("upstream down")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, 'boston', failing_fetch)
+            started.wait()
+            follower = pool.submit(flight.do, 'boston', failing_fetch)
+            for future in (leader, follower):
+                with pytest.raises(RuntimeError):
+                    future.result()
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+        assert flight.do('a', lambda: 1) == 1
+        assert flight.do('a', lambda: 2) == 2
+        assert flight.coalesced == 0
+
+class TestAsyncSingleFlight:
+    """Tests for the asyncio single-flight group"""
+
+    def test_concurrent_coroutines_share_one_execution(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 42
+
+        async def main():
+            return await asyncio.gather(*(flight.do('key', fetch) for _ in range(5)))
+
+        assert asyncio.run(main()) == [42] * 5
+        assert len(calls) == 1
+        assert flight.coalesced == 4
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 42
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do('key', fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do('key', fetch))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(main()) == 42
+        assert len(calls) == 1
+
+    def test_errors_reach_every_caller(self):
+        flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def main():
+            return await asyncio.gather(*(flight.do('key', fetch) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(main())
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight._calls == {}
+
+class TestCoalescedFetches:
+    """Tests for coalescing in fetch_current_weather"""
+
+    def test_concurrent_identical_fetches_hit_upstream_once(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'name': 'Lima', 'main': {'temp': 18}}
+
+        def slow_get(*args, **kwargs):
+            time.sleep(0.1)
+            return response
+
+        before = weather_bot.get_singleflight_stats()['threaded']
+        with mock.patch.object(weather_bot, 'get_transport') as mock_transport:
+            mock_transport.return_value.get.side_effect = slow_get
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                results = list(pool.map(lambda _: weather_bot.fetch_current_weather(-12.05, -77.04), range(6)))
+        assert mock_transport.return_value.get.call_count == 1
+        assert all(result['temperature'] == 18 for result in results)
+        assert weather_bot.get_singleflight_stats()['threaded'] - before == 5
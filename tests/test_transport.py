@@ -0,0 +1,81 @@
+"""
+Tests for the pooled HTTP transport
+"""
+
+import unittest.mock as mock
+
+import pytest
+import requests
+
+from src.transport import HttpTransport, get_transport, set_transport
+
+def make_response(status_code, headers=None):
+    response = mock.Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+class TestHttpTransport:
+    """Tests for retries, timeouts and pooling"""
+
+    def test_pool_size_applied_to_adapters(self):
+        transport = HttpTransport(pool_size=4)
+        adapter = transport.session.get_adapter('http://api.openweathermap.org')
+        assert adapter._pool_maxsize == 4
+
+    @mock.patch('src.transport.time.sleep')
+    def test_retries_server_errors_then_succeeds(self, mock_sleep):
+        transport = HttpTransport(max_retries=3, backoff=0.1)
+        responses = [make_response(503), make_response(429), make_response(200)]
+        with mock.patch.object(transport.session, 'get', side_effect=responses) as mock_get:
+            response = transport.get('http://example.test', params={'q': 'Boston'})
+        assert response.status_code == 200
+        assert mock_get.call_count == 3
+        assert mock_sleep.call_count == 2
+
+    @mock.patch('src.transport.time.sleep')
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        transport = HttpTransport(max_retries=2)
+        with mock.patch.object(transport.session, 'get', return_value=make_response(500)) as mock_get:
+            response = transport.get('http://example.test')
+        assert response.status_code == 500
+        assert mock_get.call_count == 3
+
+    @mock.patch('src.transport.time.sleep')
+    def test_client_errors_are_not_retried(self, mock_sleep):
+        transport = HttpTransport(max_retries=3)
+        with mock.patch.object(transport.session, 'get', return_value=make_response(404)) as mock_get:
+            response = transport.get('http://example.test')
+        assert response.status_code == 404
+        assert mock_get.call_count == 1
+        mock_sleep.assert_not_called()
+
+    @mock.patch('src.transport.time.sleep')
+    def test_connection_errors_raise_after_retries(self, mock_sleep):
+        transport = HttpTransport(max_retries=1)
+        with mock.patch.object(transport.session, 'get', side_effect=requests.ConnectionError("down")):
+            with pytest.raises(requests.RequestException):
+                transport.get('http://example.test')
+
+    def test_per_call_timeout_overrides_default(self):
+        transport = HttpTransport(timeout=10)
+        with mock.patch.object(transport.session, 'get', return_value=make_response(200)) as mock_get:
+            transport.get('http://example.test', timeout=2)
+        assert mock_get.call_args.kwargs['timeout'] == 2
+
+    def test_retry_after_header_is_honoured(self):
+        transport = HttpTransport(backoff=0.1)
+        assert transport._backoff_delay(0, make_response(429, {'Retry-After': '3'})) == 3.0
+
+    def test_backoff_is_jittered_and_bounded(self):
+        transport = HttpTransport(backoff=0.5)
+        for attempt in range(5):
+            delay = transport._backoff_delay(attempt)
+            assert 0 <= delay <= 0.5 * (2 ** attempt)
+
+    def test_shared_transport_is_reused(self):
+        previous = set_transport(None)
+        try:
+            assert get_transport() is get_transport()
+        finally:
+            set_transport(previous)
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Tests for the location-sharded worker process pool
+"""
+
+import os
+import time
+import unittest.mock as mock
+
+import pytest
+
+from src import weather_bot
+from src import worker_pool as worker_pool_module
+from src.worker_pool import WorkerPool
+
+CITIES = ["Boston", "Paris", "Tokyo", "Lima", "Oslo", "Cairo", "Denver", "Madrid", "Seoul", "Dublin",
+          "Austin", "Nairobi"]
+
+async def fake_queries(queries, *args, **kwargs):
+    query = queries[0]
+    if query == "boom":
+        raise ValueError("pipeline failed")
+    if query.startswith("die"):
+        os._exit(3)
+    # Written through the worker's cache, so it lands in the shared tier
+    weather_bot.cache_weather_data(query, {'pid': os.getpid()})
+    return [f"{os.getpid()}|{query}"]
+
+@pytest.fixture
+def pool():
+    # Forked workers inherit the patched pipeline
+    with mock.patch.object(weather_bot, 'process_user_queries_async', fake_queries):
+        with WorkerPool(workers=3, start_method='fork') as worker_pool:
+            yield worker_pool
+
+class TestWorkerPool:
+    """Tests for sharding, ordering, errors and the shared cache"""
+
+    def test_map_preserves_order(self, pool):
+        queries = [f"Weather in {city}" for city in CITIES] * 2
+        responses = pool.map(queries, timeout=30)
+        assert [response.split('|', 1)[1] for response in responses] == queries
+        assert sum(pool.submitted) == len(queries)
+
+    def test_same_location_goes_to_the_same_worker(self, pool):
+        queries = ["Weather in Boston", "Will it rain tomorrow in Boston?", "Forecast for Boston"]
+        pids = {response.split('|')[0] for response in pool.map(queries, timeout=30)}
+        assert len(pids) == 1
+        assert len({pool.shard(query) for query in queries}) == 1
+
+    def test_workers_share_one_cache(self, pool):
+        responses = pool.map([f"Weather in {city}" for city in CITIES], timeout=30)
+        pids = set()
+        for response in responses:
+            pid, query = response.split('|', 1)
+            assert pool.cache.get(weather_bot._cache_key(query)) == {'pid': int(pid)}
+            pids.add(pid)
+        assert len(pids) > 1
+
+    def test_errors_are_raised_from_the_future(self, pool):
+        with pytest.raises(RuntimeError, match="pipeline failed"):
+            pool.submit("boom").result(30)
+
+    def test_dead_worker_fails_its_queries_and_is_replaced(self, pool):
+        with pytest.raises(RuntimeError, match="exited with code 3"):
+            pool.submit("die").result(30)
+        deadline = time.monotonic() + 30
+        while pool.restarts < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.restarts == 1
+        queries = [f"Weather in {city}" for city in CITIES]
+        assert [response.split('|', 1)[1] for response in pool.map(queries, timeout=30)] == queries
+
+    def test_worker_that_keeps_crashing_is_not_restarted(self, pool):
+        with mock.patch.object(worker_pool_module, 'MAX_CONSECUTIVE_CRASHES', 2), \
+                mock.patch.object(worker_pool_module, 'RESTART_BACKOFF', 0.01):
+            for _ in range(3):
+                with pytest.raises(RuntimeError, match="exited with code 3"):
+                    pool.submit("die in Boston").result(30)
+            assert pool.restarts == 2
+            with pytest.raises(RuntimeError, match="not restarted"):
+                pool.submit("Weather in Boston").result(1)
+        others = [f"Weather in {city}" for city in CITIES
+                  if pool.shard(f"Weather in {city}") != pool.shard("Weather in Boston")]
+        assert [response.split('|', 1)[1] for response in pool.map(others, timeout=30)] == others
+
+    def test_closed_pool_rejects_queries(self, pool):
+        pool.close()
+        with pytest.raises(RuntimeError):
+            pool.submit("Weather in Boston")
+        assert not os.path.exists(pool.cache.path)